@@ -70,6 +70,11 @@ def create_app(config_name=None):
 
     register_i18n(app)
 
+    from app import auctions, geo_index, map_cache, ratings, search_index, unread  # noqa: F401 — подключают обновление индексов, версий кэша и счётчиков к сессии
+    from app import page_views
+
+    page_views.init_app(app)
+
     from app.routes.main import bp as main_bp
     from app.routes.auth import bp as auth_bp
     from app.routes.profile import bp as profile_bp
@@ -123,6 +128,14 @@ def create_app(config_name=None):
     app.jinja_env.globals["telegram_deep_link"] = deep_link_for_current_user
     app.jinja_env.globals["telegram_link_code"] = link_code_for_current_user
 
+    from app.feeds import next_page_url
+
+    app.jinja_env.globals["next_page_url"] = next_page_url
+
+    from app.reference_data import cities_url_query
+
+    app.jinja_env.globals["cities_url_query"] = cities_url_query
+
     @login_manager.user_loader
     def load_user(user_id):
         return db.session.get(models.User, int(user_id))
@@ -173,11 +186,10 @@ def create_app(config_name=None):
         ):
             from flask_login import current_user
 
-            db.session.add(models.PageView(
-                path=request.path[:255],
-                user_id=current_user.id if current_user.is_authenticated else None,
-            ))
-            db.session.commit()
+            # в буфер, не в БД — пишется пачкой в фоне (app/page_views.py)
+            app.extensions["page_views"].record(
+                request.path, current_user.id if current_user.is_authenticated else None,
+            )
         return response
 
     from app.i18n import translate as _t
@@ -201,33 +213,22 @@ def create_app(config_name=None):
         ), 500
 
     @app.context_processor
-    def inject_unread_notifications():
+    def inject_unread_counters():
+        """Значки в шапке — готовые счётчики пользователя (app/unread.py),
+        без запросов к БД."""
         from flask_login import current_user
 
         if current_user.is_authenticated:
-            from app.notify import unread_count
-
-            return {"unread_notifications": unread_count(current_user)}
-        return {"unread_notifications": 0}
+            return {
+                "unread_notifications": current_user.unread_notifications,
+                "unread_messages": current_user.unread_messages,
+            }
+        return {"unread_notifications": 0, "unread_messages": 0}
 
-    @app.context_processor
-    def inject_unread_messages():
-        from flask_login import current_user
+    if app.config["I18N_PRERENDER_FRAGMENTS"]:
+        from app.i18n import prerender_fragments
 
-        if current_user.is_authenticated:
-            from app.models import Conversation, Message
-
-            count = (
-                Message.query.join(Conversation, Message.conversation_id == Conversation.id)
-                .filter(
-                    db.or_(Conversation.user_a_id == current_user.id, Conversation.user_b_id == current_user.id),
-                    Message.sender_id != current_user.id,
-                    Message.read_at.is_(None),
-                )
-                .count()
-            )
-            return {"unread_messages": count}
-        return {"unread_messages": 0}
+        prerender_fragments(app)
 
     return app
 
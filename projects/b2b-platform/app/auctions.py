@@ -0,0 +1,161 @@
+"""Состояние аукционов по заказам и сводка «вас обошли по цене» (модуль 7).
+
+Раньше submit_bid после коммита выбирал все активные ставки дороже новой и
+каждому их автору отправлял notify() — с синхронными запросами в
+Telegram/FCM прямо в запросе исполнителя. На оживлённом аукционе одни и те
+же исполнители получали уведомление на каждую новую ставку. Теперь:
+
+- у заказа есть best_bid_price, active_bids_count и bids_version — они
+  пересчитываются после каждого flush, в котором появились, удалены или
+  поменяли цену/статус ставки заказа (одним UPDATE с агрегатом по
+  активным ставкам, в той же транзакции, так что параллельные ставки его не
+  портят). Сверка с данными — recount() (`flask auctions-recount`, см.
+  app/flush_hooks.py);
+- ranking(order) — активные ставки заказа по возрастанию цены (место
+  исполнителя, лучшая цена); таблица считается один раз на bids_version и
+  хранится в памяти процесса;
+- submit_bid только ставит задачу outbid_digest на заказ с задержкой
+  OUTBID_WINDOW_SECONDS. Пока она ждёт, новые ставки по заказу новых задач
+  не ставят (ключ идемпотентности), и через окно одна задача одной пачкой
+  (notify_many) сообщает всем, кого обошли. Начав работу, задача снимает
+  с себя ключ — ставка, сделанная, пока она выполняется, ставит следующую
+  сводку. Bid.outbid_notified_price
+  помнит лучшую цену, о которой исполнитель уже знает, — повторно он
+  получит уведомление, только если цену опустили ещё ниже.
+
+Цены сравниваются как числа, без учёта валюты — как и раньше.
+"""
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.flush_hooks import counter_values, expire_after_flush, fields_changed, mark_stale
+from app.memory_cache import app_cache
+from app.models import Bid, ExecutorProfile, Order
+from app.notify import notify_many
+from app.tasks import enqueue, release_key, task
+
+RANKING_CACHE_SIZE = 2000
+
+
+def _state_values():
+    active = db.and_(Bid.order_id == Order.id, Bid.status == "active")
+    return counter_values(
+        Order,
+        best_bid_price=db.select(db.func.min(Bid.price)).where(active).scalar_subquery(),
+        active_bids_count=db.select(db.func.count(Bid.id)).where(active).scalar_subquery(),
+        bids_version=Order.bids_version + 1,
+    )
+
+
+def _after_flush(session, flush_context):
+    order_ids = {obj.order_id for obj in session.new if isinstance(obj, Bid)}
+    order_ids.update(obj.order_id for obj in session.dirty if isinstance(obj, Bid) and fields_changed(obj, ("price", "status")))
+    order_ids.update(obj.order_id for obj in session.deleted if isinstance(obj, Bid))
+    order_ids.discard(None)
+    if not order_ids:
+        return
+    session.connection().execute(
+        db.update(Order).where(Order.id.in_(sorted(order_ids))).values(_state_values())
+    )
+    mark_stale(session, Order, order_ids)
+
+
+expire_after_flush(Order, ["best_bid_price", "active_bids_count", "bids_version"])
+event.listen(db.session, "after_flush", _after_flush)
+
+
+def recount(order_ids=None):
+    """Пересчитывает состояние аукционов (всех или order_ids) по ставкам.
+    Возвращает число обновлённых заказов."""
+    statement = db.update(Order).values(_state_values())
+    if order_ids is not None:
+        statement = statement.where(Order.id.in_(list(order_ids)))
+    updated = db.session.execute(statement).rowcount
+    db.session.commit()
+    return updated
+
+
+class Ranking:
+    """Активные ставки заказа по возрастанию цены, вне сессии БД."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows  # [(id ставки, id исполнителя, цена, валюта)]
+        self._places = {executor_id: place for place, (_, executor_id, _, _) in enumerate(rows, start=1)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def best_price(self):
+        return self.rows[0][2] if self.rows else None
+
+    def place(self, executor_id):
+        """Место ставки исполнителя (1 — лучшая цена) или None."""
+        return self._places.get(executor_id)
+
+
+def ranking(order):
+    """Ranking активных ставок заказа order для его текущего bids_version."""
+    cache = app_cache("auction_rankings", RANKING_CACHE_SIZE)
+    version = order.bids_version
+    cached = cache.get(order.id, version)
+    if cached is None:
+        rows = db.session.execute(
+            db.select(Bid.id, Bid.executor_id, Bid.price, Bid.currency)
+            .where(Bid.order_id == order.id, Bid.status == "active")
+            .order_by(Bid.price, Bid.id)
+        ).all()
+        cached = Ranking(version, [tuple(row) for row in rows])
+        cache.put(order.id, cached)
+    return cached
+
+
+def _digest_key(order_id):
+    return f"outbid:{order_id}"
+
+
+def bid_placed(order):
+    """Ставка по order сохранена — через окно разослать «вас обошли»."""
+    enqueue(
+        "outbid_digest", {"order_id": order.id}, key=_digest_key(order.id),
+        delay_seconds=current_app.config["OUTBID_WINDOW_SECONDS"],
+    )
+
+
+@task("outbid_digest")
+def outbid_digest_task(order_id):
+    """Одно уведомление каждому, чья ставка дороже лучшей и кому об этой
+    (или более низкой) цене ещё не сообщали."""
+    # до чтения ставок: ставка, сохранённая после этого, поставит новую
+    # сводку, а не присоединится к этой
+    release_key(_digest_key(order_id))
+    order = db.session.get(Order, order_id)
+    if order is None or not order.is_open_for_bids:
+        return 0
+    leader = ranking(order)
+    if not leader:
+        return 0
+    _, _, best, currency = leader.rows[0]
+    outbid = (
+        Bid.query.options(selectinload(Bid.executor).selectinload(ExecutorProfile.user))
+        .filter(
+            Bid.order_id == order.id, Bid.status == "active", Bid.price > best,
+            db.or_(Bid.outbid_notified_price.is_(None), Bid.outbid_notified_price > best),
+        )
+        .all()
+    )
+    if not outbid:
+        return 0
+    for bid in outbid:
+        bid.outbid_notified_price = best
+    # notify_many коммитит и уведомления, и отметки outbid_notified_price
+    notify_many(
+        [bid.executor.user for bid in outbid], "outbid",
+        title=f"Вас обошли по цене: {order.title}",
+        body=f"Лучшая цена сейчас — {best} {currency}. Вы можете предложить новые условия, пока аукцион открыт.",
+        url=f"/orders/{order.id}",
+    )
+    return len(outbid)
@@ -0,0 +1,62 @@
+"""Счётчики версий для кэшей, которые живут в памяти процесса.
+
+Кэш (например, готовые слои карты, app/map_cache.py) хранит вместе с
+данными номер версии, на которой они построены, и перед выдачей сверяет его
+с текущим — одним дешёвым запросом к cache_versions. Версии увеличиваются
+автоматически: track(name, Model, fields=...) — и любой flush, в котором
+модель вставлена, удалена или изменена (в перечисленных полях, если они
+заданы), увеличивает версию name в той же транзакции. Так кэши всех
+процессов gunicorn устаревают одновременно, без общей памяти и без Redis.
+"""
+from sqlalchemy import event
+
+from app import db
+from app.counters import increment_or_insert
+from app.flush_hooks import fields_changed
+from app.models import CacheVersion
+
+_tracked = {}  # модель -> [(имя версии, поля или None)]
+
+
+def track(name, model, fields=None):
+    """Версия name растёт при любой записи model; fields — только при
+    изменении этих полей (вставка и удаление учитываются всегда)."""
+    _tracked.setdefault(model, []).append((name, tuple(fields) if fields else None))
+
+
+def current(name):
+    version = db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+
+def _bump(connection, names):
+    for name in sorted(names):
+        increment_or_insert(connection, CacheVersion, CacheVersion.name, name, CacheVersion.version, 1)
+
+
+def bump_model(connection, model):
+    """Увеличивает версии, которые отслеживают model, — для правок model
+    в обход ORM (атомарные UPDATE из других after_flush-хуков, пересчёты)."""
+    names = {name for name, _ in _tracked.get(model, ())}
+    if names:
+        _bump(connection, names)
+
+
+def _after_flush(session, flush_context):
+    names = set()
+    for obj in list(session.new) + list(session.deleted):
+        names.update(name for name, _ in _tracked.get(type(obj), ()))
+    for obj in session.dirty:
+        for name, fields in _tracked.get(type(obj), ()):
+            if name in names:
+                continue
+            if fields is None:
+                if session.is_modified(obj):
+                    names.add(name)
+            elif fields_changed(obj, fields):
+                names.add(name)
+    if names:
+        _bump(session.connection(), names)
+
+
+event.listen(db.session, "after_flush", _after_flush)
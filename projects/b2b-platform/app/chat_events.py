@@ -0,0 +1,72 @@
+"""Доставка новых сообщений в открытые диалоги без опроса (модуль 11).
+
+Раньше страница диалога раз в 5 секунд запрашивала new.json. Теперь она
+держит один поток Server-Sent Events (/messages/u/<id>/events, см.
+app/routes/chat.py), а этот модуль — брокер публикаций внутри процесса:
+поток подписывается на свой диалог, отправка сообщения будит всех
+подписчиков (publish), и они сразу дочитывают новые сообщения из БД.
+
+Брокер живёт в памяти одного процесса. Если gunicorn запущен с несколькими
+процессами, отправитель и получатель могут попасть в разные — тогда
+подписчик узнает о сообщении при следующей сверке с БД, раз в
+SSE_POLL_SECONDS (это же служит keep-alive). Поток закрывается через
+SSE_MAX_SECONDS; браузер переподключается сам и по заголовку Last-Event-ID
+продолжает с того же места.
+"""
+import queue
+import threading
+
+SSE_POLL_SECONDS = 15
+SSE_MAX_SECONDS = 60
+SSE_RETRY_MS = 3000  # через сколько браузер переподключается
+# Открытый поток занимает поток gunicorn (gthread) целиком, пока ждёт
+# сообщений. Больше SSE_MAX_STREAMS потоков на процесс не открываем —
+# остальные вкладки получают 204 и опрашивают new.json (см. thread.html),
+# а потоки остаются обычным запросам. С --threads 8 это половина.
+SSE_MAX_STREAMS = 4
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = {}  # id диалога -> множество очередей
+        self._lock = threading.Lock()
+
+    def subscribe(self, conversation_id):
+        inbox = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(conversation_id, set()).add(inbox)
+        return inbox
+
+    def unsubscribe(self, conversation_id, inbox):
+        with self._lock:
+            subscribers = self._subscribers.get(conversation_id)
+            if subscribers is not None:
+                subscribers.discard(inbox)
+                if not subscribers:
+                    del self._subscribers[conversation_id]
+
+    def publish(self, conversation_id):
+        """Будит подписчиков диалога. Само сообщение не передаётся — его
+        прочитают из БД, так что сигналы можно спокойно склеивать."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(conversation_id, ()))
+        for inbox in subscribers:
+            try:
+                inbox.put_nowait(True)
+            except queue.Full:
+                pass  # подписчик уже разбужен и ещё не дочитал
+
+    def wait(self, inbox, timeout):
+        """True, если разбудили, False — по таймауту."""
+        try:
+            return inbox.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+
+broker = Broker()
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+
+def sse_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
@@ -31,3 +31,96 @@ def register_cli(app):
             user.password_hash = generate_password_hash(password)
             click.echo(f"Пользователь {email} назначен администратором.")
         db.session.commit()
+
+    @app.cli.command("tasks-worker")
+    @click.option("--once", is_flag=True, help="Выполнить готовые задачи и выйти (для cron).")
+    @click.option("--batch", default=10, show_default=True, help="Сколько задач захватывать за раз.")
+    @click.option("--interval", default=2.0, show_default=True, help="Пауза между опросами пустой очереди, с.")
+    def tasks_worker(once, batch, interval):
+        """Воркер фоновой очереди (app/tasks.py): подбор исполнителей и
+        рассылка уведомлений о новых заявках. Несколько воркеров можно
+        запускать параллельно — задачу захватывает только один."""
+        from app.tasks import work, worker_id
+
+        click.echo(f"Воркер очереди задач {worker_id()} запущен.")
+        processed = work(once=once, batch_size=batch, poll_interval=interval)
+        click.echo(f"Обработано задач: {processed}")
+
+    @app.cli.command("search-reindex")
+    @click.option("--if-empty", is_flag=True, help="Только если индекс ещё пуст (для команды запуска).")
+    def search_reindex(if_empty):
+        """Перестраивает поисковый индекс (app/search_index.py) по всем
+        каталогам. Нужна после первого деплоя с индексом и после массовых
+        правок в обход ORM — обычные сохранения обновляют индекс сами."""
+        from app import db, search_index
+        from app.models import SearchPosting
+
+        if if_empty and db.session.query(SearchPosting.token).first() is not None:
+            click.echo("Поисковый индекс уже заполнен.")
+            return
+        total = search_index.rebuild()
+        click.echo(f"Проиндексировано карточек: {total}")
+
+    @app.cli.command("geo-reindex")
+    @click.option("--if-empty", is_flag=True, help="Только если индекс ещё пуст (для команды запуска).")
+    def geo_reindex(if_empty):
+        """Перестраивает пространственный индекс карты (app/geo_index.py).
+        Нужна после первого деплоя с индексом и после массовых правок в
+        обход ORM — обычные сохранения обновляют индекс сами."""
+        from app import db, geo_index
+        from app.models import GeoPoint
+
+        if if_empty and db.session.query(GeoPoint.kind).first() is not None:
+            click.echo("Пространственный индекс уже заполнен.")
+            return
+        total = geo_index.rebuild()
+        click.echo(f"Проиндексировано точек: {total}")
+
+    @app.cli.command("page-views-rollup")
+    @click.option("--if-empty", is_flag=True, help="Только если сводки ещё пусты (для команды запуска).")
+    def page_views_rollup(if_empty):
+        """Пересчитывает сводки посещений по дням/часам по сырому логу
+        PageView (app/page_views.py). Нужна после первого деплоя со
+        сводками — дальше они обновляются вместе с записью просмотров."""
+        from app import db, page_views
+        from app.models import PageViewDaily
+
+        if if_empty and db.session.query(PageViewDaily.day).first() is not None:
+            click.echo("Сводки посещений уже заполнены.")
+            return
+        total = page_views.rebuild_rollups()
+        click.echo(f"Учтено просмотров: {total}")
+
+    @app.cli.command("page-views-prune")
+    def page_views_prune():
+        """Удаляет просмотры старше PAGE_VIEWS_RETENTION_DAYS (сводки по дням
+        остаются). Воркеры делают это сами раз в час; команда — для cron."""
+        from app import db, page_views
+
+        deleted = page_views.prune(db.session.connection())
+        db.session.commit()
+        click.echo(f"Удалено просмотров: {deleted}")
+
+    @app.cli.command("unread-recount")
+    def unread_recount():
+        """Сверяет счётчики непрочитанного у пользователей (app/unread.py) с
+        уведомлениями и сообщениями — после массовых правок в обход ORM."""
+        from app import unread
+
+        click.echo(f"Пересчитано пользователей: {unread.recount()}")
+
+    @app.cli.command("auctions-recount")
+    def auctions_recount():
+        """Пересчитывает лучшую цену и число активных ставок у заказов
+        (app/auctions.py) — после массовых правок ставок в обход ORM."""
+        from app import auctions
+
+        click.echo(f"Пересчитано заказов: {auctions.recount()}")
+
+    @app.cli.command("ratings-recount")
+    def ratings_recount():
+        """Сверяет рейтинги профилей (app/ratings.py) с опубликованными
+        отзывами и исправляет расхождения. Для cron — например, раз в сутки."""
+        from app import ratings
+
+        click.echo(f"Исправлено профилей: {ratings.recount()}")
@@ -0,0 +1,25 @@
+"""Счётчики в строках по ключу: версии кэшей (app/cache_versions.py),
+сводки посещений (app/page_views.py)."""
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+
+def increment_or_insert(connection, model, key_column, key, counter_column, delta):
+    """Прибавляет delta к counter_column строки model с key_column == key, а
+    если строки ещё нет — вставляет её со значением delta. Атомарно и при
+    параллельных процессах: UPDATE ... SET n = n + delta, вставка — в
+    savepoint'е."""
+    def update():
+        return connection.execute(
+            db.update(model).where(key_column == key).values({counter_column.key: counter_column + delta})
+        ).rowcount
+
+    if update():
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(db.insert(model).values({key_column.key: key, counter_column.key: delta}))
+    except IntegrityError:
+        # строку только что вставил соседний процесс
+        update()
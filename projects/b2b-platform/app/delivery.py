@@ -0,0 +1,137 @@
+"""Доставка уведомлений во внешние каналы (Telegram, FCM) пачкой.
+
+notify()/notify_many() (app/notify.py) создают записи Notification и
+передают их сюда. Раньше каждое уведомление последовательно открывало своё
+HTTP-соединение к Telegram и к FCM на каждое устройство, поэтому рассылка
+всем исполнителям занимала минуты. Теперь:
+
+- привязки Telegram и токены устройств всех получателей читаются двумя
+  запросами;
+- отправки идут параллельно в ограниченном пуле потоков (DELIVERY_WORKERS)
+  через общие requests.Session с keep-alive (http_session);
+- лимиты Telegram (глобальный и на чат) соблюдает telegram_bot — потоки
+  просто ждут своей очереди;
+- отозванные FCM-токены удаляются одним DELETE после всей пачки;
+- у каждой Notification — время и число неудач по каждому каналу.
+
+Потоки не трогают БД: всё, что нужно для отправки, готовится заранее, а
+результаты записываются в сессию уже в вызывающем потоке.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from app import db
+from app.models import PushDeviceToken, TelegramLink
+
+DELIVERY_WORKERS = 8
+HTTP_POOL_SIZE = DELIVERY_WORKERS  # соединений на хост — по одному на поток
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def http_session():
+    """requests.Session с пулом keep-alive-соединений под DELIVERY_WORKERS
+    потоков — по одной на внешний сервис (модуль держит её в глобальной
+    переменной)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DELIVERY_WORKERS, thread_name_prefix="delivery")
+        return _executor
+
+
+def _run(app, func, *args):
+    """Одна отправка (в потоке пула): (результат func, задержка в мс)."""
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception:
+            app.logger.exception("Ошибка доставки уведомления.")
+            result = False
+        return result, int((time.perf_counter() - started) * 1000)
+
+
+def deliver(notifications):
+    """Отправляет уже сохранённые (flush) уведомления в Telegram и на
+    устройства получателей и записывает итог в сами уведомления. Коммит —
+    за вызывающим кодом."""
+    from app import push, telegram_bot  # локальный импорт — модуль 7
+
+    if not notifications:
+        return
+    user_ids = {n.user_id for n in notifications}
+    chats = dict(
+        db.session.query(TelegramLink.user_id, TelegramLink.telegram_chat_id)
+        .filter(TelegramLink.user_id.in_(user_ids), TelegramLink.notifications_enabled.is_(True))
+    )
+    devices = {}
+    for user_id, token in db.session.query(PushDeviceToken.user_id, PushDeviceToken.token).filter(
+        PushDeviceToken.user_id.in_(user_ids)
+    ).order_by(PushDeviceToken.id):
+        devices.setdefault(user_id, []).append(token)
+
+    jobs = []  # (notification, канал, функция, аргументы)
+    for n in notifications:
+        chat_id = chats.get(n.user_id)
+        if chat_id is not None:
+            text = telegram_bot.notification_text(n.title, n.body, n.url)
+            jobs.append((n, "telegram", telegram_bot.send_message, (chat_id, text)))
+
+    if any(n.user_id in devices for n in notifications):
+        sender = push.prepare_sender()
+        if sender is not None:
+            for n in notifications:
+                for token in devices.get(n.user_id, ()):
+                    message = push.build_message(token, n.title, n.body, n.url)
+                    jobs.append((n, "push", sender, (message,)))
+        else:
+            current_app.logger.warning(
+                "FIREBASE_SERVICE_ACCOUNT_JSON не настроен — push не отправлены (%s).", len(notifications),
+            )
+
+    if not jobs:
+        return
+    app = current_app._get_current_object()
+    if len(jobs) == 1:
+        outcomes = [_run(app, jobs[0][2], *jobs[0][3])]
+    else:
+        executor = _get_executor()
+        futures = [executor.submit(_run, app, func, *args) for _, _, func, args in jobs]
+        outcomes = [future.result() for future in futures]
+
+    stale_tokens = []
+    for (n, channel, _, args), (result, latency_ms) in zip(jobs, outcomes):
+        if channel == "telegram":
+            n.telegram_sent = bool(result)
+            n.telegram_latency_ms = latency_ms
+            if not result:
+                n.telegram_failures = (n.telegram_failures or 0) + 1
+        else:
+            # у push результат — True, False или push.STALE (токен отозван)
+            ok = result is True
+            n.push_sent = n.push_sent or ok
+            n.push_latency_ms = max(n.push_latency_ms or 0, latency_ms)
+            if not ok:
+                n.push_failures = (n.push_failures or 0) + 1
+            if result == push.STALE:
+                stale_tokens.append(args[0]["message"]["token"])
+
+    if stale_tokens:
+        # токен отозвали (переустановка приложения, разлогин) — чистим одним
+        # запросом, чтобы не слать туда снова каждый раз
+        PushDeviceToken.query.filter(PushDeviceToken.token.in_(stale_tokens)).delete(synchronize_session=False)
@@ -0,0 +1,92 @@
+"""Постраничные ленты каталогов (барахолка, материалы, вакансии, резюме,
+конструкторы, лента заказов исполнителя, пользователи в админке).
+
+Раньше каждая лента поднимала все подходящие записи разом
+(`.order_by(...).all()`), а шаблон затем по одной догружал регион, город,
+категорию и т.п. для каждой карточки. Теперь:
+
+- страница — не больше FEED_PAGE_SIZE записей, и следующая выбирается по
+  ключу последней записи (keyset: WHERE (created_at, id) < (…, …)), а не
+  через OFFSET — цена страницы не растёт с размером таблицы и с номером
+  страницы; под фильтр по статусу и сортировку есть составные индексы
+  (status, created_at) — см. __table_args__ моделей;
+- связи, которые показывает карточка, загружаются заранее (selectinload в
+  вызывающем коде) — по запросу на связь на всю страницу.
+
+Курсор — ключ сортировки последней записи страницы, упакованный в строку
+для ?cursor=. Испорченный или чужой курсор не ошибка — лента просто
+начинается сначала.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import request, url_for
+
+from app import db
+
+FEED_PAGE_SIZE = 30
+
+
+class Page:
+    """Записи страницы и курсор следующей (None — это последняя)."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _encode(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, db.DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def paginate(query, columns, cursor=None, descending=True, per_page=None):
+    """Страница query, отсортированного по columns (последний — уникальный,
+    обычно id), после курсора cursor. Сортировку задаёт эта функция —
+    у query её быть не должно."""
+    per_page = per_page or FEED_PAGE_SIZE
+    values = _decode(cursor, columns) if cursor else None
+    if values is not None:
+        key = db.tuple_(*columns)
+        # тип колонки нужен, чтобы дата сравнивалась в формате хранения
+        after = db.tuple_(*(db.literal(value, column.type) for column, value in zip(columns, values)))
+        query = query.filter(key < after if descending else key > after)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = _encode([getattr(last, column.key) for column in columns])
+    return Page(items, next_cursor)
+
+
+def next_page_url(page):
+    """Адрес следующей страницы той же ленты — с теми же фильтрами."""
+    args = request.args.to_dict()
+    args["cursor"] = page.next_cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,53 @@
+"""Общее для обработчиков after_flush сессии: индексов (geo_index,
+search_index), версий кэшей (cache_versions), денормализованных счётчиков
+(unread, auctions, ratings).
+
+Счётчики хуки пишут атомарным UPDATE в той же транзакции, в обход ORM.
+Поэтому:
+
+- у объектов, уже загруженных в сессию, такие поля устаревают — хук
+  отмечает строки mark_stale(), и после flush зарегистрированные для модели
+  (expire_after_flush) атрибуты перечитываются при следующем обращении;
+- updated_at в таком UPDATE остаётся прежним (counter_values) — пересчёт
+  счётчика не правка записи, а onupdate сдвинул бы его;
+- хуки видят только изменения через ORM: массовые UPDATE/DELETE в обход
+  сессии счётчики не меняют. Для них и для сверки у каждого модуля есть
+  пересчёт по данным — `flask unread-recount`, `auctions-recount`,
+  `ratings-recount`.
+"""
+from sqlalchemy import event, inspect
+
+from app import db
+
+_stale_attrs = {}  # модель -> атрибуты, которые перечитываются после flush
+
+
+def fields_changed(obj, fields):
+    """Изменено ли в obj хоть одно из полей fields с момента загрузки."""
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def counter_values(model, **values):
+    """values для UPDATE денормализованных полей model, не трогая updated_at."""
+    return {**values, "updated_at": model.updated_at}
+
+
+def expire_after_flush(model, attrs):
+    """Регистрирует поля model, которые хуки пишут в обход ORM."""
+    _stale_attrs[model] = list(attrs)
+
+
+def mark_stale(session, model, ids):
+    """Строки model с первичными ключами ids изменены в обход ORM в этом flush."""
+    session.info.setdefault("flush_hooks_stale", set()).update((model, row_id) for row_id in ids)
+
+
+def _after_flush_postexec(session, flush_context):
+    for model, row_id in session.info.pop("flush_hooks_stale", ()):
+        obj = session.identity_map.get(session.identity_key(model, row_id))
+        if obj is not None:
+            session.expire(obj, _stale_attrs[model])
+
+
+event.listen(db.session, "after_flush_postexec", _after_flush_postexec)
@@ -1,9 +1,12 @@
-"""Геовычисления без PostGIS — чистый Python, работает и на SQLite, и на
+"""Геовычисления без PostGIS — Python/NumPy, работает и на SQLite, и на
 PostgreSQL без расширений. Для объёма данных этой платформы (тысячи
 исполнителей, не миллионы) точности и скорости достаточно."""
-from math import asin, cos, radians, sin, sqrt
+from math import asin, cos, pi, radians, sin, sqrt
+
+import numpy as np
 
 EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * pi / 180  # длина градуса меридиана
 
 
 def haversine_km(lat1, lon1, lat2, lon2):
@@ -15,3 +18,16 @@ def haversine_km(lat1, lon1, lat2, lon2):
     dlon = lon2 - lon1
     a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
     return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def haversine_km_array(lat, lon, lats, lons):
+    """haversine_km от одной точки до массива точек сразу. Где координат нет
+    (NaN в lats/lons или None в lat/lon) — NaN."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if lat is None or lon is None:
+        return np.full(lats.shape, np.nan)
+    lat1, lon1 = radians(lat), radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
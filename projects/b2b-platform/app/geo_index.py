@@ -0,0 +1,187 @@
+"""Пространственный индекс точек карты — исполнителей, конструкторов и
+объявлений барахолки (таблица geo_points).
+
+Раньше /map/nearby.json поднимал все карточки всех типов и считал
+расстояние до каждой в цикле. Теперь у каждой карточки есть строка в
+geo_points с её точкой на карте: своей или центром региона, если своей нет
+(approximate=True, как в map._effective_coords). Поиск в радиусе:
+
+1. ограничивающий прямоугольник вокруг точки (bounding_box) — из БД
+   читаются только точки внутри него (индекс по (kind, lat));
+2. точное расстояние до них — разом, массивом NumPy (haversine_km_array);
+3. отсечение по радиусу и сортировка — тоже в NumPy.
+
+k ближайших (nearest) — тот же поиск с расширяющимся радиусом, пока не
+наберётся k точек.
+
+Индекс обновляется сам: после каждого flush сессии пересчитываются точки
+вставленных/изменённых карточек (если изменились координаты или регион),
+удаляются точки удалённых, а при смене координат центра региона —
+приблизительные точки всех карточек этого региона. Массовые правки в обход
+ORM индекс не видят — после них (и после первого деплоя) нужна
+`flask geo-reindex`.
+"""
+from math import cos, radians
+
+import numpy as np
+from sqlalchemy import event
+
+from app import db
+from app.flush_hooks import fields_changed
+from app.geo import KM_PER_DEGREE_LAT, haversine_km_array
+from app.models import ConstructorProfile, ExecutorProfile, GeoPoint, Listing, Region
+
+# типы точек — те же, что kinds= у /map/nearby.json
+GEO_ENTITIES = {
+    "executor": ExecutorProfile,
+    "constructor": ConstructorProfile,
+    "seller": Listing,
+}
+_KINDS = {model: kind for kind, model in GEO_ENTITIES.items()}
+TRACKED_FIELDS = ("latitude", "longitude", "region_id")
+
+KNN_START_RADIUS_KM = 10
+KNN_GROWTH = 4
+KNN_MAX_RADIUS_KM = 2000  # заведомо больше Узбекистана
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) — прямоугольник, в который
+    гарантированно попадает круг радиуса radius_km. Долготы None, если
+    круг захватывает полюс или линию перемены дат (тогда по долготе не
+    отсекаем)."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+    # градус долготы короче всего на ближней к полюсу стороне прямоугольника
+    dlng = dlat / cos(radians(max(abs(min_lat), abs(max_lat))))
+    if lng - dlng < -180 or lng + dlng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def within_radius(kinds, lat, lng, radius_km):
+    """[(kind, entity_id, distance_km)] точек не дальше radius_km, по
+    возрастанию расстояния. Видимость карточек (роль, заполненность,
+    статус) здесь не проверяется — это делает вызывающий код."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    query = db.session.query(GeoPoint.kind, GeoPoint.entity_id, GeoPoint.lat, GeoPoint.lng).filter(
+        GeoPoint.kind.in_(list(kinds)), GeoPoint.lat.between(min_lat, max_lat),
+    )
+    if min_lng is not None:
+        query = query.filter(GeoPoint.lng.between(min_lng, max_lng))
+    rows = query.all()
+    if not rows:
+        return []
+
+    point_kinds, ids, lats, lngs = zip(*rows)
+    distance = haversine_km_array(lat, lng, lats, lngs)
+    inside = np.flatnonzero(distance <= radius_km)
+    order = inside[np.argsort(distance[inside], kind="stable")]
+    return [(point_kinds[i], ids[i], float(distance[i])) for i in order]
+
+
+def nearest(kinds, lat, lng, k, keep=None, max_radius_km=KNN_MAX_RADIUS_KM):
+    """k ближайших точек — within_radius с радиусом, растущим в KNN_GROWTH
+    раз, пока не наберётся k. keep(hits) -> hits отбрасывает невидимые
+    карточки (и может заменить элементы на свои) до подсчёта."""
+    radius_km = KNN_START_RADIUS_KM
+    while True:
+        hits = within_radius(kinds, lat, lng, radius_km)
+        if keep is not None:
+            hits = keep(hits)
+        if len(hits) >= k or radius_km >= max_radius_km:
+            return hits[:k]
+        radius_km = min(radius_km * KNN_GROWTH, max_radius_km)
+
+
+def _region_centers(connection, region_ids):
+    if not region_ids:
+        return {}
+    rows = connection.execute(
+        db.select(Region.id, Region.latitude, Region.longitude).where(Region.id.in_(region_ids))
+    )
+    return {region_id: (lat, lng) for region_id, lat, lng in rows if lat is not None and lng is not None}
+
+
+def _write(connection, kind, entities, removed_ids=()):
+    """entities: [(entity_id, latitude, longitude, region_id)] — точки
+    пересчитываются; removed_ids — просто удаляются."""
+    ids = {entity[0] for entity in entities} | set(removed_ids)
+    if not ids:
+        return
+    connection.execute(db.delete(GeoPoint).where(GeoPoint.kind == kind, GeoPoint.entity_id.in_(ids)))
+
+    centers = _region_centers(connection, {
+        region_id for _, lat, lng, region_id in entities if (lat is None or lng is None) and region_id
+    })
+    rows = []
+    for entity_id, lat, lng, region_id in entities:
+        if lat is not None and lng is not None:
+            rows.append({"kind": kind, "entity_id": entity_id, "lat": lat, "lng": lng, "approximate": False})
+        elif region_id in centers:
+            center_lat, center_lng = centers[region_id]
+            rows.append({"kind": kind, "entity_id": entity_id, "lat": center_lat, "lng": center_lng,
+                         "approximate": True})
+    if rows:
+        connection.execute(db.insert(GeoPoint), rows)
+
+
+def _entity_rows(connection, model, condition):
+    return connection.execute(
+        db.select(model.id, model.latitude, model.longitude, model.region_id).where(condition)
+    ).all()
+
+
+def _after_flush(session, flush_context):
+    changed, removed, regions = {}, {}, set()
+    for obj in session.new:
+        kind = _KINDS.get(type(obj))
+        if kind is not None:
+            changed.setdefault(kind, {})[obj.id] = obj
+    for obj in session.dirty:
+        kind = _KINDS.get(type(obj))
+        if kind is not None and fields_changed(obj, TRACKED_FIELDS):
+            changed.setdefault(kind, {})[obj.id] = obj
+        elif isinstance(obj, Region) and fields_changed(obj, ("latitude", "longitude")):
+            regions.add(obj.id)
+    for obj in session.deleted:
+        kind = _KINDS.get(type(obj))
+        if kind is not None:
+            removed.setdefault(kind, set()).add(obj.id)
+    if not (changed or removed or regions):
+        return
+
+    connection = session.connection()
+    for kind, model in GEO_ENTITIES.items():
+        entities = [(obj.id, obj.latitude, obj.longitude, obj.region_id) for obj in changed.get(kind, {}).values()]
+        if regions:
+            # центр региона сдвинулся — пересчитать приблизительные точки
+            entities += _entity_rows(connection, model, db.and_(
+                model.region_id.in_(regions), db.or_(model.latitude.is_(None), model.longitude.is_(None)),
+            ))
+        _write(connection, kind, entities, removed.get(kind, ()))
+
+
+event.listen(db.session, "after_flush", _after_flush)
+
+
+def rebuild(batch_size=1000):
+    """Полная перестройка индекса. Возвращает число записанных точек."""
+    db.session.execute(db.delete(GeoPoint))
+    connection = db.session.connection()
+    for kind, model in GEO_ENTITIES.items():
+        last_id = 0
+        while True:
+            batch = connection.execute(
+                db.select(model.id, model.latitude, model.longitude, model.region_id)
+                .where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            _write(connection, kind, batch)
+            last_id = batch[-1][0]
+    total = db.session.query(GeoPoint).count()
+    db.session.commit()
+    return total
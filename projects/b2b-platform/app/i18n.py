@@ -4,9 +4,20 @@
 t(key), зарегистрированная как Jinja-глобал. Пользовательский контент (текст
 заявок, описания цехов) — отдельная история (см. ТЗ, content_translations),
 здесь речь только про статичные подписи интерфейса.
+
+Шаблон страницы зовёт t() сотни раз, поэтому STRINGS при импорте
+компилируется (compile_catalog) в плоский словарь на каждый язык — с уже
+подставленным русским вариантом там, где перевода нет, — а строки с
+{полями} заранее разбираются на куски (_Template). Язык запроса
+определяется один раз и запоминается в g. Блоки шаблонов, которые зависят
+только от языка (и пары параметров, например роли), рендерятся один раз и
+берутся из кэша — static_fragment().
 """
-from flask import session
-from flask_login import current_user
+import string
+
+from flask import current_app, g, has_request_context, request, session
+from flask_login import current_user, user_logged_in, user_logged_out
+from markupsafe import Markup
 
 SUPPORTED_LANGUAGES = ("ru", "uz_latin", "uz_cyrillic", "en")
 
@@ -755,6 +766,12 @@ STRINGS = {
         "uz_cyrillic": "Агар бу ботга аввал ёзган бўлсангиз ва тугма ҳисобни боғламаган бўлса — ботга хабар сифатида шу кодни юборинг",
         "en": "If you've already messaged this bot before and the button didn't link your account — just send the bot this code as a message:",
     },
+    "portfolio.telegram_fallback_settings": {
+        "ru": "Если вы уже писали этому боту раньше и кнопка не привязала аккаунт — код для ручной привязки есть в",
+        "uz_latin": "Agar bu botga avval yozgan boʻlsangiz va tugma hisobni bogʻlamagan boʻlsa — qoʻlda bogʻlash kodi bu yerda:",
+        "uz_cyrillic": "Агар бу ботга аввал ёзган бўлсангиз ва тугма ҳисобни боғламаган бўлса — қўлда боғлаш коди бу ерда:",
+        "en": "If you've already messaged this bot before and the button didn't link your account — get a manual link code in",
+    },
     "portfolio.telegram_details": {
         "ru": "подробнее в", "uz_latin": "batafsil:", "uz_cyrillic": "батафсил:", "en": "more details in",
     },
@@ -1042,6 +1059,9 @@ STRINGS = {
     "common.open": {
         "ru": "Открыть", "uz_latin": "Ochish", "uz_cyrillic": "Очиш", "en": "Open",
     },
+    "common.next_page": {
+        "ru": "Показать ещё →", "uz_latin": "Yana koʻrsatish →", "uz_cyrillic": "Яна кўрсатиш →", "en": "Show more →",
+    },
     "order.no_orders_yet": {
         "ru": "Заявок пока нет.", "uz_latin": "Hozircha buyurtmalar yoʻq.", "uz_cyrillic": "Ҳозирча буюртмалар йўқ.",
         "en": "No orders yet.",
@@ -1220,6 +1240,12 @@ STRINGS = {
         "ru": "Ваша ставка", "uz_latin": "Sizning taklifingiz", "uz_cyrillic": "Сизнинг таклифингиз",
         "en": "Your bid",
     },
+    "order.your_bid_place": {
+        "ru": "Ваша ставка — {place}-я по цене из {count}, лучшая цена {price}.",
+        "uz_latin": "Taklifingiz narx boʻyicha {count} tadan {place}-oʻrinda, eng yaxshi narx {price}.",
+        "uz_cyrillic": "Таклифингиз нарх бўйича {count} тадан {place}-ўринда, энг яхши нарх {price}.",
+        "en": "Your bid is #{place} by price of {count}, best price {price}.",
+    },
     "order.submit_bid_section": {
         "ru": "Подать ставку", "uz_latin": "Taklif berish", "uz_cyrillic": "Таклиф бериш", "en": "Submit a bid",
     },
@@ -1684,6 +1710,10 @@ STRINGS = {
         "ru": "Сообщений пока нет — напишите первым.", "uz_latin": "Hozircha xabarlar yoʻq — birinchi boʻlib yozing.",
         "uz_cyrillic": "Ҳозирча хабарлар йўқ — биринчи бўлиб ёзинг.", "en": "No messages yet — be the first to write.",
     },
+    "chat.older_messages": {
+        "ru": "← Более ранние сообщения", "uz_latin": "← Oldingi xabarlar", "uz_cyrillic": "← Олдинги хабарлар",
+        "en": "← Earlier messages",
+    },
     "chat.message_field": {
         "ru": "Сообщение", "uz_latin": "Xabar", "uz_cyrillic": "Хабар", "en": "Message",
     },
@@ -2491,6 +2521,10 @@ STRINGS = {
         "ru": "По дням (последние 14 дней)", "uz_latin": "Kunlar bo‘yicha (oxirgi 14 kun)",
         "uz_cyrillic": "Кунлар бўйича (охирги 14 кун)", "en": "By day (last 14 days)",
     },
+    "admin.stats_hourly_heading": {
+        "ru": "По часам (последние 24 часа, UTC)", "uz_latin": "Soatlar bo‘yicha (oxirgi 24 soat, UTC)",
+        "uz_cyrillic": "Соатлар бўйича (охирги 24 соат, UTC)", "en": "By hour (last 24 hours, UTC)",
+    },
     "admin.stats_note": {
         "ru": "Считаются просмотры страниц (не уникальные посетители по IP — IP-адреса не сохраняются). Визиты незалогиненных гостей входят в «Просмотров страниц», но не в «Уникальных посетителей».",
         "uz_latin": "Sahifa ko‘rishlar hisoblanadi (IP bo‘yicha noyob tashrif buyuruvchilar emas — IP-manzillar saqlanmaydi). Tizimga kirmagan mehmonlarning tashriflari «Jami ko‘rishlar»ga kiradi, lekin «Noyob tashrif buyuruvchilar»ga kirmaydi.",
@@ -2529,13 +2563,51 @@ STRINGS = {
 }
 
 
+class _Template:
+    """Строка перевода с {полями}, разобранная один раз."""
+
+    __slots__ = ("parts",)
+
+    def __init__(self, text):
+        self.parts = tuple(string.Formatter().parse(text))
+
+    def format(self, kwargs):
+        out = []
+        for literal, field, spec, conversion in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = kwargs[field]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion == "s":
+                    value = str(value)
+                out.append(format(value, spec))
+        return "".join(out)
+
+
+def compile_catalog(strings):
+    """{язык: (строки, шаблоны)}: строки — {ключ: текст} с русским вместо
+    недостающих переводов, шаблоны — {ключ: _Template} для текстов с {полями}."""
+    catalog = {}
+    for lang in SUPPORTED_LANGUAGES:
+        texts = {key: entry.get(lang, entry["ru"]) for key, entry in strings.items()}
+        templates = {key: _Template(text) for key, text in texts.items() if "{" in text}
+        catalog[lang] = (texts, templates)
+    return catalog
+
+
+CATALOG = compile_catalog(STRINGS)
+
+
 def translate(key, **kwargs):
-    lang = get_current_lang()
-    entry = STRINGS.get(key)
-    if not entry:
+    texts, templates = CATALOG[get_current_lang()]
+    text = texts.get(key)
+    if text is None:
         return key
-    text = entry.get(lang, entry["ru"])
-    return text.format(**kwargs) if kwargs else text
+    if not kwargs:
+        return text
+    template = templates.get(key)
+    return template.format(kwargs) if template is not None else text
 
 
 def order_status_label(status):
@@ -2570,6 +2642,38 @@ def dispute_reason_label(reason):
     return translate(f"dispute.reason_{reason}")
 
 
+# блоки шаблонов, которые можно отрендерить заранее (I18N_PRERENDER_FRAGMENTS)
+PRERENDERED_FRAGMENTS = [
+    ("_nav_links.html", {"role": role}) for role in ("customer", "executor", "constructor", "admin")
+]
+
+
+def static_fragment(template_name, **params):
+    """Блок шаблона, который зависит только от языка и params (без
+    current_user, запроса и т.п.): рендерится один раз на язык и params,
+    дальше отдаётся готовым."""
+    key = (template_name, get_current_lang(), request.script_root, tuple(sorted(params.items())))
+    fragments = current_app.extensions.setdefault("i18n_fragments", {})
+    html = fragments.get(key)
+    if html is None:
+        html = Markup(current_app.jinja_env.get_template(template_name).render(**params))
+        fragments[key] = html
+    return html
+
+
+def prerender_fragments(app):
+    """Рендерит PRERENDERED_FRAGMENTS на все языки при старте процесса
+    (create_app, если включён I18N_PRERENDER_FRAGMENTS) —
+    первые запросы воркера не платят за них. Адреса в блоках строятся без
+    префикса (SCRIPT_NAME) — приложение, смонтированное не в корень, их
+    пересчитает само при первом запросе."""
+    for lang in SUPPORTED_LANGUAGES:
+        with app.test_request_context("/"):
+            g.lang = lang
+            for template_name, params in PRERENDERED_FRAGMENTS:
+                static_fragment(template_name, **params)
+
+
 def register_i18n(app):
     @app.context_processor
     def inject_i18n():
@@ -2579,7 +2683,20 @@ def register_i18n(app):
             "language_labels": LANGUAGE_LABELS,
         }
 
+    @app.before_request
+    def reset_current_lang():
+        # g может пережить запрос, если app context открыт снаружи (тесты)
+        g.pop("lang", None)
+
+    def forget_current_lang(sender, **extra):
+        g.pop("lang", None)
+
+    # вход/выход внутри запроса меняют current_user, а с ним и язык
+    user_logged_in.connect(forget_current_lang, app)
+    user_logged_out.connect(forget_current_lang, app)
+
     app.jinja_env.globals["t"] = translate
+    app.jinja_env.globals["static_fragment"] = static_fragment
     app.jinja_env.globals["order_status_label"] = order_status_label
     app.jinja_env.globals["bid_status_label"] = bid_status_label
     app.jinja_env.globals["listing_status_label"] = listing_status_label
@@ -2588,6 +2705,16 @@ def register_i18n(app):
 
 
 def get_current_lang():
+    """Язык интерфейса; в запросе определяется один раз (g.lang)."""
+    if has_request_context():
+        lang = g.get("lang")
+        if lang is None:
+            lang = g.lang = _resolve_lang()
+        return lang
+    return _resolve_lang()
+
+
+def _resolve_lang():
     if current_user.is_authenticated and current_user.preferred_language in SUPPORTED_LANGUAGES:
         return current_user.preferred_language
     lang = session.get("lang")
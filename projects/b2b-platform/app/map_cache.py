@@ -0,0 +1,83 @@
+"""Кэш слоёв карты (/map/executors.json, constructors.json, sellers.json).
+
+Карта опрашивает эти эндпоинты при каждом открытии и смене фильтра, а
+раньше каждый запрос заново поднимал из БД все карточки со связями и
+сериализовал их. Теперь готовый ответ — уже сериализованный JSON и его
+gzip — лежит в памяти процесса под ключом (слой, фильтры) вместе с версией
+данных слоя (app/cache_versions.py), на которой он построен. Любая запись
+профилей/объявлений увеличивает версию, и следующий запрос строит слой
+заново; до тех пор запрос стоит один SELECT версии.
+
+Ответы отдаются с ETag: браузер присылает If-None-Match и, если слой не
+менялся, получает пустой 304.
+"""
+import gzip
+import hashlib
+import json
+
+from flask import current_app, request
+
+from app import cache_versions
+from app.memory_cache import app_cache
+from app.models import (
+    ConstructorProfile, ExecutorCapability, ExecutorEquipment, ExecutorProfile, Listing, Region, ServiceCategory,
+    User,
+)
+
+MAP_CACHE_SIZE = 128  # ключей (слой + фильтры) на процесс
+TILE_CACHE_SIZE = 4096  # тайлы мелкие, но их много (app/map_tiles.py)
+GZIP_LEVEL = 6
+GZIP_MIN_BYTES = 500  # меньше — сжатие не окупается
+
+# слой -> модели, правка которых меняет его содержимое
+LAYER_MODELS = {
+    "executor": (ExecutorProfile, ExecutorCapability, ExecutorEquipment, Region, ServiceCategory),
+    "constructor": (ConstructorProfile, Region),
+    "seller": (Listing, Region),
+}
+
+for _kind, _models in LAYER_MODELS.items():
+    for _model in _models:
+        cache_versions.track(f"map:{_kind}", _model)
+    if _kind != "seller":
+        # видимость профиля зависит от роли; last_login_at и прочее — нет
+        cache_versions.track(f"map:{_kind}", User, fields=("role",))
+
+
+class _Entry:
+    __slots__ = ("version", "etag", "body", "gzipped")
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.gzipped = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_BYTES else None
+
+
+def layer_response(kind, filters, build, tiles=False):
+    """Ответ слоя kind (или кортежа слоёв) с фильтрами filters (хешируемый
+    кортеж). build() -> данные ответа вызывается, только если в кэше нет
+    актуального. tiles=True — ответ кладётся в отдельный кэш тайлов, чтобы
+    тысячи тайлов не вытесняли слои целиком."""
+    kinds = kind if isinstance(kind, tuple) else (kind,)
+    key = (kinds, filters)
+    version = tuple(cache_versions.current(f"map:{k}") for k in kinds)
+    cache = app_cache("map_tiles_cache", TILE_CACHE_SIZE) if tiles else app_cache("map_cache", MAP_CACHE_SIZE)
+    entry = cache.get(key, version)
+    if entry is None:
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = _Entry(version, body)
+        cache.put(key, entry)
+
+    use_gzip = entry.gzipped is not None and "gzip" in request.accept_encodings
+    response = current_app.response_class(
+        entry.gzipped if use_gzip else entry.body, mimetype="application/json",
+    )
+    # у сжатого и несжатого тела разные ETag — иначе промежуточный кэш может
+    # отдать клиенту не то представление
+    response.set_etag(entry.etag + ("-gz" if use_gzip else ""))
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
@@ -0,0 +1,157 @@
+"""Тайлы карты с серверной кластеризацией (/map/tiles/<z>/<x>/<y>.json).
+
+Слои карты целиком (/map/executors.json и т.п.) отдают все видимые точки
+разом — на десятках тысяч карточек это мегабайты JSON и тормозящий
+браузер. Тайл — квадрат карты в стандартной сетке веб-меркатора (как у
+тайлов OSM): на мелком масштабе в нём не точки, а кластеры — число точек в
+ячейке CLUSTER_CELL_PX × CLUSTER_CELL_PX пикселей и их средняя позиция, как
+у supercluster; ячейка из одной точки отдаётся точкой. Начиная с
+MAX_CLUSTER_ZOOM + 1 кластеров нет — только точки.
+
+Кластеры всех масштабов считаются заранее (TileIndex) по точкам из
+пространственного индекса (geo_points, app/geo_index.py) — NumPy, по
+массиву на масштаб: ячейка масштаба z — это четыре ячейки масштаба z + 1,
+поэтому всё это одно целочисленное деление координат. Индекс строится
+отдельно для каждого слоя (executor, constructor, seller) и хранится в
+памяти процесса вместе с версией данных слоя (app/cache_versions.py): при
+правке, например, объявления перестраивается только индекс продавцов,
+остальные слои продолжают отдаваться из готового.
+"""
+import threading
+from math import pi
+
+import numpy as np
+from flask import current_app
+
+from app import cache_versions
+
+TILE_SIZE = 256  # px — как у тайлов OSM/Leaflet
+CLUSTER_CELL_PX = 64
+CELLS_PER_TILE = TILE_SIZE // CLUSTER_CELL_PX
+MAX_CLUSTER_ZOOM = 14  # с 15-го масштаба (~1 км на тайл) — только точки
+MAX_ZOOM = 20
+MAX_LATITUDE = 85.05112878  # граница веб-меркатора
+
+
+def project(lats, lngs):
+    """Координаты точек в долях мира веб-меркатора: (x, y) в [0, 1),
+    y растёт к югу — как номера тайлов."""
+    lats = np.clip(np.asarray(lats, dtype=float), -MAX_LATITUDE, MAX_LATITUDE)
+    lngs = np.asarray(lngs, dtype=float)
+    x = (lngs + 180.0) / 360.0
+    y = 0.5 - np.log(np.tan(pi / 4 + np.radians(lats) / 2)) / (2 * pi)
+    # ровно 1.0 (180° долготы) попало бы в несуществующий тайл
+    return np.clip(x, 0.0, np.nextafter(1.0, 0)), np.clip(y, 0.0, np.nextafter(1.0, 0))
+
+
+class _Level:
+    """Кластеры одного масштаба: по элементу на непустую ячейку."""
+
+    __slots__ = ("cell_x", "cell_y", "count", "lat", "lng", "first")
+
+    def __init__(self, cell_x, cell_y, count, lat, lng, first):
+        self.cell_x, self.cell_y, self.count, self.lat, self.lng, self.first = (
+            cell_x, cell_y, count, lat, lng, first,
+        )
+
+
+class TileIndex:
+    """Точки одного слоя и их кластеры на масштабах 0..MAX_CLUSTER_ZOOM."""
+
+    def __init__(self, ids, lats, lngs):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lngs = np.asarray(lngs, dtype=float)
+        self.x, self.y = project(self.lats, self.lngs)
+        self.levels = [self._cluster(zoom) for zoom in range(MAX_CLUSTER_ZOOM + 1)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cluster(self, zoom):
+        cells = (1 << zoom) * CELLS_PER_TILE
+        cell_x = (self.x * cells).astype(np.int64)
+        cell_y = (self.y * cells).astype(np.int64)
+        keys, first, inverse, count = np.unique(
+            cell_x * cells + cell_y, return_index=True, return_inverse=True, return_counts=True,
+        )
+        inverse = inverse.ravel()
+        return _Level(
+            keys // cells, keys % cells, count,
+            np.bincount(inverse, weights=self.lats, minlength=len(keys)) / count,
+            np.bincount(inverse, weights=self.lngs, minlength=len(keys)) / count,
+            first,
+        )
+
+    def clusters(self, zoom, x, y):
+        """[(cell_x, cell_y, count, lat, lng, id точки или None)] ячеек
+        тайла; id — только у ячеек из одной точки."""
+        level = self.levels[zoom]
+        inside = np.flatnonzero(
+            (level.cell_x // CELLS_PER_TILE == x) & (level.cell_y // CELLS_PER_TILE == y)
+        )
+        return [
+            (int(level.cell_x[i]), int(level.cell_y[i]), int(level.count[i]),
+             float(level.lat[i]), float(level.lng[i]),
+             int(self.ids[level.first[i]]) if level.count[i] == 1 else None)
+            for i in inside
+        ]
+
+    def points(self, zoom, x, y):
+        """id всех точек тайла (для масштабов без кластеров)."""
+        tiles = 1 << zoom
+        inside = (self.x * tiles).astype(np.int64) == x
+        inside &= (self.y * tiles).astype(np.int64) == y
+        return [int(entity_id) for entity_id in self.ids[inside]]
+
+
+_lock = threading.Lock()
+
+
+def layer_index(kind, load):
+    """TileIndex слоя kind, актуальный для текущей версии его данных.
+    load() -> [(id, lat, lng)] видимых точек вызывается только при
+    перестройке."""
+    version = cache_versions.current(f"map:{kind}")
+    indexes = current_app.extensions.setdefault("map_tiles", {})
+    cached = indexes.get(kind)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = indexes.get(kind)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = load()
+        ids, lats, lngs = zip(*rows) if rows else ((), (), ())
+        index = TileIndex(ids, lats, lngs)
+        indexes[kind] = (version, index)
+        return index
+
+
+def tile(indexes, zoom, x, y):
+    """Содержимое тайла по индексам слоёв {kind: TileIndex}:
+    (кластеры, точки). Кластеры разных слоёв в одной ячейке сливаются в
+    один: {"lat", "lng", "count", "kinds": {kind: число}}; точки —
+    [(kind, id)]."""
+    if zoom > MAX_CLUSTER_ZOOM:
+        return [], [(kind, entity_id) for kind, index in indexes.items() for entity_id in index.points(zoom, x, y)]
+
+    cells = {}
+    for kind, index in indexes.items():
+        for cell_x, cell_y, count, lat, lng, entity_id in index.clusters(zoom, x, y):
+            cells.setdefault((cell_x, cell_y), []).append((kind, count, lat, lng, entity_id))
+
+    clusters, points = [], []
+    for (cell_x, cell_y), members in sorted(cells.items()):
+        total = sum(count for _, count, _, _, _ in members)
+        if total == 1:
+            kind, _, _, _, entity_id = members[0]
+            points.append((kind, entity_id))
+            continue
+        clusters.append({
+            "lat": sum(lat * count for _, count, lat, _, _ in members) / total,
+            "lng": sum(lng * count for _, count, _, lng, _ in members) / total,
+            "count": total,
+            "kinds": {kind: count for kind, count, _, _, _ in members},
+        })
+    return clusters, points
@@ -1,19 +1,35 @@
 """Модуль 2 — логика автоматического подбора исполнителей под заказ.
 
-Реализует формулу из ТЗ (обязательные фильтры + взвешенный скоринг), но без
-фоновой очереди — запускается синхронно в момент публикации заказа. Для
-объёмов, на которые рассчитан MVP, это приемлемо; вынос в фоновую задачу
-(Celery/RQ) — прямой перенос run_matching() в отдельного воркера без
-изменения самой логики."""
+Реализует формулу из ТЗ (обязательные фильтры + взвешенный скоринг).
+Маршруты не вызывают подбор напрямую, а ставят задачи в очередь
+(app/tasks.py): match_order — подбор под опубликованный заказ и затем
+рассылка остальным исполнителям пачками (broadcast_order), match_executor —
+подбор открытых заказов под только что заполненный профиль."""
 from datetime import datetime
 
+import numpy as np
+
 from app import db
-from app.geo import haversine_km
-from app.models import ExecutorCapability, ExecutorProfile, Order, OrderMatch, User
-from app.notify import notify
+from app.geo import KM_PER_DEGREE_LAT, haversine_km, haversine_km_array
+from app.models import (
+    ExecutorCapability,
+    ExecutorEquipment,
+    ExecutorProfile,
+    Notification,
+    Order,
+    OrderMatch,
+    Subscription,
+    User,
+    capability_materials,
+    capability_services,
+)
+from app.notify import notify, notify_many
 from app.subscriptions import has_active_subscription
+from app.tasks import enqueue, task
 
 TOP_N_CANDIDATES = 20
+BROADCAST_BATCH_SIZE = 200  # исполнителей на одну задачу broadcast_order
+ACTIVE_SUBSCRIPTION_STATUSES = ("trialing", "active")  # как Subscription.is_active_now
 
 
 def _fits_dimensions(order, capability):
@@ -48,39 +64,127 @@ def _score(order, executor, capability, distance_km):
     return round(score, 2)
 
 
+def _candidate_rows(order):
+    """Все обязательные фильтры find_candidates одним SQL-запросом: роль,
+    станочный парк, действующая подписка, габариты и — грубо, полосой по
+    широте — радиус обслуживания. Точное расстояние досчитывается в NumPy.
+    Возвращает только нужные для скоринга столбцы, без ORM-объектов."""
+    now = datetime.utcnow()
+    if order.material_id is not None:
+        material_match = db.exists().where(
+            capability_materials.c.capability_id == ExecutorCapability.id,
+            capability_materials.c.material_id == order.material_id,
+        )
+    else:
+        material_match = db.literal(False)
+
+    query = (
+        db.session.query(
+            ExecutorProfile.id, ExecutorProfile.latitude, ExecutorProfile.longitude,
+            ExecutorProfile.service_radius_km, ExecutorProfile.region_id, ExecutorProfile.rating_avg,
+            material_match.label("material_match"),
+        )
+        .join(ExecutorCapability, ExecutorCapability.executor_id == ExecutorProfile.id)
+        .join(User, User.id == ExecutorProfile.user_id)
+        .filter(User.role == "executor")  # переключился на другую роль в настройках — из матчинга выбывает
+        # некоррелированные IN (...) считаются один раз на запрос, а не на
+        # каждую строку, как EXISTS у relationship.any()
+        .filter(ExecutorCapability.id.in_(
+            db.select(capability_services.c.capability_id)
+            .where(capability_services.c.service_category_id == order.service_category_id)
+        ))
+        .filter(ExecutorProfile.id.in_(  # не считается «опубликованным» без станочного парка
+            db.select(ExecutorEquipment.executor_id)
+        ))
+        .filter(ExecutorProfile.id.in_(  # см. ТЗ, модуль 2: без подписки в матчинг не попадает
+            db.select(Subscription.executor_id).where(
+                Subscription.status.in_(ACTIVE_SUBSCRIPTION_STATUSES),
+                db.or_(Subscription.expires_at.is_(None), Subscription.expires_at > now),
+            )
+        ))
+    )
+
+    dimension_checks = [
+        (order.dimensions_length_mm, ExecutorCapability.max_length_mm),
+        (order.dimensions_diameter_mm, ExecutorCapability.max_diameter_mm),
+        (order.dimensions_width_mm, ExecutorCapability.max_width_mm),
+        (order.dimensions_height_mm, ExecutorCapability.max_height_mm),
+        (order.weight_kg, ExecutorCapability.max_weight_kg),
+    ]
+    for order_value, executor_max in dimension_checks:
+        if order_value is not None:
+            query = query.filter(db.or_(executor_max.is_(None), executor_max >= order_value))
+
+    if order.latitude is not None and order.longitude is not None:
+        # по меридиану градус — ровно KM_PER_DEGREE_LAT км, поэтому всё, что
+        # дальше радиуса по одной только широте, заведомо вне радиуса
+        band = ExecutorProfile.service_radius_km / KM_PER_DEGREE_LAT
+        query = query.filter(db.or_(
+            ExecutorProfile.latitude.is_(None), ExecutorProfile.longitude.is_(None),
+            ExecutorProfile.service_radius_km.is_(None), ExecutorProfile.service_radius_km == 0,
+            ExecutorProfile.latitude.between(order.latitude - band, order.latitude + band),
+        ))
+
+    return query.order_by(ExecutorCapability.id).all()
+
+
+def _top_n(scores, n):
+    """Индексы n лучших по убыванию score; при равенстве — в исходном
+    порядке (как у стабильной сортировки)."""
+    if len(scores) > n:
+        part = np.argpartition(-scores, n - 1)
+        kth = scores[part[n - 1]]
+        above = np.flatnonzero(scores > kth)
+        idx = np.concatenate([above, np.flatnonzero(scores == kth)[:n - len(above)]])
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
 def find_candidates(order):
     """Возвращает список (executor_profile, score, distance_km), отсортированный
-    по убыванию score — используется и для реального матчинга, и в тестах."""
-    capabilities = (
-        ExecutorCapability.query
-        .join(ExecutorProfile, ExecutorCapability.executor_id == ExecutorProfile.id)
-        .filter(ExecutorCapability.service_categories.any(id=order.service_category_id))
-        .all()
-    )
+    по убыванию score — используется и для реального матчинга, и в тестах.
 
-    results = []
-    for capability in capabilities:
-        executor = capability.executor
-        if executor.user.role != "executor":  # переключился на другую роль в настройках — из матчинга выбывает
-            continue
-        if not executor.equipment:  # не считается «опубликованным» без станочного парка
-            continue
-        if not has_active_subscription(executor):  # см. ТЗ, модуль 2: без подписки в матчинг не попадает
-            continue
-        if not _fits_dimensions(order, capability):
-            continue
+    Фильтры — в SQL (_candidate_rows), расстояние и скоринг (та же формула,
+    что в _score) — массивами по всем кандидатам сразу, из БД затем
+    поднимаются только TOP_N_CANDIDATES профилей."""
+    rows = _candidate_rows(order)
+    if not rows:
+        return []
 
-        distance_km = None
-        if order.latitude is not None and order.longitude is not None and executor.latitude is not None and executor.longitude is not None:
-            distance_km = haversine_km(order.latitude, order.longitude, executor.latitude, executor.longitude)
-            if executor.service_radius_km and distance_km > executor.service_radius_km:
-                continue
+    ids, lats, lons, radius, region, rating, material = (
+        np.array(col, dtype=float) for col in zip(*rows)
+    )
+    distance = haversine_km_array(order.latitude, order.longitude, lats, lons)
+    has_distance = ~np.isnan(distance)
+    out_of_radius = has_distance & (radius > 0) & (distance > radius)
 
-        score = _score(order, executor, capability, distance_km)
-        results.append((executor, score, distance_km))
+    keep = ~out_of_radius
+    ids, distance, has_distance = ids[keep], distance[keep], has_distance[keep]
+    region, rating, material = region[keep], rating[keep], material[keep]
 
-    results.sort(key=lambda item: item[1], reverse=True)
-    return results[:TOP_N_CANDIDATES]
+    score = np.zeros(len(ids))
+    score += np.where(material > 0, 20.0, 0.0)
+    # нейтральный балл, если у одной из сторон не указаны координаты
+    score += np.where(has_distance, np.maximum(0.0, 30.0 - np.nan_to_num(distance) / 10.0), 10.0)
+    if order.region_id is None:
+        score += np.where(np.isnan(region), 15.0, 0.0)
+    else:
+        score += np.where(region == order.region_id, 15.0, 0.0)
+    score += np.where(np.isnan(rating), 5.0, np.nan_to_num(rating) * 2)
+
+    top = _top_n(np.round(score, 2), TOP_N_CANDIDATES)
+    top_ids = [int(i) for i in ids[top]]
+    executors = {
+        e.id: e for e in ExecutorProfile.query
+        .options(db.selectinload(ExecutorProfile.user))
+        .filter(ExecutorProfile.id.in_(top_ids))
+    }
+    return [
+        (executors[executor_id], round(float(score[k]), 2),
+         float(distance[k]) if has_distance[k] else None)
+        for executor_id, k in zip(top_ids, top)
+    ]
 
 
 def run_matching(order):
@@ -89,7 +193,7 @@ def run_matching(order):
     already_matched_ids = {m.executor_id for m in order.matches}
 
     candidates = find_candidates(order)
-    created = 0
+    recipients = []
     for executor, score, distance_km in candidates:
         if executor.id in already_matched_ids:
             continue
@@ -98,34 +202,97 @@ def run_matching(order):
             distance_km=distance_km, notified_at=datetime.utcnow(),
         )
         db.session.add(match)
-        created += 1
-
-        notify(
-            executor.user, "new_order_match",
-            title=f"⭐ Рекомендуем: {order.title}",
-            body=order.description[:200],
-            url=f"/orders/{order.id}",
-        )
+        recipients.append(executor.user)
 
+    notify_many(
+        recipients, "new_order_match",
+        title=f"⭐ Рекомендуем: {order.title}",
+        body=order.description[:200],
+        url=f"/orders/{order.id}",
+    )
     db.session.commit()
-    return created
+    return len(recipients)
 
 
-def notify_unmatched_executors(order):
+def notify_unmatched_executors(order, after_user_id=0, limit=None):
     """Лента заказов открыта всем исполнителям (см. orders.executor_dashboard),
     а не только тем, кого выбрал автоподбор — значит и уведомление о новой
     заявке должны получать все, иначе часть рынка просто не узнает о ней.
     Совпавшим (run_matching) уже ушло уведомление с пометкой «Рекомендуем» —
-    этой функции нужно догнать оставшихся простым «новая заявка», без пометки."""
-    matched_user_ids = {m.executor.user_id for m in order.matches}
-    others = User.query.filter_by(role="executor").filter(User.id.notin_(matched_user_ids)).all()
-    for user in others:
-        notify(
-            user, "new_order_broadcast",
-            title=f"Новая заявка: {order.title}",
-            body=order.description[:200],
-            url=f"/orders/{order.id}",
-        )
+    этой функции нужно догнать оставшихся простым «новая заявка», без пометки.
+
+    Обходит исполнителей по возрастанию id, начиная после after_user_id, не
+    больше limit за вызов; тех, кому рассылка по этой заявке уже ушла
+    (повтор упавшей задачи), пропускает. Возвращает id последнего
+    просмотренного пользователя или None, если исполнители кончились."""
+    url = f"/orders/{order.id}"
+    matched_user_ids = (
+        db.select(ExecutorProfile.user_id)
+        .join(OrderMatch, OrderMatch.executor_id == ExecutorProfile.id)
+        .where(OrderMatch.order_id == order.id)
+    )
+    already_notified_ids = (
+        db.select(Notification.user_id)
+        .where(Notification.type == "new_order_broadcast", Notification.url == url)
+    )
+    query = (
+        User.query.filter(User.role == "executor", User.id > after_user_id)
+        .order_by(User.id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    users = query.all()
+    if not users:
+        return None
+
+    recipients = User.query.filter(
+        User.id.in_([u.id for u in users]),
+        User.id.notin_(matched_user_ids), User.id.notin_(already_notified_ids),
+    ).order_by(User.id).all()
+    notify_many(
+        recipients, "new_order_broadcast",
+        title=f"Новая заявка: {order.title}",
+        body=order.description[:200],
+        url=url,
+    )
+    db.session.commit()
+    return users[-1].id if limit is not None and len(users) == limit else None
+
+
+@task("match_order")
+def match_order_task(order_id):
+    """Подбор под только что опубликованный заказ, затем — рассылка
+    остальным исполнителям отдельными задачами. Возвращает число
+    подобранных исполнителей."""
+    order = db.session.get(Order, order_id)
+    if order is None or order.status != "published":
+        return 0
+    matched = run_matching(order)
+    enqueue("broadcast_order", {"order_id": order_id, "after_user_id": 0},
+            key=f"broadcast_order:{order_id}:0")
+    return matched
+
+
+@task("broadcast_order")
+def broadcast_order_task(order_id, after_user_id):
+    """Одна пачка рассылки (BROADCAST_BATCH_SIZE исполнителей); следующая
+    пачка — следующей задачей, чтобы повтор после сбоя не начинал сначала."""
+    order = db.session.get(Order, order_id)
+    if order is None or order.status != "published":
+        return None
+    last_user_id = notify_unmatched_executors(order, after_user_id, BROADCAST_BATCH_SIZE)
+    if last_user_id is not None:
+        enqueue("broadcast_order", {"order_id": order_id, "after_user_id": last_user_id},
+                key=f"broadcast_order:{order_id}:{last_user_id}")
+    return last_user_id
+
+
+@task("match_executor")
+def match_executor_task(executor_id):
+    executor = db.session.get(ExecutorProfile, executor_id)
+    if executor is None:
+        return 0
+    return match_new_executor_to_open_orders(executor)
 
 
 def match_new_executor_to_open_orders(executor):
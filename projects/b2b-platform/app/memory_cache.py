@@ -0,0 +1,40 @@
+"""Кэши в памяти процесса с проверкой версии: слои и тайлы карты
+(app/map_cache.py), таблицы ставок аукционов (app/auctions.py)."""
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class VersionedLRU:
+    """LRU на size ключей, общий для потоков процесса. Значение — любой
+    объект с атрибутом version: get() отдаёт его, только если версия
+    совпадает с нужной."""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def app_cache(name, size):
+    """VersionedLRU приложения под именем name (хранится в app.extensions)."""
+    cache = current_app.extensions.get(name)
+    if cache is None:
+        cache = current_app.extensions.setdefault(name, VersionedLRU(size))
+    return cache
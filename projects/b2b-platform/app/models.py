@@ -75,6 +75,8 @@ class User(TimestampMixin, db.Model):
     """Базовая учётная запись — общая и для заказчика, и для исполнителя."""
 
     __tablename__ = "users"
+    # список пользователей в админке — лента по (created_at, id), app/feeds.py
+    __table_args__ = (db.Index("ix_users_created_at", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -92,6 +94,11 @@ class User(TimestampMixin, db.Model):
     is_blocked = db.Column(db.Boolean, nullable=False, default=False)
     last_login_at = db.Column(db.DateTime, nullable=True)
 
+    # Непрочитанные уведомления и сообщения — для значков в шапке каждой
+    # страницы без COUNT-запросов. Ведутся автоматически (app/unread.py).
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0)
+    unread_messages = db.Column(db.Integer, nullable=False, default=0)
+
     customer_profile = db.relationship(
         "CustomerProfile", backref="user", uselist=False, cascade="all, delete-orphan"
     )
@@ -250,7 +257,9 @@ class CustomerProfile(TimestampMixin, db.Model):
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
 
+    # по опубликованным отзывам о пользователе; ведутся автоматически (app/ratings.py)
     rating_avg = db.Column(db.Numeric(3, 2), nullable=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
     reviews_count = db.Column(db.Integer, nullable=False, default=0)
 
     region = db.relationship("Region")
@@ -289,7 +298,9 @@ class ExecutorProfile(TimestampMixin, db.Model):
     workload = db.Column(db.Integer, nullable=True)  # 1 (свободен) .. 10 (полностью занят), необязательно
 
     is_verified = db.Column(db.Boolean, nullable=False, default=False)
+    # по опубликованным отзывам о пользователе; ведутся автоматически (app/ratings.py)
     rating_avg = db.Column(db.Numeric(3, 2), nullable=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
     reviews_count = db.Column(db.Integer, nullable=False, default=0)
 
     region = db.relationship("Region")
@@ -367,6 +378,8 @@ class ConstructorProfile(TimestampMixin, db.Model):
     своего конструктора в штате)."""
 
     __tablename__ = "constructor_profiles"
+    # каталог конструкторов — лента по (display_name, id), app/feeds.py
+    __table_args__ = (db.Index("ix_constructor_profiles_display_name", "display_name"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), unique=True, nullable=False)
@@ -407,6 +420,8 @@ class Order(TimestampMixin, db.Model):
     """Заявка заказчика на изготовление или ремонт."""
 
     __tablename__ = "orders"
+    # лента: WHERE status = ? ORDER BY created_at DESC, id DESC (app/feeds.py)
+    __table_args__ = (db.Index("ix_orders_status_created_at", "status", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey("customer_profiles.id"), nullable=False)
@@ -437,6 +452,12 @@ class Order(TimestampMixin, db.Model):
     auction_deadline_at = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(20), nullable=False, default="published")
     payment_methods = db.Column(db.String(200), nullable=True)  # "cash,card" — необязательно, см. PAYMENT_METHOD_CHOICES
+    # Состояние аукциона по активным ставкам — для страницы заказа и сводки
+    # «вас обошли» без выборки всех ставок. Ведётся автоматически
+    # (app/auctions.py); bids_version растёт при каждой правке ставок.
+    best_bid_price = db.Column(db.Numeric(12, 2), nullable=True)
+    active_bids_count = db.Column(db.Integer, nullable=False, default=0)
+    bids_version = db.Column(db.Integer, nullable=False, default=0)
 
     customer = db.relationship("CustomerProfile", backref="orders")
     service_category = db.relationship("ServiceCategory")
@@ -510,6 +531,8 @@ class Bid(TimestampMixin, db.Model):
     lead_time_days = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), nullable=False, default="active")  # active | withdrawn | accepted | rejected
+    # лучшая цена, о которой исполнителю уже сообщили «вас обошли» (app/auctions.py)
+    outbid_notified_price = db.Column(db.Numeric(12, 2), nullable=True)
 
     executor = db.relationship("ExecutorProfile")
 
@@ -587,6 +610,13 @@ class Notification(db.Model):
     body = db.Column(db.Text, nullable=True)
     url = db.Column(db.String(500), nullable=True)
     telegram_sent = db.Column(db.Boolean, nullable=False, default=False)
+    # Итог доставки по внешним каналам (app/delivery.py): время отправки и
+    # число неудачных попыток — для мониторинга Telegram/FCM.
+    telegram_latency_ms = db.Column(db.Integer, nullable=True)
+    telegram_failures = db.Column(db.Integer, nullable=False, default=0)
+    push_sent = db.Column(db.Boolean, nullable=False, default=False)
+    push_latency_ms = db.Column(db.Integer, nullable=True)  # самое долгое из устройств
+    push_failures = db.Column(db.Integer, nullable=False, default=0)
     read_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
@@ -718,6 +748,8 @@ class Listing(TimestampMixin, db.Model):
     """Объявление о продаже/покупке станка, инструмента, запчастей."""
 
     __tablename__ = "listings"
+    # лента: WHERE status = ? ORDER BY created_at DESC, id DESC (app/feeds.py)
+    __table_args__ = (db.Index("ix_listings_status_created_at", "status", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -806,6 +838,8 @@ class Vacancy(TimestampMixin, db.Model):
     (не обязательно executor: заказчик тоже может нанимать персонал)."""
 
     __tablename__ = "vacancies"
+    # лента: WHERE status = ? ORDER BY created_at DESC, id DESC (app/feeds.py)
+    __table_args__ = (db.Index("ix_vacancies_status_created_at", "status", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     employer_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -833,6 +867,8 @@ class Resume(TimestampMixin, db.Model):
     """Резюме соискателя («ищу работу») — тоже доступно любому пользователю."""
 
     __tablename__ = "resumes"
+    # лента: WHERE status = ? ORDER BY created_at DESC, id DESC (app/feeds.py)
+    __table_args__ = (db.Index("ix_resumes_status_created_at", "status", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     candidate_id = db.Column(db.Integer, db.ForeignKey("users.id"), unique=True, nullable=False)
@@ -1034,6 +1070,8 @@ class MaterialListing(TimestampMixin, db.Model):
     отдельный поставщик сырья или заказчик с остатками металла."""
 
     __tablename__ = "material_listings"
+    # лента: WHERE status = ? ORDER BY created_at DESC, id DESC (app/feeds.py)
+    __table_args__ = (db.Index("ix_material_listings_status_created_at", "status", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -1109,22 +1147,37 @@ class Conversation(TimestampMixin, db.Model):
     user_a_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     user_b_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Последнее сообщение и непрочитанное каждой стороной — для списка
+    # диалогов без загрузки всех сообщений. Ведутся автоматически
+    # (app/unread.py). Без внешнего ключа: messages ссылается на
+    # conversations, и циклическая пара FK мешала бы create_all/миграциям.
+    last_message_id = db.Column(db.Integer, nullable=True)
+    unread_a = db.Column(db.Integer, nullable=False, default=0)  # непрочитано user_a
+    unread_b = db.Column(db.Integer, nullable=False, default=0)  # непрочитано user_b
 
     user_a = db.relationship("User", foreign_keys=[user_a_id])
     user_b = db.relationship("User", foreign_keys=[user_b_id])
     messages = db.relationship(
         "Message", backref="conversation", cascade="all, delete-orphan", order_by="Message.created_at"
     )
+    last_message = db.relationship(
+        "Message", primaryjoin="foreign(Conversation.last_message_id) == Message.id", viewonly=True,
+    )
 
     def other_user(self, user):
         return self.user_b if user.id == self.user_a_id else self.user_a
 
+    def unread_for(self, user):
+        return self.unread_a if user.id == self.user_a_id else self.unread_b
+
     def __repr__(self):
         return f"<Conversation {self.user_a_id}<->{self.user_b_id}>"
 
 
 class Message(db.Model):
     __tablename__ = "messages"
+    # keyset-страницы диалога: WHERE conversation_id = ? AND id > ? ORDER BY id
+    __table_args__ = (db.Index("ix_messages_conversation_id_id", "conversation_id", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=False, index=True)
@@ -1175,3 +1228,145 @@ class PageView(db.Model):
 
     def __repr__(self):
         return f"<PageView path={self.path!r} created_at={self.created_at}>"
+
+
+class PageViewDaily(db.Model):
+    """Число просмотров страниц за сутки (UTC). Увеличивается вместе с
+    записью пачки PageView (app/page_views.py), поэтому статистика читает
+    по строке на день, а не весь лог; переживает очистку старых PageView."""
+
+    __tablename__ = "page_view_daily"
+
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PageViewHourly(db.Model):
+    """То же по часам (начало часа, UTC); хранится PAGE_VIEWS_HOURLY_DAYS
+    дней."""
+
+    __tablename__ = "page_view_hourly"
+
+    hour = db.Column(db.DateTime, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PageViewVisitor(db.Model):
+    """Зарегистрированный пользователь, хоть раз открывший страницу, —
+    для «уникальных посетителей» без DISTINCT по всему логу."""
+
+    __tablename__ = "page_view_visitors"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    first_seen_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# --- фоновая очередь задач (app/tasks.py) ---
+
+TASK_STATUSES = ("pending", "running", "done", "failed")
+
+
+class BackgroundTask(db.Model):
+    """Задача фоновой очереди: очередь живёт в той же БД, что и всё
+    остальное, — ни Redis, ни Celery для неё не нужны. Воркер —
+    `flask tasks-worker` (app/cli.py)."""
+
+    __tablename__ = "background_tasks"
+    __table_args__ = (
+        db.Index("ix_background_tasks_status_run_after", "status", "run_after"),
+        # не больше одной ждущей/выполняющейся задачи на ключ — даже если два
+        # запроса одновременно прошли проверку в tasks.enqueue
+        db.Index(
+            "uq_background_tasks_active_key", "idempotency_key", unique=True,
+            sqlite_where=db.text("status IN ('pending', 'running')"),
+            postgresql_where=db.text("status IN ('pending', 'running')"),
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")  # JSON с аргументами обработчика
+    # Пока задача с этим ключом не выполнена, повторная постановка не
+    # создаёт дубль (см. tasks.enqueue и uq_background_tasks_active_key).
+    idempotency_key = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON возвращённого обработчиком значения
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<BackgroundTask {self.kind!r} status={self.status!r} attempts={self.attempts}>"
+
+
+# --- поисковый индекс /search (app/search_index.py) ---
+
+class SearchPosting(db.Model):
+    """Токен карточки каталога в обратном индексе поиска: «в карточке
+    entity_type/entity_id есть нормализованное слово token». Строки
+    пересчитываются автоматически при сохранении карточки (события сессии,
+    см. app/search_index.py); полная перестройка — `flask search-reindex`."""
+
+    __tablename__ = "search_postings"
+    __table_args__ = (
+        db.Index("ix_search_postings_entity", "entity_type", "entity_id"),
+    )
+
+    # token первым в первичном ключе — поиск по префиксу идёт диапазоном по
+    # его индексу. Порядок строк должен быть побайтовым: в SQLite он такой
+    # по умолчанию, в PostgreSQL — только с collation "C" (с локалью БД
+    # диапазон «от префикса до следующего за ним» терял бы строки).
+    token = db.Column(
+        db.String(64).with_variant(db.String(64, collation="C"), "postgresql"), primary_key=True,
+    )
+    entity_type = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    weight = db.Column(db.Integer, nullable=False, default=1)  # заголовок весит больше описания
+
+    def __repr__(self):
+        return f"<SearchPosting {self.token!r} {self.entity_type}/{self.entity_id}>"
+
+
+# --- пространственный индекс карты (app/geo_index.py) ---
+
+class GeoPoint(db.Model):
+    """Точка карточки на карте: своя (latitude/longitude карточки) или, если
+    её нет, центр региона — approximate=True (см. map._effective_coords).
+    Строки пересчитываются при сохранении карточек и регионов (события
+    сессии, app/geo_index.py); полная перестройка — `flask geo-reindex`."""
+
+    __tablename__ = "geo_points"
+    __table_args__ = (
+        # поиск в радиусе: сначала полоса широт по индексу, затем долгота
+        db.Index("ix_geo_points_kind_lat", "kind", "lat"),
+    )
+
+    kind = db.Column(db.String(20), primary_key=True)  # executor | constructor | seller
+    entity_id = db.Column(db.Integer, primary_key=True)
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    approximate = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<GeoPoint {self.kind}/{self.entity_id} ({self.lat}, {self.lng})>"
+
+
+# --- версии кэшей (app/cache_versions.py) ---
+
+class CacheVersion(db.Model):
+    """Счётчик версии данных, от которых зависит кэш (слои карты и т.п.).
+    Увеличивается в той же транзакции, что и сама правка, поэтому все
+    процессы gunicorn видят смену версии сразу после коммита."""
+
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
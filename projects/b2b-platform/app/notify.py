@@ -6,7 +6,10 @@
 получателя привязан Telegram и на сервере настроен TELEGRAM_BOT_TOKEN,
 дублирует её сообщением в Telegram. Пока бот не подключён (нет токена),
 работает только in-app канал — это не заглушка, а нормальная деградация
-функциональности, как и с Resend/Google выше по коду."""
+функциональности, как и с Resend/Google выше по коду.
+
+Сама отправка во внешние каналы — в app/delivery.py: для рассылки многим
+получателям сразу (notify_many) запросы идут параллельно."""
 from datetime import datetime
 
 from app import db
@@ -14,21 +17,33 @@ from app.models import Notification
 
 
 def notify(user, type_, title, body=None, url=None):
-    notification = Notification(user_id=user.id, type=type_, title=title, body=body, url=url)
-    db.session.add(notification)
+    return notify_many([user], type_, title, body, url)[0]
+
+
+def notify_many(users, type_, title, body=None, url=None):
+    """Одно и то же уведомление нескольким пользователям — с одной пачкой
+    отправок в Telegram/FCM. Сохраняет их сама (commit): большинство
+    вызовов идёт уже после коммита основной правки, и без этого уведомления
+    (и счётчики непрочитанного, app/unread.py) откатывались в конце запроса.
+
+    Коммитов два. Первый — уведомления, счётчики и всё, что вызывающий код
+    добавил в сессию, — до отправок: UPDATE счётчиков блокирует строки
+    получателей (до BROADCAST_BATCH_SIZE пользователей), а отправки с
+    ожиданием лимитов Telegram и таймаутами идут секундами. Второй, короткий, —
+    итоги доставки (telegram_sent, задержки, неудачи)."""
+    from app.delivery import deliver  # локальный импорт — модуль 7
+
+    notifications = [
+        Notification(user_id=user.id, type=type_, title=title, body=body, url=url) for user in users
+    ]
+    db.session.add_all(notifications)
     db.session.flush()
-
-    from app.telegram_bot import send_telegram_notification  # локальный импорт — модуль 7
-    from app.push import send_push_to_user
-
-    sent = send_telegram_notification(user, title, body, url)
-    if sent:
-        notification.telegram_sent = True
-
-    send_push_to_user(user, title, body, url)
-
-    return notification
-
-
-def unread_count(user):
-    return Notification.query.filter_by(user_id=user.id, read_at=None).count()
+    ids = [n.id for n in notifications]
+    db.session.commit()
+    if ids:
+        # коммит их устарил — перечитываем одним запросом, а не по одному на
+        # уведомление при первом обращении в deliver()
+        Notification.query.filter(Notification.id.in_(ids)).all()
+    deliver(notifications)
+    db.session.commit()
+    return notifications
@@ -0,0 +1,180 @@
+"""Счётчик посещений: буфер просмотров страниц и сводные таблицы.
+
+Раньше _count_page_view (app/__init__.py) на каждую HTML-страницу делал
+отдельный INSERT + COMMIT, а /admin/stats считал весь лог PageView и
+поднимал в Python метки времени за две недели. Теперь:
+
+- record() только кладёт просмотр в буфер процесса; фоновый поток пишет
+  буфер пачкой раз в PAGE_VIEWS_FLUSH_SECONDS секунд (или сразу, если
+  набралось PAGE_VIEWS_BATCH_SIZE) — одна транзакция на пачку;
+- вместе с пачкой в той же транзакции увеличиваются сводные счётчики по
+  дням и часам (PageViewDaily/PageViewHourly) и пополняется список
+  посетителей (PageViewVisitor) — статистика читает только их;
+- сырой лог старше PAGE_VIEWS_RETENTION_DAYS и почасовая сводка старше
+  PAGE_VIEWS_HOURLY_DAYS удаляются (prune) — не чаще раза в час.
+
+Просмотры, не успевшие попасть в БД при аварийном падении процесса,
+теряются — для счётчика посещений это допустимо; при обычной остановке
+буфер дописывается (atexit). PAGE_VIEWS_FLUSH_SECONDS = 0 — писать сразу в
+запросе, без буфера (тесты).
+"""
+import atexit
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.counters import increment_or_insert
+from app.models import PageView, PageViewDaily, PageViewHourly, PageViewVisitor
+
+PAGE_VIEWS_BATCH_SIZE = 500
+PRUNE_INTERVAL = timedelta(hours=1)
+
+
+class PageViewBuffer:
+    """Буфер просмотров одного процесса и поток, который его сбрасывает."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config["PAGE_VIEWS_FLUSH_SECONDS"]
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_prune = None
+
+    def record(self, path, user_id):
+        row = {"path": path[:255], "user_id": user_id, "created_at": datetime.utcnow()}
+        if not self.interval:
+            self.flush([row])
+            return
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= PAGE_VIEWS_BATCH_SIZE
+            if self._thread is None:
+                self._start()
+        if full:
+            self._wake.set()
+
+    def _start(self):
+        # поток создаётся при первом просмотре — уже в процессе воркера
+        # gunicorn, а не в мастере до fork
+        self._thread = threading.Thread(target=self._run, name="page-views", daemon=True)
+        self._thread.start()
+        atexit.register(self.drain)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.drain()
+
+    def drain(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+        with self.app.app_context():
+            try:
+                self.flush(rows)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Не удалось записать %s просмотров страниц.", len(rows))
+            finally:
+                db.session.remove()
+
+    def flush(self, rows):
+        """Пишет просмотры и обновляет сводки одной транзакцией."""
+        connection = db.session.connection()
+        connection.execute(db.insert(PageView), rows)
+        add_to_rollups(connection, rows)
+        now = datetime.utcnow()
+        if self._last_prune is None or now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            prune(connection, now)
+        db.session.commit()
+
+
+def _increment(connection, model, key_column, counts):
+    for key, views in sorted(counts.items()):
+        increment_or_insert(connection, model, key_column, key, model.views, views)
+
+
+def add_to_rollups(connection, rows):
+    """Учитывает просмотры rows в сводных таблицах."""
+    _increment(connection, PageViewDaily, PageViewDaily.day, Counter(row["created_at"].date() for row in rows))
+    _increment(connection, PageViewHourly, PageViewHourly.hour, Counter(
+        row["created_at"].replace(minute=0, second=0, microsecond=0) for row in rows
+    ))
+
+    first_seen = {}
+    for row in rows:
+        if row["user_id"] is not None:
+            first_seen.setdefault(row["user_id"], row["created_at"])
+    if not first_seen:
+        return
+    known = set(connection.execute(
+        db.select(PageViewVisitor.user_id).where(PageViewVisitor.user_id.in_(first_seen))
+    ).scalars())
+    for user_id, seen_at in first_seen.items():
+        if user_id in known:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(db.insert(PageViewVisitor).values(user_id=user_id, first_seen_at=seen_at))
+        except IntegrityError:
+            pass  # уже добавил соседний процесс или пользователя только что удалили
+
+
+def prune(connection, now=None):
+    """Удаляет сырой лог и почасовую сводку старше сроков хранения."""
+    from flask import current_app
+
+    now = now or datetime.utcnow()
+    retention_days = current_app.config["PAGE_VIEWS_RETENTION_DAYS"]
+    hourly_days = current_app.config["PAGE_VIEWS_HOURLY_DAYS"]
+    deleted = connection.execute(
+        db.delete(PageView).where(PageView.created_at < now - timedelta(days=retention_days))
+    ).rowcount
+    connection.execute(db.delete(PageViewHourly).where(PageViewHourly.hour < now - timedelta(days=hourly_days)))
+    return deleted
+
+
+def init_app(app):
+    app.extensions["page_views"] = PageViewBuffer(app)
+
+
+def rebuild_rollups(batch_size=5000):
+    """Пересчитывает сводки по сырому логу (после первого деплоя — по
+    накопленным PageView). Возвращает число учтённых просмотров.
+
+    Пересчитываются только дни, которые целиком есть в логе: сводки старше
+    него (лог уже чистил prune) остаются как есть — иначе вместе с ними
+    пропала бы вся история старше PAGE_VIEWS_RETENTION_DAYS."""
+    connection = db.session.connection()
+    oldest = connection.execute(db.select(db.func.min(PageView.created_at))).scalar()
+    if oldest is None:
+        return 0
+    start = datetime.combine(oldest.date(), time.min)
+    if connection.execute(db.select(PageViewDaily.day).where(PageViewDaily.day < start.date()).limit(1)).first():
+        # до лога есть история — значит, его чистили, и первый день лога
+        # может быть неполным: его сводку не трогаем
+        start += timedelta(days=1)
+    connection.execute(db.delete(PageViewDaily).where(PageViewDaily.day >= start.date()))
+    connection.execute(db.delete(PageViewHourly).where(PageViewHourly.hour >= start))
+    connection.execute(db.delete(PageViewVisitor).where(PageViewVisitor.first_seen_at >= start))
+    total, last_id = 0, 0
+    while True:
+        batch = connection.execute(
+            db.select(PageView.id, PageView.user_id, PageView.created_at)
+            .where(PageView.id > last_id, PageView.created_at >= start).order_by(PageView.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        add_to_rollups(connection, [{"user_id": user_id, "created_at": created_at} for _, user_id, created_at in batch])
+        total += len(batch)
+        last_id = batch[-1][0]
+    db.session.commit()
+    return total
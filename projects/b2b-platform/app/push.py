@@ -6,14 +6,21 @@
 как и с остальными внешними интеграциями в проекте (Resend/ImgBB/Telegram),
 это не заглушка, а нормальная деградация: in-app уведомления и Telegram
 продолжают работать."""
+import functools
 import json
 import time
 
 import requests
 from authlib.jose import jwt
 
+from app.delivery import http_session
+
 FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
 TOKEN_URL = "https://oauth2.googleapis.com/token"
+FCM_SEND_URL = "https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+STALE = "stale"  # результат отправки: FCM отверг токен устройства
+
+_http = http_session()  # keep-alive к FCM, общий для потоков app/delivery.py
 
 _token_cache = {"access_token": None, "expires_at": 0}
 
@@ -49,7 +56,7 @@ def _get_access_token(account):
     assertion = jwt.encode(header, payload, account["private_key"]).decode("utf-8")
 
     try:
-        resp = requests.post(
+        resp = _http.post(
             TOKEN_URL,
             data={"grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer", "assertion": assertion},
             timeout=10,
@@ -81,29 +88,37 @@ def _absolute_url(url):
     return (base.rstrip("/") + url) if base else url
 
 
-def send_push(device_token, title, body=None, url=None):
-    """Возвращает True, если push реально отправлен через FCM."""
-    from flask import current_app
-
+def prepare_sender():
+    """Функция отправки одного сообщения FCM (см. build_message) или None,
+    если FCM не настроен. Access token получается здесь, один раз на пачку,
+    — сама функция к Flask-конфигу не обращается и годится для потоков."""
     account = _service_account()
     if account is None:
-        current_app.logger.warning("FIREBASE_SERVICE_ACCOUNT_JSON не настроен — push не отправлен: %s", title[:120])
-        return False
-
+        return None
     access_token = _get_access_token(account)
     if access_token is None:
-        return False
+        return None
+    return functools.partial(_post_message, FCM_SEND_URL.format(project_id=account["project_id"]), access_token)
+
 
-    message = {
+def build_message(device_token, title, body=None, url=None):
+    return {
         "message": {
             "token": device_token,
             "notification": {"title": title, "body": body or ""},
             "data": {"url": _absolute_url(url)},
         }
     }
+
+
+def _post_message(send_url, access_token, message):
+    """True — отправлено, STALE — токен отозван (переустановка приложения,
+    разлогин), False — прочие ошибки."""
+    from flask import current_app
+
     try:
-        resp = requests.post(
-            f"https://fcm.googleapis.com/v1/projects/{account['project_id']}/messages:send",
+        resp = _http.post(
+            send_url,
             headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
             json=message, timeout=10,
         )
@@ -113,27 +128,32 @@ def send_push(device_token, title, body=None, url=None):
 
     if resp.status_code != 200:
         current_app.logger.warning("Ошибка отправки push (%s): %s", resp.status_code, resp.text[:200])
-        # Токен могли отозвать (переустановка приложения, разлогин) — чистим,
-        # чтобы не пытаться слать туда снова каждый раз.
-        if resp.status_code in (400, 404):
-            _forget_token(device_token)
-        return False
+        return STALE if resp.status_code in (400, 404) else False
     return True
 
 
-def _forget_token(device_token):
+def forget_tokens(device_tokens):
     from app import db
     from app.models import PushDeviceToken
 
-    PushDeviceToken.query.filter_by(token=device_token).delete()
+    PushDeviceToken.query.filter(PushDeviceToken.token.in_(device_tokens)).delete(synchronize_session=False)
     db.session.commit()
 
 
 def send_push_to_user(user, title, body=None, url=None):
     """Шлёт на все устройства пользователя, возвращает True если хотя бы
-    на одно ушло успешно."""
-    sent_any = False
-    for device in user.push_tokens:
-        if send_push(device.token, title, body, url):
-            sent_any = True
-    return sent_any
+    на одно ушло успешно. Уведомления платформы идут через app/delivery.py
+    пачкой — эта функция для разовых отправок одному пользователю."""
+    from flask import current_app
+
+    sender = prepare_sender()
+    if sender is None:
+        current_app.logger.warning("FIREBASE_SERVICE_ACCOUNT_JSON не настроен — push не отправлен: %s", title[:120])
+        return False
+
+    results = {device.token: sender(build_message(device.token, title, body, url)) for device in user.push_tokens}
+    stale = [token for token, result in results.items() if result == STALE]
+    if stale:
+        # чистим, чтобы не пытаться слать туда снова каждый раз
+        forget_tokens(stale)
+    return any(result is True for result in results.values())
@@ -0,0 +1,136 @@
+"""Рейтинги профилей по опубликованным отзывам (модуль 5).
+
+Раньше публикация пары отзывов поднимала все опубликованные отзывы о
+пользователе и заново усредняла их в Python. Теперь у профилей исполнителя
+и заказчика есть rating_sum и reviews_count, а rating_avg считается из них
+тем же UPDATE. После каждого flush сессии учитываются опубликованные,
+снятые с публикации, удалённые и переоценённые опубликованные отзывы —
+атомарным UPDATE ... SET rating_sum = rating_sum + delta в той же
+транзакции, так что параллельные публикации агрегаты не портят.
+
+Отзыв «заказчик → исполнитель» идёт в рейтинг ExecutorProfile, обратный —
+в CustomerProfile. Сверка с данными — `flask ratings-recount` (recount():
+один GROUP BY по отзывам на тип профиля, см. app/flush_hooks.py); её стоит
+запускать по cron, например раз в сутки.
+"""
+from sqlalchemy import event, inspect
+
+from app import cache_versions, db
+from app.flush_hooks import counter_values, expire_after_flush, mark_stale
+from app.models import CustomerProfile, ExecutorProfile, Review
+
+_TARGETS = {"customer_to_executor": ExecutorProfile, "executor_to_customer": CustomerProfile}
+
+# numeric в PostgreSQL и real в SQLite — чтобы деление суммы на число
+# отзывов не было целочисленным
+_ONE = db.literal_column("1.0")
+
+
+def _average(total, count):
+    return db.case((count > 0, db.func.round(total * _ONE / count, 2)), else_=None)
+
+
+def _committed(review, attr, default):
+    history = inspect(review).attrs[attr].history
+    if not history.has_changes():
+        return getattr(review, attr)
+    # deleted пуст, если прежнее значение не было загружено
+    return history.deleted[0] if history.deleted else default
+
+
+def _contribution(published, rating):
+    return (1, rating) if published else (0, 0)
+
+
+def _after_flush(session, flush_context):
+    changes = []  # (отзыв, (число, сумма) до, (число, сумма) после)
+    for obj in session.new:
+        if isinstance(obj, Review):
+            changes.append((obj, (0, 0), _contribution(obj.is_published, obj.rating)))
+    for obj in session.dirty:
+        if isinstance(obj, Review):
+            before = _contribution(_committed(obj, "is_published", False), _committed(obj, "rating", obj.rating))
+            changes.append((obj, before, _contribution(obj.is_published, obj.rating)))
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            before = _contribution(_committed(obj, "is_published", False), _committed(obj, "rating", obj.rating))
+            changes.append((obj, before, (0, 0)))
+
+    deltas = {}  # (модель профиля, user_id) -> [изменение числа, изменение суммы]
+    for review, before, after in changes:
+        if before == after or review.direction not in _TARGETS:
+            continue
+        delta = deltas.setdefault((_TARGETS[review.direction], review.target_id), [0, 0])
+        delta[0] += after[0] - before[0]
+        delta[1] += after[1] - before[1]
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    connection = session.connection()
+    for model in sorted({model for model, _ in deltas}, key=lambda model: model.__tablename__):
+        profiles = dict(connection.execute(
+            db.select(model.user_id, model.id)
+            .where(model.user_id.in_([user_id for key_model, user_id in deltas if key_model is model]))
+        ).all())
+        for user_id, profile_id in sorted(profiles.items()):
+            count_delta, sum_delta = deltas[(model, user_id)]
+            count = model.reviews_count + count_delta
+            total = model.rating_sum + sum_delta
+            connection.execute(
+                db.update(model).where(model.id == profile_id).values(counter_values(
+                    model, reviews_count=count, rating_sum=total, rating_avg=_average(total, count),
+                ))
+            )
+        # рейтинг виден на карте — её кэш должен устареть, как при правке через ORM
+        cache_versions.bump_model(connection, model)
+        mark_stale(session, model, profiles.values())
+
+
+for _model in _TARGETS.values():
+    expire_after_flush(_model, ["rating_avg", "rating_sum", "reviews_count"])
+event.listen(db.session, "after_flush", _after_flush)
+
+
+def recount():
+    """Сверяет рейтинги всех профилей с опубликованными отзывами и исправляет
+    разошедшиеся. Возвращает число исправленных профилей."""
+    connection = db.session.connection()
+    fixed = 0
+    for direction, model in _TARGETS.items():
+        totals = (
+            db.select(
+                Review.target_id,
+                db.func.count(Review.id).label("count"),
+                db.func.sum(Review.rating).label("total"),
+            )
+            .where(Review.direction == direction, Review.is_published.is_(True))
+            .group_by(Review.target_id)
+            .subquery()
+        )
+        count = db.func.coalesce(totals.c.count, 0)
+        total = db.func.coalesce(totals.c.total, 0)
+        drifted = connection.execute(
+            db.select(model.id, count, total)
+            .outerjoin_from(model, totals, totals.c.target_id == model.user_id)
+            .where(db.or_(
+                model.reviews_count != count,
+                model.rating_sum != total,
+                db.and_(count > 0, model.rating_avg.is_(None)),
+                db.and_(count == 0, model.rating_avg.is_not(None)),
+            ))
+        ).all()
+        if not drifted:
+            continue
+        new_count = db.bindparam("new_count", type_=db.Integer)
+        new_total = db.bindparam("new_total", type_=db.Integer)
+        connection.execute(
+            db.update(model).where(model.id == db.bindparam("profile_id")).values(counter_values(
+                model, reviews_count=new_count, rating_sum=new_total, rating_avg=_average(new_total, new_count),
+            )),
+            [{"profile_id": row[0], "new_count": row[1], "new_total": row[2]} for row in drifted],
+        )
+        cache_versions.bump_model(connection, model)
+        fixed += len(drifted)
+    db.session.commit()
+    return fixed
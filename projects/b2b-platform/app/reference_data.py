@@ -0,0 +1,185 @@
+"""Кэш справочников: регионы, города, категории услуг, материалы и т.п.
+
+Почти каждая форма и лента заново поднимала из БД справочники для
+выпадающих списков (Region, ServiceCategory, Material, … ORDER BY name_ru),
+а каскадный список городов (/profile/cities/<id>.json) — города региона при
+каждой смене региона. Справочники меняются только через seed.py и админку,
+поэтому теперь они целиком лежат в памяти процесса (Snapshot) вместе с
+версией "reference" (app/cache_versions.py): любая запись в эти таблицы
+через ORM увеличивает версию, и следующий запрос перечитывает справочники.
+Пока версия та же, список стоит один SELECT версии по первичному ключу.
+
+Записи — не ORM-объекты, а лёгкие Entry с теми же id/name_*/name(lang):
+их безопасно держать между запросами. Списки отдаются уже отсортированными
+по названию на языке интерфейса (items), сортировка считается один раз на
+версию и язык.
+
+REFERENCE_SNAPSHOT_DIR — если задан, процесс, первым прочитавший
+справочники новой версии, кладёт их туда файлом reference-<версия>.json, а
+остальные воркеры gunicorn читают файл вместо БД. Без него каждый процесс
+читает справочники сам — их всего несколько сотен строк.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from glob import glob
+
+from flask import current_app
+
+from app import cache_versions, db
+from app.models import (
+    City, EquipmentType, ListingCategory, Material, MaterialForm, ProfessionCategory, Region, ServiceCategory,
+)
+
+VERSION_NAME = "reference"
+
+REFERENCE_TABLES = {
+    "regions": Region,
+    "cities": City,
+    "equipment_types": EquipmentType,
+    "service_categories": ServiceCategory,
+    "materials": Material,
+    "listing_categories": ListingCategory,
+    "material_forms": MaterialForm,
+    "profession_categories": ProfessionCategory,
+}
+_COLUMNS = ("id", "name_ru", "name_uz_latin", "name_uz_cyrillic", "region_id", "latitude", "longitude")
+
+for _model in REFERENCE_TABLES.values():
+    cache_versions.track(VERSION_NAME, _model)
+
+
+class Entry:
+    """Запись справочника вне сессии БД."""
+
+    __slots__ = _COLUMNS
+
+    def __init__(self, **values):
+        for column in _COLUMNS:
+            setattr(self, column, values.get(column))
+
+    def name(self, lang):
+        return getattr(self, f"name_{lang}", None) or self.name_ru
+
+    def __repr__(self):
+        return f"<Entry {self.id} {self.name_ru!r}>"
+
+
+class Snapshot:
+    """Все справочники одной версии."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows  # {таблица: [dict]} — как в файле снимка
+        self._entries = {table: [Entry(**row) for row in table_rows] for table, table_rows in rows.items()}
+        self._sorted = {}
+        self._cities = {}
+
+    def items(self, table, lang):
+        key = (table, lang)
+        items = self._sorted.get(key)
+        if items is None:
+            # гонка потоков безвредна: оба посчитают одно и то же
+            items = sorted(self._entries[table], key=lambda entry: (entry.name(lang).casefold(), entry.id))
+            self._sorted[key] = items
+        return items
+
+    def cities_json(self, region_id, lang):
+        """(тело JSON, ETag) городов региона — как у /profile/cities/<id>.json."""
+        key = (region_id, lang)
+        cached = self._cities.get(key)
+        if cached is None:
+            body = json.dumps(
+                [{"id": city.id, "name": city.name(lang)} for city in self.items("cities", lang)
+                 if city.region_id == region_id],
+                ensure_ascii=False, separators=(",", ":"),
+            ).encode("utf-8")
+            cached = (body, hashlib.sha1(body).hexdigest())
+            self._cities[key] = cached
+        return cached
+
+
+def _read_rows():
+    rows = {}
+    for table, model in REFERENCE_TABLES.items():
+        columns = [getattr(model, column) for column in _COLUMNS if hasattr(model, column)]
+        rows[table] = [dict(row._mapping) for row in db.session.execute(db.select(*columns).order_by(model.id))]
+    return rows
+
+
+def _snapshot_path(directory, version):
+    return os.path.join(directory, f"reference-{version}.json")
+
+
+def _read_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_file(directory, version, rows):
+    """Атомарно: соседний воркер видит либо целый файл, либо никакого."""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp_path, _snapshot_path(directory, version))
+    except OSError:
+        current_app.logger.exception("Не удалось записать снимок справочников в %s.", directory)
+        return
+    for old in glob(os.path.join(directory, "reference-*.json")):
+        if old != _snapshot_path(directory, version):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+_lock = threading.Lock()
+
+
+def _load(version):
+    directory = current_app.config.get("REFERENCE_SNAPSHOT_DIR")
+    rows = _read_file(_snapshot_path(directory, version)) if directory else None
+    if rows is None:
+        rows = _read_rows()
+        if directory:
+            _write_file(directory, version, rows)
+    return Snapshot(version, rows)
+
+
+def snapshot():
+    """Справочники актуальной версии."""
+    # сначала версия, потом данные: правка между ними даст более свежие
+    # данные под старой версией (перечитаются на следующем запросе), но
+    # не наоборот
+    version = cache_versions.current(VERSION_NAME)
+    cached = current_app.extensions.get("reference_data")
+    if cached is None or cached.version != version:
+        with _lock:
+            cached = current_app.extensions.get("reference_data")
+            if cached is None or cached.version != version:
+                cached = _load(version)
+                current_app.extensions["reference_data"] = cached
+    return cached
+
+
+def items(table, lang=None):
+    """Записи справочника table, отсортированные по названию на языке lang
+    (по умолчанию — на языке интерфейса)."""
+    from app.i18n import get_current_lang
+
+    return snapshot().items(table, lang or get_current_lang())
+
+
+def cities_url_query():
+    """Query string для /profile/cities/<id>.json — с версией и языком,
+    чтобы ответ можно было кэшировать в браузере надолго (см. main.js)."""
+    from app.i18n import get_current_lang
+
+    return f"v={snapshot().version}&lang={get_current_lang()}"
@@ -9,7 +9,7 @@ from flask_login import current_user
 
 from sqlalchemy.exc import IntegrityError
 
-from app import db
+from app import db, feeds, reference_data
 from app.decorators import role_required
 from app.models import (
     City,
@@ -18,16 +18,14 @@ from app.models import (
     Dispute,
     ExecutorProfile,
     Listing,
-    ListingCategory,
     ListingResponse,
-    Material,
-    MaterialForm,
     MaterialListing,
     MaterialListingResponse,
     Order,
     PageView,
-    Region,
-    ServiceCategory,
+    PageViewDaily,
+    PageViewHourly,
+    PageViewVisitor,
     Subscription,
     User,
     record_status_change,
@@ -119,32 +117,38 @@ def orders_list():
 @bp.route("/stats")
 @role_required("admin")
 def stats():
-    """Счётчик посещений — считается по PageView (см. _count_page_view в
-    app/__init__.py). Разбивку по дням считаем в Python, а не SQL-группировкой
-    по дате: date()/DATE_TRUNC — по-разному работают в SQLite и PostgreSQL
-    (тот же урок, что и с поиском — см. app/routes/search.py)."""
-    from collections import Counter
-
-    today = date.today()
-    today_start = datetime(today.year, today.month, today.day)
-    total_views = PageView.query.count()
-    today_views = PageView.query.filter(PageView.created_at >= today_start).count()
-    known_visitors = db.session.query(PageView.user_id).filter(PageView.user_id.isnot(None)).distinct().count()
+    """Счётчик посещений — читается из сводок по дням/часам
+    (PageViewDaily/PageViewHourly, см. app/page_views.py), а не из сырого
+    лога PageView: по строке на день, сколько бы просмотров ни было.
+    Сутки и часы — в UTC, как и created_at просмотров."""
+    now = datetime.utcnow()
+    today = now.date()
+    total_views = db.session.query(db.func.coalesce(db.func.sum(PageViewDaily.views), 0)).scalar()
+    known_visitors = PageViewVisitor.query.count()
 
     range_start_date = today - timedelta(days=13)
-    range_start = datetime(range_start_date.year, range_start_date.month, range_start_date.day)
-    recent_created_at = [
-        row[0] for row in db.session.query(PageView.created_at).filter(PageView.created_at >= range_start).all()
-    ]
-    counts_by_date = Counter(ts.date() for ts in recent_created_at)
+    counts_by_date = dict(
+        db.session.query(PageViewDaily.day, PageViewDaily.views).filter(PageViewDaily.day >= range_start_date)
+    )
     daily = [
         {"date": range_start_date + timedelta(days=i), "count": counts_by_date.get(range_start_date + timedelta(days=i), 0)}
         for i in range(14)
     ]
+    today_views = counts_by_date.get(today, 0)
+
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    range_start_hour = current_hour - timedelta(hours=23)
+    counts_by_hour = dict(
+        db.session.query(PageViewHourly.hour, PageViewHourly.views).filter(PageViewHourly.hour >= range_start_hour)
+    )
+    hourly = [
+        {"hour": range_start_hour + timedelta(hours=i), "count": counts_by_hour.get(range_start_hour + timedelta(hours=i), 0)}
+        for i in range(24)
+    ]
 
     return render_template(
         "admin/stats.html", total_views=total_views, today_views=today_views,
-        known_visitors=known_visitors, daily=daily,
+        known_visitors=known_visitors, daily=daily, hourly=hourly,
     )
 
 
@@ -197,8 +201,8 @@ def reject_subscription(subscription_id):
 @bp.route("/users")
 @role_required("admin")
 def users_list():
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template("admin/users.html", users=users)
+    users = feeds.paginate(User.query, (User.created_at, User.id), request.args.get("cursor"))
+    return render_template("admin/users.html", users=users, total=db.session.query(db.func.count(User.id)).scalar())
 
 
 @bp.route("/users/<int:user_id>")
@@ -282,7 +286,7 @@ def edit_user_profile(user_id):
 
     return render_template(
         "admin/edit_profile.html", target_user=user, profile=profile,
-        regions=Region.query.order_by(Region.name_ru).all(),
+        regions=reference_data.items("regions"),
     )
 
 
@@ -337,9 +341,9 @@ def edit_user_order(user_id, order_id):
 
     return render_template(
         "admin/edit_order.html", target_user=order.customer.user, order=order,
-        regions=Region.query.order_by(Region.name_ru).all(),
-        service_categories=ServiceCategory.query.order_by(ServiceCategory.name_ru).all(),
-        materials=Material.query.order_by(Material.name_ru).all(),
+        regions=reference_data.items("regions"),
+        service_categories=reference_data.items("service_categories"),
+        materials=reference_data.items("materials"),
     )
 
 
@@ -376,8 +380,8 @@ def edit_user_listing(user_id, listing_id):
 
     return render_template(
         "admin/edit_listing.html", target_user=listing.author, listing=listing,
-        regions=Region.query.order_by(Region.name_ru).all(),
-        categories=ListingCategory.query.order_by(ListingCategory.name_ru).all(),
+        regions=reference_data.items("regions"),
+        categories=reference_data.items("listing_categories"),
     )
 
 
@@ -413,9 +417,9 @@ def edit_user_material_listing(user_id, listing_id):
 
     return render_template(
         "admin/edit_material_listing.html", target_user=listing.author, listing=listing,
-        regions=Region.query.order_by(Region.name_ru).all(),
-        materials=Material.query.order_by(Material.name_ru).all(),
-        forms=MaterialForm.query.order_by(MaterialForm.name_ru).all(),
+        regions=reference_data.items("regions"),
+        materials=reference_data.items("materials"),
+        forms=reference_data.items("material_forms"),
     )
 
 
@@ -514,6 +518,7 @@ def delete_user(user_id):
     # PageView — просто лог посещений для статистики, не история сделки ни
     # с кем, поэтому тоже чистим вместе с пользователем, а не отказываем.
     PageView.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    PageViewVisitor.query.filter_by(user_id=user.id).delete(synchronize_session=False)
 
     db.session.delete(user)
     try:
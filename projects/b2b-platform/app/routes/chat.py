@@ -1,18 +1,23 @@
 """Модуль 11 — сообщения: диалог между любыми двумя пользователями
 платформы (кооперация производителей, обращение к конструктору-фрилансеру,
 вопрос по объявлению и т.п.), не привязанный к конкретному заказу."""
+import json
+import time
 from datetime import datetime
 
-from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, url_for
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import chat_events, db
 from app.decorators import paywall_required
 from app.models import Conversation, Message, Order, User
 from app.notify import notify
 
 bp = Blueprint("chat", __name__, url_prefix="/messages")
 
+CHAT_PAGE_SIZE = 50
+
 
 def _order_involves(order, user_id):
     if order.customer and order.customer.user_id == user_id:
@@ -54,6 +59,40 @@ def _get_or_create_conversation(user_id):
     return conversation
 
 
+def _messages_after(conversation_id, after_id):
+    """Keyset-страница: до CHAT_PAGE_SIZE сообщений с id > after_id, по порядку."""
+    return (
+        Message.query.filter(Message.conversation_id == conversation_id, Message.id > after_id)
+        .order_by(Message.id).limit(CHAT_PAGE_SIZE).all()
+    )
+
+
+def _mark_read(conversation_id, reader_id, messages=None):
+    """Отмечает прочитанными входящие сообщения (messages или все
+    непрочитанные в диалоге) — через ORM, чтобы обновились счётчики
+    (app/unread.py). Возвращает True, если что-то отмечено."""
+    if messages is None:
+        messages = Message.query.filter(
+            Message.conversation_id == conversation_id, Message.sender_id != reader_id, Message.read_at.is_(None),
+        ).all()
+    now = datetime.utcnow()
+    changed = False
+    for m in messages:
+        if m.sender_id != reader_id and m.read_at is None:
+            m.read_at = now
+            changed = True
+    return changed
+
+
+def _message_json(m, user_id):
+    return {
+        "id": m.id,
+        "own": m.sender_id == user_id,
+        "body": m.body,
+        "created_at": m.created_at.strftime("%d.%m.%Y %H:%M"),
+    }
+
+
 @bp.route("")
 @paywall_required
 def inbox():
@@ -61,15 +100,22 @@ def inbox():
         Conversation.query.filter(
             db.or_(Conversation.user_a_id == current_user.id, Conversation.user_b_id == current_user.id)
         )
+        .options(
+            selectinload(Conversation.user_a), selectinload(Conversation.user_b),
+            selectinload(Conversation.last_message),
+        )
         .order_by(Conversation.last_message_at.desc())
         .all()
     )
-    items = []
-    for conversation in conversations:
-        other = conversation.other_user(current_user)
-        last_message = conversation.messages[-1] if conversation.messages else None
-        unread = sum(1 for m in conversation.messages if m.sender_id != current_user.id and m.read_at is None)
-        items.append({"conversation": conversation, "other": other, "last_message": last_message, "unread": unread})
+    items = [
+        {
+            "conversation": conversation,
+            "other": conversation.other_user(current_user),
+            "last_message": conversation.last_message,
+            "unread": conversation.unread_for(current_user),
+        }
+        for conversation in conversations
+    ]
     return render_template("chat/inbox.html", items=items)
 
 
@@ -102,6 +148,7 @@ def thread(user_id):
         db.session.add(Message(conversation_id=conversation.id, sender_id=current_user.id, body=body))
         conversation.last_message_at = datetime.utcnow()
         db.session.commit()
+        chat_events.broker.publish(conversation.id)
 
         preview = body if len(body) <= 200 else body[:197] + "..."
         notify(
@@ -111,48 +158,100 @@ def thread(user_id):
         return redirect(url_for("chat.thread", user_id=user_id, order_id=order.id if order else None))
 
     conversation = _find_conversation(user_id)
+    messages, older_id = [], None
+    before_id = request.args.get("before_id", type=int)
     if conversation is not None:
-        now = datetime.utcnow()
-        changed = False
-        for m in conversation.messages:
-            if m.sender_id != current_user.id and m.read_at is None:
-                m.read_at = now
-                changed = True
-        if changed:
+        query = Message.query.filter(Message.conversation_id == conversation.id)
+        if before_id:
+            query = query.filter(Message.id < before_id)
+        page = query.order_by(Message.id.desc()).limit(CHAT_PAGE_SIZE + 1).all()
+        messages = page[:CHAT_PAGE_SIZE][::-1]
+        if len(page) > CHAT_PAGE_SIZE:
+            older_id = messages[0].id
+        if _mark_read(conversation.id, current_user.id):
             db.session.commit()
 
-    return render_template("chat/thread.html", other=other, conversation=conversation, order=order)
+    return render_template(
+        "chat/thread.html", other=other, conversation=conversation, order=order, messages=messages,
+        older_id=older_id, live=before_id is None,
+    )
 
 
 @bp.route("/u/<int:user_id>/new.json")
 @paywall_required
 def new_messages(user_id):
-    """Опрашивается со страницы диалога (см. thread.html), чтобы новые
-    сообщения появлялись без ручного обновления страницы — без вебсокетов,
-    просто короткий polling раз в несколько секунд."""
+    """Новые сообщения после after_id — запасной путь для браузеров без
+    EventSource и для вкладок, которым не досталось потока (см. thread.html);
+    основной — поток events ниже."""
     after_id = request.args.get("after_id", type=int) or 0
     conversation = _find_conversation(user_id)
     if conversation is None:
         return jsonify({"messages": []})
 
-    new = [m for m in conversation.messages if m.id > after_id]
-    now = datetime.utcnow()
-    changed = False
-    for m in new:
-        if m.sender_id != current_user.id and m.read_at is None:
-            m.read_at = now
-            changed = True
-    if changed:
+    new = _messages_after(conversation.id, after_id)
+    payload = [_message_json(m, current_user.id) for m in new]
+    if _mark_read(conversation.id, current_user.id, new):
         db.session.commit()
+    return jsonify({"messages": payload})
+
+
+@bp.route("/u/<int:user_id>/events")
+@paywall_required
+def events(user_id):
+    """Server-Sent Events: новые сообщения диалога по мере появления
+    (app/chat_events.py). 204 — браузер не переподключается и переходит на
+    опрос new.json: если диалога пока нет или в процессе уже открыто
+    SSE_MAX_STREAMS потоков."""
+    conversation = _find_conversation(user_id)
+    if conversation is None:
+        return "", 204
+    if not chat_events.stream_slots.acquire(blocking=False):
+        return "", 204
+    try:
+        last_id = request.headers.get("Last-Event-ID", type=int) or request.args.get("after_id", type=int) or 0
+        stream = _event_stream(current_app._get_current_object(), conversation.id, current_user.id, last_id)
+        response = current_app.response_class(stream, mimetype="text/event-stream")
+    except BaseException:
+        chat_events.stream_slots.release()
+        raise
+    # не в finally генератора: если клиент ушёл до первого чанка, генератор
+    # так и не запустится, а call_on_close вызывается всегда
+    response.call_on_close(chat_events.stream_slots.release)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # nginx не должен копить поток
+    return response
+
 
-    return jsonify({
-        "messages": [
-            {
-                "id": m.id,
-                "own": m.sender_id == current_user.id,
-                "body": m.body,
-                "created_at": m.created_at.strftime("%d.%m.%Y %H:%M"),
-            }
-            for m in new
-        ]
-    })
+def _event_stream(app, conversation_id, reader_id, last_id):
+    """Генератор потока: дочитывает сообщения после last_id при каждом
+    сигнале брокера (или раз в SSE_POLL_SECONDS). Сессия БД открывается
+    только на время чтения, между сигналами соединение не держится."""
+    broker = chat_events.broker
+    inbox = broker.subscribe(conversation_id)
+    try:
+        yield f"retry: {chat_events.SSE_RETRY_MS}\n\n"
+        deadline = time.monotonic() + chat_events.SSE_MAX_SECONDS
+        while True:
+            with app.app_context():
+                messages = _messages_after(conversation_id, last_id)
+                count = len(messages)
+                if messages:
+                    last_id = messages[-1].id
+                chunk = "".join(
+                    chat_events.sse_event(m.id, "message", json.dumps(_message_json(m, reader_id), ensure_ascii=False))
+                    for m in messages
+                )
+                if _mark_read(conversation_id, reader_id, messages):
+                    db.session.commit()
+            if count:
+                yield chunk
+                if count == CHAT_PAGE_SIZE:
+                    continue  # дочитать остальное сразу
+            else:
+                yield ": ping\n\n"
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            broker.wait(inbox, min(chat_events.SSE_POLL_SECONDS, remaining))
+    finally:
+        broker.unsubscribe(conversation_id, inbox)
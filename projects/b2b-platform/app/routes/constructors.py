@@ -2,10 +2,11 @@
 исполнитель), к которой может обратиться любая из сторон, если у своего
 предприятия нет штатного конструктора."""
 from flask import Blueprint, abort, render_template, request
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import db, feeds, reference_data
 from app.decorators import paywall_required
-from app.models import ConstructorProfile, Region, User
+from app.models import ConstructorProfile, User
 
 bp = Blueprint("constructors", __name__, url_prefix="/constructors")
 
@@ -30,10 +31,13 @@ def index():
     if region_id:
         query = query.filter(ConstructorProfile.region_id == region_id)
 
+    query = query.options(selectinload(ConstructorProfile.region), selectinload(ConstructorProfile.city))
     return render_template(
         "constructors/index.html",
-        constructors=query.order_by(ConstructorProfile.display_name).all(),
-        regions=Region.query.order_by(Region.name_ru).all(),
+        constructors=feeds.paginate(
+            query, (ConstructorProfile.display_name, ConstructorProfile.id), request.args.get("cursor"), descending=False,
+        ),
+        regions=reference_data.items("regions"),
     )
 
 
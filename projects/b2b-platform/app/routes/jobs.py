@@ -1,10 +1,11 @@
 """Модуль 9 — вакансии и резюме, отклик в любую сторону."""
 from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import db, feeds, reference_data
 from app.decorators import email_confirmed_required, paywall_required
-from app.models import JobResponse, ProfessionCategory, Region, Resume, Vacancy
+from app.models import JobResponse, Resume, Vacancy
 from app.notify import notify
 
 bp = Blueprint("jobs", __name__)
@@ -36,10 +37,12 @@ def vacancies_index():
     if region_id:
         query = query.filter_by(region_id=region_id)
 
+    query = query.options(selectinload(Vacancy.profession_category), selectinload(Vacancy.region))
     return render_template(
-        "jobs/vacancies.html", vacancies=query.order_by(Vacancy.created_at.desc()).all(),
-        professions=ProfessionCategory.query.order_by(ProfessionCategory.name_ru).all(),
-        regions=Region.query.order_by(Region.name_ru).all(),
+        "jobs/vacancies.html",
+        vacancies=feeds.paginate(query, (Vacancy.created_at, Vacancy.id), request.args.get("cursor")),
+        professions=reference_data.items("profession_categories"),
+        regions=reference_data.items("regions"),
     )
 
 
@@ -47,8 +50,8 @@ def vacancies_index():
 @paywall_required
 @email_confirmed_required
 def vacancy_new():
-    professions = ProfessionCategory.query.order_by(ProfessionCategory.name_ru).all()
-    regions = Region.query.order_by(Region.name_ru).all()
+    professions = reference_data.items("profession_categories")
+    regions = reference_data.items("regions")
 
     if request.method == "POST":
         title = (request.form.get("title") or "").strip()
@@ -145,10 +148,12 @@ def resumes_index():
     if region_id:
         query = query.filter_by(region_id=region_id)
 
+    query = query.options(selectinload(Resume.profession_category), selectinload(Resume.region))
     return render_template(
-        "jobs/resumes.html", resumes=query.order_by(Resume.created_at.desc()).all(),
-        professions=ProfessionCategory.query.order_by(ProfessionCategory.name_ru).all(),
-        regions=Region.query.order_by(Region.name_ru).all(),
+        "jobs/resumes.html",
+        resumes=feeds.paginate(query, (Resume.created_at, Resume.id), request.args.get("cursor")),
+        professions=reference_data.items("profession_categories"),
+        regions=reference_data.items("regions"),
     )
 
 
@@ -156,8 +161,8 @@ def resumes_index():
 @paywall_required
 def resume_edit():
     resume = Resume.query.filter_by(candidate_id=current_user.id).first()
-    professions = ProfessionCategory.query.order_by(ProfessionCategory.name_ru).all()
-    regions = Region.query.order_by(Region.name_ru).all()
+    professions = reference_data.items("profession_categories")
+    regions = reference_data.items("regions")
 
     if request.method == "POST":
         profession_category_id = _to_int(request.form.get("profession_category_id"))
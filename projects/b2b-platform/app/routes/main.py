@@ -1,7 +1,7 @@
 """Главная страница (открыта всем) и переключение языка интерфейса."""
 import os
 
-from flask import Blueprint, current_app, redirect, render_template, request, session, url_for
+from flask import Blueprint, current_app, g, redirect, render_template, request, session, url_for
 from flask_login import current_user
 
 from app.decorators import paywall_required
@@ -63,6 +63,7 @@ def set_language(lang):
     if lang not in SUPPORTED_LANGUAGES:
         lang = "ru"
     session["lang"] = lang
+    g.lang = lang  # язык этого запроса уже определён (app/i18n.py)
     if current_user.is_authenticated:
         from app import db
 
@@ -146,10 +147,12 @@ def notifications():
     from app.models import Notification
 
     items = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).limit(100).all()
-    unread_ids = [n.id for n in items if n.read_at is None]
-    if unread_ids:
-        Notification.query.filter(Notification.id.in_(unread_ids)).update(
-            {"read_at": datetime.utcnow()}, synchronize_session=False
-        )
+    unread = [n for n in items if n.read_at is None]
+    if unread:
+        # через ORM, а не массовым UPDATE — так счётчик в шапке (app/unread.py)
+        # уменьшится вместе с отметкой
+        now = datetime.utcnow()
+        for n in unread:
+            n.read_at = now
         db.session.commit()
     return render_template("main/notifications.html", items=items)
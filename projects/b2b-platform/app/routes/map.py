@@ -1,10 +1,13 @@
 """Модуль 4 — интерактивная карта Узбекистана и гео-поиск исполнителей."""
 from flask import Blueprint, jsonify, render_template, request, url_for
 from flask_login import login_required
+from sqlalchemy.orm import selectinload
 
+from app import db, geo_index, map_cache, map_tiles, reference_data
 from app.decorators import paywall_required
-from app.geo import haversine_km
-from app.models import ConstructorProfile, ExecutorProfile, Listing, Region, ServiceCategory, User
+from app.models import (
+    ConstructorProfile, ExecutorCapability, ExecutorProfile, GeoPoint, Listing, User, capability_services,
+)
 
 bp = Blueprint("map", __name__)
 
@@ -113,8 +116,8 @@ def _seller_payload(listing):
 def index():
     return render_template(
         "map/index.html",
-        regions=Region.query.order_by(Region.name_ru).all(),
-        service_categories=ServiceCategory.query.order_by(ServiceCategory.name_ru).all(),
+        regions=reference_data.items("regions"),
+        service_categories=reference_data.items("service_categories"),
         constructors_view=request.args.get("constructors") == "1",
     )
 
@@ -122,98 +125,185 @@ def index():
 @bp.route("/map/executors.json")
 @login_required
 def executors_json():
-    query = _visible_executors_query()
-
     org_type = request.args.get("org_type")
-    if org_type in ("master", "tsekh", "zavod"):
-        query = query.filter(ExecutorProfile.org_type == org_type)
+    filters = (
+        org_type if org_type in ("master", "tsekh", "zavod") else None,
+        request.args.get("region_id", type=int) or None,
+        request.args.get("min_rating", type=float) or None,
+        request.args.get("has_design_engineer") == "1",
+        request.args.get("service_category_id", type=int) or None,
+    )
+    return map_cache.layer_response("executor", filters, lambda: _executor_layer(*filters))
+
 
-    region_id = request.args.get("region_id", type=int)
+def _executor_layer(org_type, region_id, min_rating, has_design_engineer, service_category_id):
+    query = _visible_executors_query().options(
+        selectinload(ExecutorProfile.region),
+        selectinload(ExecutorProfile.equipment),
+        selectinload(ExecutorProfile.capability).selectinload(ExecutorCapability.service_categories),
+    )
+    if org_type:
+        query = query.filter(ExecutorProfile.org_type == org_type)
     if region_id:
         query = query.filter(ExecutorProfile.region_id == region_id)
-
-    min_rating = request.args.get("min_rating", type=float)
     if min_rating:
         query = query.filter(ExecutorProfile.rating_avg >= min_rating)
-
-    if request.args.get("has_design_engineer") == "1":
+    if has_design_engineer:
         query = query.filter(ExecutorProfile.has_design_engineer.is_(True))
-
-    service_category_id = request.args.get("service_category_id", type=int)
-    executors = query.all()
     if service_category_id:
-        executors = [
-            e for e in executors
-            if e.capability and any(s.id == service_category_id for s in e.capability.service_categories)
-        ]
+        query = query.filter(ExecutorProfile.id.in_(
+            db.select(ExecutorCapability.executor_id)
+            .join(capability_services, capability_services.c.capability_id == ExecutorCapability.id)
+            .where(capability_services.c.service_category_id == service_category_id)
+        ))
 
-    payloads = [_executor_payload(e) for e in executors if e.is_complete]
-    return jsonify([p for p in payloads if p["lat"] is not None])
+    payloads = [_executor_payload(e) for e in query if e.is_complete]
+    return [p for p in payloads if p["lat"] is not None]
 
 
 @bp.route("/map/constructors.json")
 @login_required
 def constructors_json():
-    query = _visible_constructors_query()
+    filters = (request.args.get("region_id", type=int) or None,)
+    return map_cache.layer_response("constructor", filters, lambda: _constructor_layer(*filters))
+
 
-    region_id = request.args.get("region_id", type=int)
+def _constructor_layer(region_id):
+    query = _visible_constructors_query().options(selectinload(ConstructorProfile.region))
     if region_id:
         query = query.filter(ConstructorProfile.region_id == region_id)
 
-    payloads = [_constructor_payload(c) for c in query.all() if c.is_complete]
-    return jsonify([p for p in payloads if p["lat"] is not None])
+    payloads = [_constructor_payload(c) for c in query if c.is_complete]
+    return [p for p in payloads if p["lat"] is not None]
 
 
 @bp.route("/map/sellers.json")
 @login_required
 def sellers_json():
-    query = _visible_sellers_query()
+    intent = request.args.get("intent")
+    filters = (request.args.get("region_id", type=int) or None, intent if intent in ("sell", "buy") else None)
+    return map_cache.layer_response("seller", filters, lambda: _seller_layer(*filters))
+
 
-    region_id = request.args.get("region_id", type=int)
+def _seller_layer(region_id, intent):
+    query = _visible_sellers_query().options(selectinload(Listing.region))
     if region_id:
         query = query.filter(Listing.region_id == region_id)
-
-    intent = request.args.get("intent")
-    if intent in ("sell", "buy"):
+    if intent:
         query = query.filter(Listing.listing_intent == intent)
 
-    payloads = [_seller_payload(listing) for listing in query.all()]
-    return jsonify([p for p in payloads if p["lat"] is not None])
+    payloads = [_seller_payload(listing) for listing in query]
+    return [p for p in payloads if p["lat"] is not None]
 
 
+# kind -> (загрузка видимых карточек по списку id, сериализация)
 _KIND_QUERIES = {
-    "executor": (lambda: [e for e in _visible_executors_query().all() if e.is_complete], _executor_payload),
-    "constructor": (lambda: [c for c in _visible_constructors_query().all() if c.is_complete], _constructor_payload),
-    "seller": (lambda: _visible_sellers_query().all(), _seller_payload),
+    "executor": (
+        lambda ids: [e for e in _visible_executors_query().filter(ExecutorProfile.id.in_(ids)) if e.is_complete],
+        _executor_payload,
+    ),
+    "constructor": (
+        lambda ids: [c for c in _visible_constructors_query().filter(ConstructorProfile.id.in_(ids)) if c.is_complete],
+        _constructor_payload,
+    ),
+    "seller": (lambda ids: _visible_sellers_query().filter(Listing.id.in_(ids)).all(), _seller_payload),
 }
 
 
+def _visible_hits(hits):
+    """[(kind, id, distance)] из geo_index -> [(kind, карточка, distance)]
+    только для карточек, видимых на карте, в том же порядке."""
+    ids_by_kind = {}
+    for kind, entity_id, _ in hits:
+        ids_by_kind.setdefault(kind, []).append(entity_id)
+    items = {}
+    for kind, ids in ids_by_kind.items():
+        fetch, _ = _KIND_QUERIES[kind]
+        items.update({(kind, item.id): item for item in fetch(ids)})
+    return [(kind, items[(kind, entity_id)], distance)
+            for kind, entity_id, distance in hits if (kind, entity_id) in items]
+
+
 @bp.route("/map/nearby.json")
 @login_required
 def nearby_json():
     """Геопоиск «рядом»: сортировка по расстоянию от точки. kinds= — через
     запятую, какие типы точек искать (executor,constructor,seller);
-    по умолчанию — только исполнители, как и раньше."""
+    по умолчанию — только исполнители, как и раньше. k= — вместо радиуса
+    вернуть k ближайших (на любом расстоянии).
+
+    Точки берутся из пространственного индекса (app/geo_index.py) — с
+    отсечением по прямоугольнику вокруг точки, а не перебором всех карточек."""
     lat = request.args.get("lat", type=float)
     lng = request.args.get("lng", type=float)
     radius_km = request.args.get("radius_km", type=float, default=25)
-    kinds = [k for k in (request.args.get("kinds") or "executor").split(",") if k in _KIND_QUERIES]
+    k = request.args.get("k", type=int)
+    kinds = [kind for kind in (request.args.get("kinds") or "executor").split(",") if kind in _KIND_QUERIES]
 
     if lat is None or lng is None:
         return jsonify({"error": "lat/lng обязательны"}), 400
+    if not kinds:
+        return jsonify([])
+
+    if k and k > 0:
+        found = geo_index.nearest(kinds, lat, lng, k, keep=_visible_hits)
+    else:
+        found = _visible_hits(geo_index.within_radius(kinds, lat, lng, radius_km))
 
     results = []
-    for kind in kinds:
-        fetch, payload_fn = _KIND_QUERIES[kind]
-        for item in fetch():
-            item_lat, item_lng, _ = _effective_coords(item)
-            if item_lat is None:
-                continue
-            distance = haversine_km(lat, lng, item_lat, item_lng)
-            if distance is not None and distance <= radius_km:
-                payload = payload_fn(item)
-                payload["distance_km"] = round(distance, 1)
-                results.append(payload)
-
-    results.sort(key=lambda item: item["distance_km"])
+    for kind, item, distance in found:
+        _, payload_fn = _KIND_QUERIES[kind]
+        payload = payload_fn(item)
+        payload["distance_km"] = round(distance, 1)
+        results.append(payload)
     return jsonify(results)
+
+
+# kind -> запрос id видимых и заполненных карточек слоя — is_complete в SQL,
+# чтобы индекс тайлов не поднимал ORM-объекты всех карточек
+_TILE_LAYERS = {
+    "executor": lambda: _visible_executors_query().filter(
+        ExecutorProfile.org_type.isnot(None),
+        ExecutorProfile.address_text.isnot(None),
+        ExecutorProfile.equipment.any(),
+        ExecutorProfile.capability.has(ExecutorCapability.service_categories.any()),
+    ).with_entities(ExecutorProfile.id),
+    "constructor": lambda: _visible_constructors_query().with_entities(ConstructorProfile.id),
+    "seller": lambda: _visible_sellers_query().with_entities(Listing.id),
+}
+
+
+def _tile_points(kind):
+    visible = _TILE_LAYERS[kind]()
+    return db.session.query(GeoPoint.entity_id, GeoPoint.lat, GeoPoint.lng).filter(
+        GeoPoint.kind == kind, GeoPoint.entity_id.in_(visible.scalar_subquery()),
+    ).all()
+
+
+def _tile_payload(kinds, zoom, x, y):
+    indexes = {kind: map_tiles.layer_index(kind, lambda kind=kind: _tile_points(kind)) for kind in kinds}
+    clusters, points = map_tiles.tile(indexes, zoom, x, y)
+
+    ids_by_kind = {}
+    for kind, entity_id in points:
+        ids_by_kind.setdefault(kind, []).append(entity_id)
+    payloads = []
+    for kind, ids in ids_by_kind.items():
+        fetch, payload_fn = _KIND_QUERIES[kind]
+        payloads += [payload_fn(item) for item in fetch(ids)]
+    return {"z": zoom, "x": x, "y": y, "clusters": clusters, "points": payloads}
+
+
+@bp.route("/map/tiles/<int:z>/<int:x>/<int:y>.json")
+@login_required
+def tile_json(z, x, y):
+    """Тайл карты: кластеры (на масштабах до map_tiles.MAX_CLUSTER_ZOOM)
+    и отдельные точки видимых карточек. kinds= — как у /map/nearby.json,
+    по умолчанию исполнители и продавцы. См. app/map_tiles.py."""
+    if not 0 <= z <= map_tiles.MAX_ZOOM or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        return jsonify({"error": "нет такого тайла"}), 404
+    requested = (request.args.get("kinds") or "executor,seller").split(",")
+    kinds = tuple(kind for kind in _TILE_LAYERS if kind in requested)
+    if not kinds:
+        return jsonify({"error": "kinds: executor, constructor, seller"}), 400
+    return map_cache.layer_response(kinds, (z, x, y), lambda: _tile_payload(kinds, z, x, y), tiles=True)
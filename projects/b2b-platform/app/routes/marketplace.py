@@ -1,10 +1,11 @@
 """Модуль 8 — барахолка: купля-продажа станков и инструмента."""
 from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import db, feeds, reference_data
 from app.decorators import email_confirmed_required, paywall_required
-from app.models import Listing, ListingCategory, ListingMedia, ListingResponse, Region
+from app.models import Listing, ListingMedia, ListingResponse
 from app.notify import notify
 from app.photos import upload_photo
 
@@ -39,11 +40,12 @@ def index():
     if region_id:
         query = query.filter_by(region_id=region_id)
 
-    listings = query.order_by(Listing.created_at.desc()).all()
+    query = query.options(selectinload(Listing.category), selectinload(Listing.region))
+    listings = feeds.paginate(query, (Listing.created_at, Listing.id), request.args.get("cursor"))
     return render_template(
         "marketplace/index.html", listings=listings,
-        categories=ListingCategory.query.order_by(ListingCategory.name_ru).all(),
-        regions=Region.query.order_by(Region.name_ru).all(),
+        categories=reference_data.items("listing_categories"),
+        regions=reference_data.items("regions"),
     )
 
 
@@ -51,8 +53,8 @@ def index():
 @paywall_required
 @email_confirmed_required
 def new_listing():
-    categories = ListingCategory.query.order_by(ListingCategory.name_ru).all()
-    regions = Region.query.order_by(Region.name_ru).all()
+    categories = reference_data.items("listing_categories")
+    regions = reference_data.items("regions")
 
     if request.method == "POST":
         title = (request.form.get("title") or "").strip()
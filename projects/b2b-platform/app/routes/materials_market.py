@@ -1,10 +1,11 @@
 """Модуль 10 — материалы и сырьё: купля-продажа листа, проката, труб, лома."""
 from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import db, feeds, reference_data
 from app.decorators import email_confirmed_required, paywall_required
-from app.models import Material, MaterialForm, MaterialListing, MaterialListingMedia, MaterialListingResponse, Region
+from app.models import MaterialListing, MaterialListingMedia, MaterialListingResponse
 from app.notify import notify
 from app.photos import upload_photo
 
@@ -42,11 +43,15 @@ def index():
     if region_id:
         query = query.filter_by(region_id=region_id)
 
+    query = query.options(
+        selectinload(MaterialListing.material), selectinload(MaterialListing.form), selectinload(MaterialListing.region),
+    )
     return render_template(
-        "materials/index.html", listings=query.order_by(MaterialListing.created_at.desc()).all(),
-        materials=Material.query.order_by(Material.name_ru).all(),
-        forms=MaterialForm.query.order_by(MaterialForm.name_ru).all(),
-        regions=Region.query.order_by(Region.name_ru).all(),
+        "materials/index.html",
+        listings=feeds.paginate(query, (MaterialListing.created_at, MaterialListing.id), request.args.get("cursor")),
+        materials=reference_data.items("materials"),
+        forms=reference_data.items("material_forms"),
+        regions=reference_data.items("regions"),
     )
 
 
@@ -54,9 +59,9 @@ def index():
 @paywall_required
 @email_confirmed_required
 def new_listing():
-    materials = Material.query.order_by(Material.name_ru).all()
-    forms = MaterialForm.query.order_by(MaterialForm.name_ru).all()
-    regions = Region.query.order_by(Region.name_ru).all()
+    materials = reference_data.items("materials")
+    forms = reference_data.items("material_forms")
+    regions = reference_data.items("regions")
 
     if request.method == "POST":
         title = (request.form.get("title") or "").strip()
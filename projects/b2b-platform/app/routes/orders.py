@@ -3,24 +3,22 @@ from datetime import date, datetime, timedelta
 
 from flask import Blueprint, abort, flash, redirect, render_template, request, send_from_directory, url_for
 from flask_login import current_user
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import auctions, db, feeds, reference_data
 from app.decorators import email_confirmed_required, paywall_required, role_required
 from app.files import order_uploads_dir, upload_order_file
-from app.matching import notify_unmatched_executors, run_matching
 from app.models import (
     Bid,
-    Material,
     Order,
     OrderAssignment,
     OrderMedia,
     OrderMatch,
-    Region,
-    ServiceCategory,
     record_status_change,
 )
 from app.notify import notify
 from app.photos import upload_photo
+from app.tasks import enqueue, task_result
 
 bp = Blueprint("orders", __name__)
 
@@ -82,9 +80,9 @@ def new_order():
             for e in errors:
                 flash(e, "error")
             return render_template(
-                "orders/new.html", regions=Region.query.order_by(Region.name_ru).all(),
-                service_categories=ServiceCategory.query.order_by(ServiceCategory.name_ru).all(),
-                materials=Material.query.order_by(Material.name_ru).all(), form=request.form,
+                "orders/new.html", regions=reference_data.items("regions"),
+                service_categories=reference_data.items("service_categories"),
+                materials=reference_data.items("materials"), form=request.form,
             )
 
         auction_hours = _to_int(request.form.get("auction_hours")) or 48
@@ -165,9 +163,11 @@ def new_order():
 
         db.session.commit()
 
-        matched = run_matching(order)
-        notify_unmatched_executors(order)
-        if matched:
+        matching = enqueue("match_order", {"order_id": order.id}, key=f"match_order:{order.id}")
+        matched = task_result(matching)
+        if matched is None:
+            flash("Заявка опубликована. Подбор исполнителей запущен — они получат уведомление в ближайшие минуты.", "success")
+        elif matched:
             flash(f"Заявка опубликована. Подобрано исполнителей: {matched}.", "success")
         else:
             flash("Заявка опубликована. Подходящих исполнителей пока не нашлось — мы оповестим вас, как только появятся.", "info")
@@ -175,9 +175,9 @@ def new_order():
         return redirect(url_for("orders.order_detail", order_id=order.id))
 
     return render_template(
-        "orders/new.html", regions=Region.query.order_by(Region.name_ru).all(),
-        service_categories=ServiceCategory.query.order_by(ServiceCategory.name_ru).all(),
-        materials=Material.query.order_by(Material.name_ru).all(), form={},
+        "orders/new.html", regions=reference_data.items("regions"),
+        service_categories=reference_data.items("service_categories"),
+        materials=reference_data.items("materials"), form={},
     )
 
 
@@ -211,25 +211,34 @@ def executor_dashboard():
     """Открытая лента: видно все опубликованные заявки (плюс свои
     заявки в работе/завершённые — если по ним была ставка), а не только те,
     что подобраны автоматически. Подобранные (совпадают станочный парк,
-    габариты, регион, подписка) помечаются как «Рекомендуем» и идут первыми —
+    габариты, регион, подписка) помечаются как «Рекомендуем» и идут первыми
+    на своей странице ленты (app/feeds.py) —
     так исполнитель без заполненного профиля тоже видит рынок, но подсказка,
     что стоит выгоднее откликнуться, остаётся."""
     profile = current_user.executor_profile
 
-    query = Order.query
+    query = Order.query.options(selectinload(Order.service_category))
     if profile and profile.id:
         my_bid_order_ids = db.session.query(Bid.order_id).filter(Bid.executor_id == profile.id)
-        orders = query.filter(db.or_(Order.status == "published", Order.id.in_(my_bid_order_ids))).order_by(Order.created_at.desc()).all()
+        query = query.filter(db.or_(Order.status == "published", Order.id.in_(my_bid_order_ids)))
     else:
-        orders = query.filter(Order.status == "published").order_by(Order.created_at.desc()).all()
+        query = query.filter(Order.status == "published")
+    orders = feeds.paginate(query, (Order.created_at, Order.id), request.args.get("cursor"))
 
     matches_by_order = {}
     my_bid_by_order = {}
-    if profile and profile.id:
-        matches_by_order = {m.order_id: m for m in OrderMatch.query.filter_by(executor_id=profile.id).all()}
-        my_bid_by_order = {b.order_id: b for b in Bid.query.filter_by(executor_id=profile.id).all()}
-
-    orders.sort(key=lambda o: o.id not in matches_by_order)
+    if profile and profile.id and orders:
+        order_ids = [order.id for order in orders]
+        matches_by_order = {m.order_id: m for m in OrderMatch.query.filter(
+            OrderMatch.executor_id == profile.id, OrderMatch.order_id.in_(order_ids),
+        )}
+        my_bid_by_order = {b.order_id: b for b in Bid.query.filter(
+            Bid.executor_id == profile.id, Bid.order_id.in_(order_ids),
+        )}
+
+    # подбор идёт сразу при публикации, так что подобранные заявки — среди
+    # свежих; поднимаем их в начало своей страницы
+    orders.items.sort(key=lambda o: o.id not in matches_by_order)
 
     return render_template(
         "orders/dashboard.html", orders=orders,
@@ -246,12 +255,14 @@ def order_detail(order_id):
     if not _can_view_order(order):
         abort(403)
 
-    my_bid = None
+    my_bid = my_place = None
     if current_user.role == "executor" and current_user.executor_profile:
         my_bid = Bid.query.filter_by(order_id=order.id, executor_id=current_user.executor_profile.id).first()
+        if my_bid is not None and my_bid.status == "active":
+            my_place = auctions.ranking(order).place(my_bid.executor_id)
 
     is_owner = current_user.role == "customer" and order.customer.user_id == current_user.id
-    return render_template("orders/detail.html", order=order, my_bid=my_bid, is_owner=is_owner)
+    return render_template("orders/detail.html", order=order, my_bid=my_bid, my_place=my_place, is_owner=is_owner)
 
 
 @bp.route("/orders/<int:order_id>/bid", methods=["POST"])
@@ -289,17 +300,8 @@ def submit_bid(order_id):
 
     flash("Ставка отправлена." if is_new else "Ставка обновлена.", "success")
 
-    # исполнители, кого обошли по цене, узнают об этом сразу (см. ТЗ, модуль 7)
-    cheaper = Bid.query.filter(
-        Bid.order_id == order.id, Bid.status == "active", Bid.executor_id != executor.id, Bid.price > price,
-    ).all()
-    for outbid in cheaper:
-        notify(
-            outbid.executor.user, "outbid",
-            title=f"Вас обошли по цене: {order.title}",
-            body="Появилась более выгодная ставка — вы можете предложить новые условия, пока аукцион открыт.",
-            url=f"/orders/{order.id}",
-        )
+    # кого обошли по цене, узнают одной сводкой через окно (app/auctions.py, модуль 7)
+    auctions.bid_placed(order)
 
     return redirect(url_for("orders.order_detail", order_id=order.id))
 
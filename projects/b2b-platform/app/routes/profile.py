@@ -4,10 +4,10 @@
 заполняют свои карточки сами через эти формы сразу после регистрации
 (и могут донаполнять их позже в любой момент).
 """
-from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from app import db
+from app import db, reference_data
 from app.decorators import role_required
 from app.models import (
     Bid,
@@ -22,7 +22,6 @@ from app.models import (
     Order,
     OrderAssignment,
     PortfolioMedia,
-    Region,
     ServiceCategory,
     User,
 )
@@ -44,8 +43,11 @@ def _to_float(value):
         return None
 
 
+CITIES_MAX_AGE = 365 * 24 * 3600
+
+
 def _regions():
-    return Region.query.order_by(Region.name_ru).all()
+    return reference_data.items("regions")
 
 
 @bp.route("/customer", methods=["GET", "POST"])
@@ -182,9 +184,9 @@ def executor_edit():
         "profile/executor_form.html",
         profile=profile,
         regions=_regions(),
-        equipment_types=EquipmentType.query.order_by(EquipmentType.name_ru).all(),
-        service_categories=ServiceCategory.query.order_by(ServiceCategory.name_ru).all(),
-        materials=Material.query.order_by(Material.name_ru).all(),
+        equipment_types=reference_data.items("equipment_types"),
+        service_categories=reference_data.items("service_categories"),
+        materials=reference_data.items("materials"),
     )
 
 
@@ -257,11 +259,12 @@ def executor_capabilities_save():
     db.session.commit()
 
     if profile.is_complete:
-        from app.matching import match_new_executor_to_open_orders
         from app.subscriptions import TRIAL_DAYS, start_trial_if_needed
+        from app.tasks import enqueue, task_result
 
         started = start_trial_if_needed(profile)
-        matched = match_new_executor_to_open_orders(profile)
+        matching = enqueue("match_executor", {"executor_id": profile.id}, key=f"match_executor:{profile.id}")
+        matched = task_result(matching)
         extra = f" Подобрано уже открытых заказов: {matched}." if matched else ""
         if started:
             flash(
@@ -280,14 +283,25 @@ def executor_capabilities_save():
 @login_required
 def cities_by_region(region_id):
     """Небольшой JSON-эндпоинт для клиентского каскадного списка городов —
-    отдаёт города только выбранного региона, без загрузки всего справочника."""
-    from flask import jsonify
-
-    cities = City.query.filter_by(region_id=region_id).order_by(City.name_ru).all()
-    from app.i18n import get_current_lang
-
-    lang = get_current_lang()
-    return jsonify([{"id": c.id, "name": c.name(lang)} for c in cities])
+    отдаёт города только выбранного региона, без загрузки всего справочника.
+    Города берутся из кэша справочников (app/reference_data.py); если в
+    адресе версия справочников (?v=, так зовёт main.js) совпадает с текущей,
+    браузер может не спрашивать этот ответ снова — при правке справочников
+    версия, а с ней и адрес, сменятся."""
+    from app.i18n import SUPPORTED_LANGUAGES, get_current_lang
+
+    data = reference_data.snapshot()
+    lang = request.args.get("lang")
+    if lang not in SUPPORTED_LANGUAGES:
+        lang = get_current_lang()
+    body, etag = data.cities_json(region_id, lang)
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    if request.args.get("v", type=int) == data.version:
+        response.headers["Cache-Control"] = f"private, max-age={CITIES_MAX_AGE}, immutable"
+    else:
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
 
 
 def _own_profile_edit_url():
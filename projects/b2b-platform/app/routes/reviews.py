@@ -26,20 +26,6 @@ def _my_role_in_order(order):
     return None, None
 
 
-def _recalculate_rating(user):
-    """Пересчитывает rating_avg/reviews_count в профиле пользователя по
-    опубликованным отзывам."""
-    published = Review.query.filter_by(target_id=user.id, is_published=True).all()
-    profile = user.customer_profile or user.executor_profile
-    if profile is None:
-        return
-    if published:
-        profile.rating_avg = round(sum(r.rating for r in published) / len(published), 2)
-    else:
-        profile.rating_avg = None
-    profile.reviews_count = len(published)
-
-
 @bp.route("/orders/<int:order_id>/review", methods=["GET", "POST"])
 @paywall_required
 @email_confirmed_required
@@ -74,9 +60,7 @@ def leave_review(order_id):
         opposite = Review.query.filter(Review.order_id == order.id, Review.author_id == target_user.id).first()
         if opposite is not None:
             existing.is_published = True
-            opposite.is_published = True
-            _recalculate_rating(existing.target)
-            _recalculate_rating(opposite.target)
+            opposite.is_published = True  # рейтинги профилей пересчитает app/ratings.py
             notify(
                 target_user, "review_received", title="Опубликован новый отзыв о вас",
                 body=f"Оценка: {existing.rating}/5", url=url_for("reviews.my_reviews"),
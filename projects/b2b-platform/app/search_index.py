@@ -0,0 +1,192 @@
+"""Обратный индекс для поиска по сайту (/search, app/routes/search.py).
+
+Раньше поиск поднимал из БД все карточки пяти каталогов и сравнивал строки
+в Python — время запроса росло с размером каталога. Теперь у каждой
+карточки в таблице search_postings лежат её нормализованные слова, и
+запрос читает только строки с подходящими словами.
+
+Нормализация (normalize/tokenize) — NFKC, casefold и транслитерация
+кириллицы (русской и узбекской) в узбекскую латиницу, апострофы o'/g'
+отбрасываются. Поэтому «токарь», «Tokar» и «ТОКАРЬ» — одно и то же слово,
+а запрос кириллицей находит карточку на латинице и наоборот. Сравнение
+идёт уже в нормализованном виде, без SQL lower()/ILIKE — см. историю
+модуля поиска: SQLite не умеет lower() для кириллицы.
+
+Режимы поиска:
+- partial — каждое слово запроса должно быть началом какого-то слова
+  карточки (в названии или описании);
+- exact — название или описание целиком совпадает с запросом (с точностью
+  до регистра, пунктуации и алфавита) — под это в индекс кладётся ещё
+  один токен на всё поле (EXACT_PREFIX + хеш).
+
+Ранжирование: совпадение в названии весит больше, чем в описании, целое
+слово — больше, чем начало слова.
+
+Индекс обновляется сам: после каждого flush сессии пересчитываются строки
+вставленных/изменённых карточек (если изменились индексируемые поля) и
+удаляются строки удалённых. Массовые UPDATE/DELETE в обход ORM индекс не
+видят — после них (и после первого деплоя) нужна `flask search-reindex`.
+"""
+import hashlib
+import re
+import unicodedata
+
+from sqlalchemy import event
+
+from app import db
+from app.flush_hooks import fields_changed
+from app.models import ConstructorProfile, ExecutorProfile, Listing, MaterialListing, SearchPosting, Vacancy
+
+TITLE_WEIGHT = 3
+TEXT_WEIGHT = 1
+WHOLE_WORD_BONUS = 2  # множитель веса, если слово запроса совпало целиком
+MAX_TOKEN_LENGTH = 64  # = длина search_postings.token
+EXACT_PREFIX = "="  # не буква и не цифра — со словами не пересечётся
+
+# Каталоги поиска: тип -> (модель, поля-заголовки, поля-описания). Ключи
+# совпадают с разделами результатов на странице /search.
+SEARCH_ENTITIES = {
+    "executors": (ExecutorProfile, ("display_name",), ("description",)),
+    "constructors": (ConstructorProfile, ("display_name",), ("description",)),
+    "listings": (Listing, ("title",), ("description",)),
+    "materials": (MaterialListing, ("title",), ("description",)),
+    "vacancies": (Vacancy, ("title",), ("description",)),
+}
+_ENTITY_TYPES = {model: entity_type for entity_type, (model, _, _) in SEARCH_ENTITIES.items()}
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+    # o'zbek / oʻzbek / o‘zbek — апостроф в узбекской латинице не разделяет слово
+    "'": "", "ʻ": "", "ʼ": "", "‘": "", "’": "", "`": "",
+})
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text).casefold().translate(_TRANSLIT)
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in _WORD_RE.findall(normalize(text or ""))]
+
+
+def _exact_token(tokens):
+    digest = hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()
+    return EXACT_PREFIX + digest
+
+
+def _postings(entity_type, obj):
+    _, title_fields, text_fields = SEARCH_ENTITIES[entity_type]
+    weights = {}
+    for fields, weight in ((title_fields, TITLE_WEIGHT), (text_fields, TEXT_WEIGHT)):
+        for field in fields:
+            tokens = tokenize(getattr(obj, field))
+            if not tokens:
+                continue
+            for token in tokens + [_exact_token(tokens)]:
+                weights[token] = max(weights.get(token, 0), weight)
+    return [
+        {"token": token, "entity_type": entity_type, "entity_id": obj.id, "weight": weight}
+        for token, weight in weights.items()
+    ]
+
+
+def _fields_changed(entity_type, obj):
+    _, title_fields, text_fields = SEARCH_ENTITIES[entity_type]
+    return fields_changed(obj, title_fields + text_fields)
+
+
+def _write(connection, reindex, remove):
+    """reindex/remove: {entity_type: {id: obj или None}}."""
+    for entity_type in SEARCH_ENTITIES:
+        ids = set(reindex.get(entity_type, ())) | set(remove.get(entity_type, ()))
+        if not ids:
+            continue
+        connection.execute(db.delete(SearchPosting).where(
+            SearchPosting.entity_type == entity_type, SearchPosting.entity_id.in_(ids),
+        ))
+        rows = [row for obj in reindex.get(entity_type, {}).values() for row in _postings(entity_type, obj)]
+        if rows:
+            connection.execute(db.insert(SearchPosting), rows)
+
+
+def _after_flush(session, flush_context):
+    reindex, remove = {}, {}
+    for obj in session.new:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None:
+            reindex.setdefault(entity_type, {})[obj.id] = obj
+    for obj in session.dirty:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None and _fields_changed(entity_type, obj):
+            reindex.setdefault(entity_type, {})[obj.id] = obj
+    for obj in session.deleted:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None:
+            remove.setdefault(entity_type, {})[obj.id] = None
+    if reindex or remove:
+        _write(session.connection(), reindex, remove)
+
+
+event.listen(db.session, "after_flush", _after_flush)
+
+
+def rebuild(batch_size=500):
+    """Полная перестройка индекса по всем каталогам. Возвращает число
+    проиндексированных карточек."""
+    db.session.execute(db.delete(SearchPosting))
+    total = 0
+    for entity_type, (model, _, _) in SEARCH_ENTITIES.items():
+        last_id = 0
+        while True:
+            batch = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not batch:
+                break
+            _write(db.session.connection(), {entity_type: {obj.id: obj for obj in batch}}, {})
+            total += len(batch)
+            last_id = batch[-1].id
+    db.session.commit()
+    return total
+
+
+def search(q, mode="partial", entity_types=None):
+    """{entity_type: {entity_id: score}} для карточек, подходящих под
+    запрос q. Видимость (статус, роль) здесь не проверяется — это делает
+    вызывающий код при загрузке карточек."""
+    entity_types = list(entity_types or SEARCH_ENTITIES)
+    tokens = tokenize(q)
+    if not tokens:
+        return {}
+
+    query = db.session.query(
+        SearchPosting.token, SearchPosting.entity_type, SearchPosting.entity_id, SearchPosting.weight,
+    ).filter(SearchPosting.entity_type.in_(entity_types))
+
+    scores = {}
+    if mode == "exact":
+        for _, entity_type, entity_id, weight in query.filter(SearchPosting.token == _exact_token(tokens)):
+            entity_scores = scores.setdefault(entity_type, {})
+            entity_scores[entity_id] = max(entity_scores.get(entity_id, 0), weight)
+        return scores
+
+    wanted = sorted(set(tokens))
+    # «начинается с t» = диапазон [t, t с увеличенным последним символом)
+    query = query.filter(db.or_(*(
+        db.and_(SearchPosting.token >= t, SearchPosting.token < t[:-1] + chr(ord(t[-1]) + 1))
+        for t in wanted
+    )))
+    best = {}  # (entity_type, entity_id) -> {слово запроса: лучший вес}
+    for token, entity_type, entity_id, weight in query:
+        matched = best.setdefault((entity_type, entity_id), {})
+        for t in wanted:
+            if token.startswith(t):
+                value = weight * (WHOLE_WORD_BONUS if token == t else 1)
+                matched[t] = max(matched.get(t, 0), value)
+    for (entity_type, entity_id), matched in best.items():
+        if len(matched) == len(wanted):
+            scores.setdefault(entity_type, {})[entity_id] = sum(matched.values())
+    return scores
@@ -30,7 +30,9 @@
 
   // Экспортируется глобально — вызывается из inline-скрипта конкретной
   // страницы профиля, где известны id полей региона/города.
-  window.initRegionCityCascade = function (regionSelectId, citySelectId) {
+  // citiesQuery — версия справочников и язык (reference_data.cities_url_query):
+  // с ними ответ кэшируется браузером, пока справочники не изменятся.
+  window.initRegionCityCascade = function (regionSelectId, citySelectId, citiesQuery) {
     var regionSelect = document.getElementById(regionSelectId);
     var citySelect = document.getElementById(citySelectId);
     if (!regionSelect || !citySelect) return;
@@ -42,7 +44,7 @@
       }
       citySelect.disabled = true;
       citySelect.innerHTML = '<option value="">Загрузка…</option>';
-      fetch("/profile/cities/" + regionId + ".json", { headers: { "X-Requested-With": "XMLHttpRequest" } })
+      fetch("/profile/cities/" + regionId + ".json" + (citiesQuery ? "?" + citiesQuery : ""), { headers: { "X-Requested-With": "XMLHttpRequest" } })
         .then(function (res) { return res.json(); })
         .then(function (cities) {
           var options = ['<option value="">— не выбран —</option>'];
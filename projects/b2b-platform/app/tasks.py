@@ -0,0 +1,226 @@
+"""Фоновая очередь задач поверх основной БД (таблица background_tasks).
+
+Публикация заказа и заполнение профиля исполнителя раньше синхронно
+запускали подбор и рассылку уведомлений — а каждое notify() это ещё и
+HTTP-запросы в Telegram/FCM, так что запрос пользователя ждал сотни сетевых
+обменов. Теперь маршрут только ставит задачу (enqueue), а выполняет её
+воркер — `flask tasks-worker` (app/cli.py). Redis/Celery не нужны: задачи
+лежат в той же SQLite/PostgreSQL, что и всё остальное.
+
+- Обработчик регистрируется декоратором @task("kind") и получает payload
+  как именованные аргументы; его результат сохраняется JSON-ом в result.
+- Ключ идемпотентности: пока задача с тем же ключом ждёт или выполняется,
+  повторный enqueue возвращает её же, а не ставит дубль; одновременные
+  enqueue из разных запросов разводит уникальный частичный индекс.
+- Упавшая задача повторяется с экспоненциальной задержкой
+  (RETRY_BASE_SECONDS · 2^(попытка−1)), после max_attempts — status=failed.
+- Захват — условным UPDATE по каждой строке, поэтому несколько воркеров
+  не возьмут одну задачу; задача, зависшая в running дольше LOCK_TIMEOUT
+  (воркер убит посреди работы), захватывается заново.
+- TASKS_EAGER=True (тесты, локальная разработка без воркера) — задача
+  выполняется прямо внутри enqueue, поведение как до очереди.
+"""
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app import db
+from app.models import BackgroundTask
+
+RETRY_BASE_SECONDS = 30
+LOCK_TIMEOUT = timedelta(minutes=15)
+# модули с обработчиками — импортируются лениво, чтобы не тянуть их (и их
+# зависимости) при импорте моделей
+HANDLER_MODULES = ("app.matching", "app.auctions")
+
+_handlers = {}
+
+
+def task(kind):
+    """Регистрирует обработчик задач вида kind."""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _load_handlers():
+    import importlib
+
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def _active_with_key(key):
+    return BackgroundTask.query.filter(
+        BackgroundTask.idempotency_key == key,
+        BackgroundTask.status.in_(("pending", "running")),
+    ).first()
+
+
+def enqueue(kind, payload=None, key=None, delay_seconds=0, max_attempts=5):
+    """Ставит задачу в очередь и возвращает её (BackgroundTask). Коммитит
+    сессию — задача должна быть видна воркеру сразу."""
+    if key is not None:
+        existing = _active_with_key(key)
+        if existing is not None:
+            return existing
+
+    background_task = BackgroundTask(
+        kind=kind, payload=json.dumps(payload or {}), idempotency_key=key,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(background_task)
+    except IntegrityError:
+        # задачу с тем же ключом только что поставил соседний запрос
+        # (uq_background_tasks_active_key)
+        existing = _active_with_key(key)
+        if existing is None:
+            raise
+        db.session.commit()
+        return existing
+    db.session.commit()
+
+    if current_app.config.get("TASKS_EAGER") and not delay_seconds:
+        background_task.attempts += 1
+        background_task.status = "running"
+        background_task.locked_by = "eager"
+        background_task.locked_at = datetime.utcnow()
+        db.session.commit()
+        run_task(background_task)
+    return background_task
+
+
+def release_key(key):
+    """Снимает ключ идемпотентности с выполняющейся задачи — обычно из её же
+    обработчика: следующий enqueue с этим ключом поставит новую задачу, а не
+    вернёт эту. Нужна задачам-сводкам: всё, что случилось до release_key,
+    эта задача ещё прочитает, а что после — попадёт в следующую. Коммитит
+    сессию."""
+    BackgroundTask.query.filter(
+        BackgroundTask.idempotency_key == key, BackgroundTask.status == "running",
+    ).update({BackgroundTask.idempotency_key: None}, synchronize_session=False)
+    db.session.commit()
+
+
+def task_result(background_task):
+    """Значение, которое вернул обработчик, — или None, если задача ещё
+    не выполнена."""
+    if background_task.status != "done" or background_task.result is None:
+        return None
+    return json.loads(background_task.result)
+
+
+def claim_batch(worker_id, limit=10):
+    """Захватывает до limit готовых к запуску задач для worker_id."""
+    now = datetime.utcnow()
+    stale = now - LOCK_TIMEOUT
+    candidates = (
+        db.session.query(BackgroundTask.id, BackgroundTask.status, BackgroundTask.locked_at)
+        .filter(db.or_(
+            db.and_(BackgroundTask.status == "pending", BackgroundTask.run_after <= now),
+            db.and_(BackgroundTask.status == "running", BackgroundTask.locked_at < stale),
+        ))
+        .order_by(BackgroundTask.run_after, BackgroundTask.id)
+        .limit(limit)
+        .all()
+    )
+
+    claimed_ids = []
+    for task_id, status, locked_at in candidates:
+        # условие на прежние status/locked_at: если строку успел взять другой
+        # воркер, UPDATE не затронет ни одной строки
+        same_lock = (BackgroundTask.locked_at.is_(None) if locked_at is None
+                     else BackgroundTask.locked_at == locked_at)
+        updated = (
+            BackgroundTask.query
+            .filter(BackgroundTask.id == task_id, BackgroundTask.status == status, same_lock)
+            .update({
+                BackgroundTask.status: "running",
+                BackgroundTask.locked_by: worker_id,
+                BackgroundTask.locked_at: now,
+                BackgroundTask.attempts: BackgroundTask.attempts + 1,
+            }, synchronize_session=False)
+        )
+        if updated:
+            claimed_ids.append(task_id)
+    db.session.commit()
+
+    if not claimed_ids:
+        return []
+    return BackgroundTask.query.filter(BackgroundTask.id.in_(claimed_ids)).order_by(BackgroundTask.id).all()
+
+
+def run_task(background_task):
+    """Выполняет уже захваченную задачу и записывает исход: done, повтор
+    через backoff или failed."""
+    _load_handlers()
+    task_id = background_task.id
+    try:
+        handler = _handlers.get(background_task.kind)
+        if handler is None:
+            raise LookupError(f"Нет обработчика для задач вида {background_task.kind!r}")
+        result = handler(**json.loads(background_task.payload))
+    except Exception as exc:
+        db.session.rollback()
+        background_task = db.session.get(BackgroundTask, task_id)
+        background_task.last_error = f"{type(exc).__name__}: {exc}"
+        background_task.locked_by = None
+        background_task.locked_at = None
+        if background_task.attempts >= background_task.max_attempts:
+            background_task.status = "failed"
+            background_task.finished_at = datetime.utcnow()
+            current_app.logger.exception("Задача %s (%s) окончательно не выполнена", task_id, background_task.kind)
+        else:
+            delay = RETRY_BASE_SECONDS * 2 ** (background_task.attempts - 1)
+            background_task.status = "pending"
+            background_task.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            current_app.logger.warning(
+                "Задача %s (%s) упала, повтор через %s с: %s", task_id, background_task.kind, delay, exc,
+            )
+        db.session.commit()
+        return False
+
+    background_task = db.session.get(BackgroundTask, task_id)
+    background_task.status = "done"
+    background_task.result = json.dumps(result)
+    background_task.last_error = None
+    background_task.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(once=False, batch_size=10, poll_interval=2.0):
+    """Цикл воркера. once=True — разобрать то, что готово сейчас, и выйти.
+    Возвращает число обработанных задач."""
+    _load_handlers()
+    me = worker_id()
+    processed = 0
+    while True:
+        try:
+            batch = claim_batch(me, batch_size)
+        except SQLAlchemyError:
+            # БД недоступна (перезапуск, сеть) — воркер не должен падать
+            db.session.rollback()
+            current_app.logger.exception("Очередь задач: не удалось захватить задачи")
+            batch = []
+        for background_task in batch:
+            run_task(background_task)
+            processed += 1
+        db.session.remove()  # не держать объекты и соединение между итерациями
+        if once and not batch:
+            return processed
+        if not batch:
+            time.sleep(poll_interval)
@@ -6,19 +6,60 @@
 канал, который реально нужно «подключить» ключом в конце: вся логика уже
 на месте и заработает сразу, как только токен появится в переменных
 окружения."""
-import json
 import secrets
-import urllib.error
-import urllib.request
+import threading
+import time
 from datetime import datetime, timedelta
 
+import requests
 from flask import current_app, has_request_context, request
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 
+from app.delivery import http_session
+
 TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/{method}"
 LINK_SALT = "telegram-link"
 LINK_TOKEN_MAX_AGE = 3600  # час на переход по deep-link'у из личного кабинета
 LINK_CODE_MAX_AGE = timedelta(minutes=30)
+# Лимиты Bot API: около 30 сообщений в секунду на бота и не больше одного в
+# секунду в один чат — сверх этого Telegram отвечает 429.
+GLOBAL_MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+
+
+class RateLimiter:
+    """Выдаёт слоты отправки с учётом общего лимита и лимита на ключ (чат).
+    Слот резервируется под замком, ждут его уже без замка — так потоки
+    app/delivery.py сами выстраиваются в очередь."""
+
+    def __init__(self, global_per_second, per_key_per_second, clock=time.monotonic, sleep=time.sleep):
+        self.global_interval = 1.0 / global_per_second
+        self.key_interval = 1.0 / per_key_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._next_global = 0.0
+        self._next_by_key = {}
+
+    def wait(self, key):
+        with self._lock:
+            now = self.clock()
+            at = max(now, self._next_global, self._next_by_key.get(key, 0.0))
+            self._next_global = at + self.global_interval
+            self._next_by_key[key] = at + self.key_interval
+            if len(self._next_by_key) > 10000:
+                self._next_by_key = {k: t for k, t in self._next_by_key.items() if t > now}
+        if at > now:
+            self.sleep(at - now)
+
+    def pause(self, seconds):
+        """Telegram ответил 429 с retry_after — придержать все отправки."""
+        with self._lock:
+            self._next_global = max(self._next_global, self.clock() + seconds)
+
+
+_rate_limiter = RateLimiter(GLOBAL_MESSAGES_PER_SECOND, CHAT_MESSAGES_PER_SECOND)
+_http = http_session()  # keep-alive к api.telegram.org, общий для потоков app/delivery.py
 
 
 def _serializer():
@@ -69,12 +110,26 @@ def link_code_for(user):
     return code
 
 
+def current_link_code(user):
+    """Действующий код пользователя или None — только чтение, без записи
+    (в отличие от link_code_for)."""
+    from app.models import TelegramLinkCode
+
+    existing = TelegramLinkCode.query.filter_by(user_id=user.id).first()
+    if existing is not None and datetime.utcnow() - existing.created_at < LINK_CODE_MAX_AGE:
+        return existing.code
+    return None
+
+
 def link_code_for_current_user():
+    """Для Jinja-глобала: отрисовка страницы не должна ничего писать в БД,
+    поэтому код здесь только показывается, если уже выдан (выдаёт его
+    страница «Настройки», см. link_code_for)."""
     from flask_login import current_user
 
     if not current_user.is_authenticated:
         return None
-    return link_code_for(current_user)
+    return current_link_code(current_user)
 
 
 def deep_link_for_current_user():
@@ -94,22 +149,29 @@ def _call(method, payload):
     if not token:
         return None
     url = TELEGRAM_API_URL.format(token=token, method=method)
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST", headers={"Content-Type": "application/json"})
     try:
-        with urllib.request.urlopen(req, timeout=10) as response:
-            return json.loads(response.read().decode())
-    except (urllib.error.URLError, OSError, ValueError):
+        response = _http.post(url, json=payload, timeout=10)
+        return response.json()
+    except (requests.RequestException, ValueError):
         current_app.logger.exception("Ошибка обращения к Telegram Bot API (%s).", method)
         return None
 
 
 def send_message(chat_id, text):
-    """Возвращает True, если сообщение реально отправлено."""
+    """Возвращает True, если сообщение реально отправлено. Может подождать
+    своей очереди по лимитам Telegram (RateLimiter)."""
     if not current_app.config.get("TELEGRAM_BOT_TOKEN"):
         current_app.logger.warning("TELEGRAM_BOT_TOKEN не настроен — сообщение не отправлено: %s", text[:120])
         return False
+    _rate_limiter.wait(chat_id)
     result = _call("sendMessage", {"chat_id": chat_id, "text": text})
+    if result and result.get("error_code") == 429:
+        # лимит всё же превышен (например, соседним процессом) — одна
+        # повторная попытка после указанной Telegram паузы
+        retry_after = (result.get("parameters") or {}).get("retry_after", 1)
+        _rate_limiter.pause(retry_after)
+        _rate_limiter.wait(chat_id)
+        result = _call("sendMessage", {"chat_id": chat_id, "text": text})
     return bool(result and result.get("ok"))
 
 
@@ -124,20 +186,14 @@ def _absolute_url(url):
     return (base.rstrip("/") + url) if base else url
 
 
-def send_telegram_notification(user, title, body=None, url=None):
-    """Единая точка входа, которую вызывает app.notify.notify() для ЛЮБОГО
-    события платформы (модуль 2/5/6/8/9) — см. «10.4» в ТЗ."""
-    from app.models import TelegramLink
-
-    link = TelegramLink.query.filter_by(user_id=user.id, notifications_enabled=True).first()
-    if link is None:
-        return False
-
+def notification_text(title, body=None, url=None):
+    """Текст Telegram-сообщения для уведомления платформы (см.
+    app/delivery.py — через неё проходит ЛЮБОЕ событие модулей 2/5/6/8/9,
+    «10.4» в ТЗ)."""
     text = title
     if body:
         text += "\n" + body
     absolute = _absolute_url(url)
     if absolute:
         text += "\n" + absolute
-
-    return send_message(link.telegram_chat_id, text)
+    return text
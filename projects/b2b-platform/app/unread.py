@@ -0,0 +1,166 @@
+"""Счётчики непрочитанного: User.unread_notifications и User.unread_messages.
+
+Значки в шапке есть на каждой странице, и раньше context processor'ы на
+каждую отрисовку считали COUNT по уведомлениям и COUNT с JOIN по диалогам и
+сообщениям. Теперь это две колонки пользователя — current_user уже загружен
+Flask-Login'ом, так что значки не стоят ни одного запроса. Так же ведутся
+Conversation.unread_a/unread_b (непрочитанное каждой стороной диалога) и
+Conversation.last_message_id — для списка диалогов.
+
+Счётчики ведутся сами: после каждого flush сессии учитываются новые и
+удалённые непрочитанные уведомления/сообщения и смена read_at (прочитано /
+снова не прочитано) — то есть notify(), отправка сообщения и отметка о
+прочтении через ORM. Изменение — атомарным UPDATE ... SET n = n + delta
+в той же транзакции, так что параллельные запросы счётчик не портят.
+Сверка с данными — `flask unread-recount` (см. app/flush_hooks.py).
+"""
+from collections import Counter
+
+from sqlalchemy import event, inspect
+
+from app import db
+from app.flush_hooks import counter_values, expire_after_flush, mark_stale
+from app.models import Conversation, Message, Notification, User
+
+_TRACKED = (Notification, Message)
+
+
+def _was_unread(obj):
+    history = inspect(obj).attrs.read_at.history
+    if not history.has_changes():
+        return obj.read_at is None
+    # deleted пуст, если read_at не был загружен, — тогда считаем, что было
+    # непрочитано (так оно и есть у только что созданных записей)
+    return not history.deleted or history.deleted[0] is None
+
+
+def _participants(connection, messages):
+    """{id диалога: (user_a_id, user_b_id)} для диалогов сообщений."""
+    conversation_ids = {m.conversation_id for m in messages}
+    if not conversation_ids:
+        return {}
+    return {
+        conversation_id: (user_a_id, user_b_id)
+        for conversation_id, user_a_id, user_b_id in connection.execute(
+            db.select(Conversation.id, Conversation.user_a_id, Conversation.user_b_id)
+            .where(Conversation.id.in_(conversation_ids))
+        )
+    }
+
+
+def _apply(connection, model, deltas):
+    """deltas: {(id строки, колонка): изменение}."""
+    for (row_id, column_name), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        column = getattr(model, column_name)
+        connection.execute(
+            db.update(model).where(model.id == row_id).values(counter_values(model, **{
+                column_name: db.case((column + delta < 0, 0), else_=column + delta),
+            }))
+        )
+
+
+def _set_last_messages(connection, last_ids):
+    for conversation_id, message_id in sorted(last_ids.items()):
+        connection.execute(
+            db.update(Conversation)
+            .where(Conversation.id == conversation_id, db.or_(
+                Conversation.last_message_id.is_(None), Conversation.last_message_id < message_id,
+            ))
+            .values(counter_values(Conversation, last_message_id=message_id))
+        )
+
+
+def _after_flush(session, flush_context):
+    changes = []  # (объект, было непрочитано, стало непрочитано)
+    for obj in session.new:
+        if isinstance(obj, _TRACKED):
+            changes.append((obj, False, obj.read_at is None))
+    for obj in session.dirty:
+        if isinstance(obj, _TRACKED):
+            changes.append((obj, _was_unread(obj), obj.read_at is None))
+    for obj in session.deleted:
+        if isinstance(obj, _TRACKED):
+            changes.append((obj, _was_unread(obj), False))
+    changes = [change for change in changes if change[1] != change[2]]
+    new_messages = [obj for obj in session.new if isinstance(obj, Message)]
+    if not changes and not new_messages:
+        return
+
+    connection = session.connection()
+    pairs = _participants(connection, [obj for obj, _, _ in changes if isinstance(obj, Message)] + new_messages)
+    user_deltas, conversation_deltas, last_ids = Counter(), Counter(), {}
+    for obj, was_unread, is_unread in changes:
+        delta = int(is_unread) - int(was_unread)
+        if isinstance(obj, Notification):
+            user_deltas[(obj.user_id, "unread_notifications")] += delta
+        elif obj.conversation_id in pairs:
+            user_a_id, user_b_id = pairs[obj.conversation_id]
+            recipient_id = user_b_id if obj.sender_id == user_a_id else user_a_id
+            user_deltas[(recipient_id, "unread_messages")] += delta
+            side = "unread_a" if recipient_id == user_a_id else "unread_b"
+            conversation_deltas[(obj.conversation_id, side)] += delta
+    for m in new_messages:
+        last_ids[m.conversation_id] = max(last_ids.get(m.conversation_id, 0), m.id)
+
+    _apply(connection, User, user_deltas)
+    _apply(connection, Conversation, conversation_deltas)
+    _set_last_messages(connection, last_ids)
+    # загруженные в сессию current_user и диалог перечитают счётчики
+    mark_stale(session, User, {user_id for user_id, _ in user_deltas})
+    mark_stale(session, Conversation, {conversation_id for conversation_id, _ in conversation_deltas})
+    mark_stale(session, Conversation, last_ids)
+
+
+expire_after_flush(User, ["unread_notifications", "unread_messages"])
+expire_after_flush(Conversation, ["unread_a", "unread_b", "last_message_id"])
+event.listen(db.session, "after_flush", _after_flush)
+
+
+def recount(user_ids=None):
+    """Пересчитывает счётчики по данным: у пользователей (всех или
+    user_ids) и у их диалогов. Возвращает число обновлённых пользователей."""
+    notifications = (
+        db.select(db.func.count(Notification.id))
+        .where(Notification.user_id == User.id, Notification.read_at.is_(None))
+        .scalar_subquery()
+    )
+    messages = (
+        db.select(db.func.count(Message.id))
+        .join(Conversation, Message.conversation_id == Conversation.id)
+        .where(
+            db.or_(Conversation.user_a_id == User.id, Conversation.user_b_id == User.id),
+            Message.sender_id != User.id,
+            Message.read_at.is_(None),
+        )
+        .scalar_subquery()
+    )
+    statement = db.update(User).values(counter_values(
+        User, unread_notifications=notifications, unread_messages=messages,
+    ))
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(list(user_ids)))
+    updated = db.session.execute(statement).rowcount
+
+    def unread_by(user_column):
+        return (
+            db.select(db.func.count(Message.id))
+            .where(Message.conversation_id == Conversation.id, Message.sender_id != user_column,
+                   Message.read_at.is_(None))
+            .scalar_subquery()
+        )
+
+    statement = db.update(Conversation).values(counter_values(
+        Conversation,
+        unread_a=unread_by(Conversation.user_a_id),
+        unread_b=unread_by(Conversation.user_b_id),
+        last_message_id=db.select(db.func.max(Message.id)).where(Message.conversation_id == Conversation.id)
+        .scalar_subquery(),
+    ))
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        statement = statement.where(db.or_(Conversation.user_a_id.in_(user_ids), Conversation.user_b_id.in_(user_ids)))
+    db.session.execute(statement)
+    db.session.commit()
+    return updated
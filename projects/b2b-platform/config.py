@@ -54,8 +54,8 @@ class Config:
     # подпись запроса: /telegram/webhook/<этот_секрет>. Обязателен для
     # включения приёма вебхуков в проде.
     TELEGRAM_WEBHOOK_SECRET = os.environ.get("TELEGRAM_WEBHOOK_SECRET")
-    # Нужен только когда send_telegram_notification вызывается вне HTTP-
-    # запроса (например, из будущей фоновой задачи) — для формирования
+    # Нужен только когда уведомления рассылаются вне HTTP-запроса (воркер
+    # фоновой очереди, app/tasks.py) — для формирования
     # абсолютных ссылок в тексте сообщения.
     PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL")
 
@@ -94,9 +94,36 @@ class Config:
 
     WTF_CSRF_TIME_LIMIT = None  # токен не должен протухать раньше сессии
 
+    # Фоновая очередь задач (app/tasks.py): подбор исполнителей и рассылка
+    # уведомлений выполняются воркером `flask tasks-worker`. TASKS_EAGER=1 —
+    # выполнять задачи сразу в запросе, без воркера (как было до очереди).
+    TASKS_EAGER = os.environ.get("TASKS_EAGER", "0") == "1"
+
+    # Счётчик посещений (app/page_views.py): просмотры пишутся в БД пачкой раз
+    # в PAGE_VIEWS_FLUSH_SECONDS (0 — сразу в запросе); сырой лог хранится
+    # PAGE_VIEWS_RETENTION_DAYS дней, почасовая сводка — PAGE_VIEWS_HOURLY_DAYS.
+    PAGE_VIEWS_FLUSH_SECONDS = float(os.environ.get("PAGE_VIEWS_FLUSH_SECONDS", "5"))
+    PAGE_VIEWS_RETENTION_DAYS = int(os.environ.get("PAGE_VIEWS_RETENTION_DAYS", "90"))
+    PAGE_VIEWS_HOURLY_DAYS = int(os.environ.get("PAGE_VIEWS_HOURLY_DAYS", "30"))
+
+    # Кэш справочников (app/reference_data.py): каталог, через который воркеры
+    # gunicorn делятся прочитанными справочниками (файл на версию). Не задан —
+    # каждый процесс читает их из БД сам.
+    REFERENCE_SNAPSHOT_DIR = os.environ.get("REFERENCE_SNAPSHOT_DIR")
+
+    # Рендерить статичные блоки шаблонов на все языки при старте процесса
+    # (app/i18n.py, prerender_fragments), а не при первом запросе с языком.
+    I18N_PRERENDER_FRAGMENTS = os.environ.get("I18N_PRERENDER_FRAGMENTS", "0") == "1"
+
+    # Окно, за которое уведомления «вас обошли по цене» по одному заказу
+    # собираются в одну рассылку (app/auctions.py). 0 — сразу после ставки.
+    OUTBID_WINDOW_SECONDS = int(os.environ.get("OUTBID_WINDOW_SECONDS", "60"))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    TASKS_EAGER = os.environ.get("TASKS_EAGER", "1") == "1"  # локально воркер обычно не запущен
+    OUTBID_WINDOW_SECONDS = int(os.environ.get("OUTBID_WINDOW_SECONDS", "0"))  # отложенные задачи без воркера не выполнятся
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL", "sqlite:///" + os.path.join(BASE_DIR, "instance", "b2b_platform.db")
     )
@@ -106,10 +133,14 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get("TEST_DATABASE_URL", "sqlite:///:memory:")
     WTF_CSRF_ENABLED = False
+    TASKS_EAGER = True
+    PAGE_VIEWS_FLUSH_SECONDS = 0
+    OUTBID_WINDOW_SECONDS = 0
 
 
 class ProductionConfig(Config):
     DEBUG = False
+    I18N_PRERENDER_FRAGMENTS = os.environ.get("I18N_PRERENDER_FRAGMENTS", "1") == "1"
     SQLALCHEMY_DATABASE_URI = _normalize_db_url(os.environ.get("DATABASE_URL"))
 
 
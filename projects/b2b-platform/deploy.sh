@@ -11,10 +11,18 @@ cd projects/b2b-platform
 echo "== flask db upgrade =="
 source venv/bin/activate
 flask db upgrade
+flask search-reindex --if-empty
+flask geo-reindex --if-empty
+flask page-views-rollup --if-empty
 deactivate
 
 echo "== restart b2b-platform =="
 systemctl restart b2b-platform
+# воркер фоновой очереди (flask tasks-worker) — отдельный unit, если заведён;
+# без него задачи подбора/рассылки будут ждать в background_tasks
+if systemctl cat b2b-platform-worker >/dev/null 2>&1; then
+    systemctl restart b2b-platform-worker
+fi
 
 echo "== готово, статус сервиса =="
 systemctl status b2b-platform --no-pager -l | head -10
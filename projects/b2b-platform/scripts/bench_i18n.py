@@ -0,0 +1,125 @@
+"""Микробенчмарк переводов интерфейса: отрисовка ленты заказов
+исполнителя (/dashboard) и отдельные вызовы t().
+
+Запуск из папки проекта:  python scripts/bench_i18n.py [--orders 30] [--repeat 200] [--legacy]
+
+--legacy — в том же прогоне замерить ещё и прежнюю схему: t() ищет строку
+во вложенном STRINGS и форматирует её str.format, язык определяется
+заново на каждый вызов, ссылки шапки рендерятся на каждой странице.
+
+БД — SQLite в памяти (конфигурация testing), так что время страницы —
+это в основном шаблон и переводы в нём, а не сеть до БД.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import current_app, session  # noqa: E402
+from markupsafe import Markup  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app, db, i18n  # noqa: E402
+from app.models import CustomerProfile, Order, Region, ServiceCategory, User  # noqa: E402
+
+
+def _setup(app, orders):
+    region = Region(name_ru="Ташкент", name_uz_latin="Toshkent", name_uz_cyrillic="Тошкент")
+    category = ServiceCategory(name_ru="Токарные работы", name_uz_latin="Tokarlik", name_uz_cyrillic="Токарлик")
+    customer = User(email="bench-customer@example.com", role="customer", email_confirmed=True)
+    executor = User(
+        email="bench-executor@example.com", role="executor", email_confirmed=True, preferred_language="uz_latin",
+        password_hash=generate_password_hash("password123"),
+    )
+    db.session.add_all([region, category, customer, executor])
+    db.session.flush()
+    profile = CustomerProfile(user_id=customer.id, display_name="ООО Бенч", region_id=region.id)
+    db.session.add(profile)
+    db.session.flush()
+    now = datetime.utcnow()
+    for n in range(orders):
+        db.session.add(Order(
+            customer_id=profile.id, title=f"Заявка {n}", description="—", order_type="manufacturing",
+            service_category_id=category.id, region_id=region.id, created_at=now - timedelta(minutes=n),
+        ))
+    db.session.commit()
+
+
+def _legacy_get_current_lang():
+    return i18n._resolve_lang()
+
+
+def _legacy_translate(key, **kwargs):
+    entry = i18n.STRINGS.get(key)
+    if not entry:
+        return key
+    text = entry.get(i18n.get_current_lang(), entry["ru"])
+    return text.format(**kwargs) if kwargs else text
+
+
+def _legacy_static_fragment(template_name, **params):
+    return Markup(current_app.jinja_env.get_template(template_name).render(**params))
+
+
+def _install_legacy(app):
+    """Подменяет переводы прежней реализацией (до compile_catalog)."""
+    # label-функции и context processor берут их из модуля при вызове
+    i18n.get_current_lang = _legacy_get_current_lang
+    i18n.translate = _legacy_translate
+    app.jinja_env.globals.update(t=_legacy_translate, static_fragment=_legacy_static_fragment)
+    app.jinja_env.cache.clear()
+
+
+def _timed(fn, repeat):
+    fn()  # прогрев: компиляция шаблонов, первые запросы
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--legacy", action="store_true", help="замерить и прежнюю схему переводов")
+    args = parser.parse_args()
+
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        _setup(app, args.orders)
+
+    client = app.test_client()
+    client.post("/auth/login", data={"email": "bench-executor@example.com", "password": "password123"})
+
+    def dashboard():
+        response = client.get("/dashboard")
+        assert response.status_code == 200, response.status_code
+
+    def translations():
+        with app.test_request_context("/"):
+            session["lang"] = "uz_latin"
+            plain = _timed(lambda: i18n.translate("order.table_status"), args.repeat * 100)
+            formatted = _timed(lambda: i18n.translate("order.km_short", value="12"), args.repeat * 100)
+        return plain, formatted
+
+    runs = [("сейчас", _timed(dashboard, args.repeat), translations())]
+    if args.legacy:
+        _install_legacy(app)
+        runs.append(("прежняя схема", _timed(dashboard, args.repeat), translations()))
+
+    for label, page, (plain, formatted) in runs:
+        print(
+            f"{label}: /dashboard ({args.orders} заявок) {page * 1000:.2f} мс на запрос; "
+            f"t() без параметров {plain * 1e6:.2f} мкс, с параметрами {formatted * 1e6:.2f} мкс"
+        )
+    if args.legacy:
+        print(f"/dashboard: прежняя схема / сейчас = {runs[1][1] / runs[0][1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
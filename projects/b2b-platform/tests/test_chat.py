@@ -1,3 +1,4 @@
+from app import db
 from app.models import Conversation, Message, Notification, Order, User
 
 from tests.conftest import register
@@ -144,3 +145,125 @@ def test_inbox_lists_conversation_with_unread_count(client):
     resp = client.get("/messages")
     assert "constructor@example.com".encode() in resp.data
     assert "Готов взяться за проект".encode() in resp.data
+
+
+def _pair(client, first="sse-a@example.com", second="sse-b@example.com"):
+    """Два пользователя; в клиенте остаётся залогинен second."""
+    register(client, email=first, role="executor")
+    client.get("/auth/logout")
+    register(client, email=second, role="executor")
+    with client.application.app_context():
+        return (User.query.filter_by(email=first).first().id, User.query.filter_by(email=second).first().id)
+
+
+def test_conversation_keeps_last_message_and_unread_per_side(client):
+    first_id, second_id = _pair(client)
+    client.post(f"/messages/u/{first_id}", data={"body": "Раз"})
+    client.post(f"/messages/u/{first_id}", data={"body": "Два"})
+
+    with client.application.app_context():
+        conversation = Conversation.query.one()
+        first, second = db.session.get(User, first_id), db.session.get(User, second_id)
+        assert conversation.last_message.body == "Два"
+        assert (conversation.unread_for(first), conversation.unread_for(second)) == (2, 0)
+
+    client.get("/auth/logout")
+    _login(client, "sse-a@example.com")
+    resp = client.get("/messages")
+    assert '<span class="notif-badge">2</span>'.encode() in resp.data
+    client.get(f"/messages/u/{second_id}")
+    with client.application.app_context():
+        assert Conversation.query.one().unread_a == 0
+
+
+def test_event_stream_delivers_new_messages_and_marks_them_read(client, monkeypatch):
+    from app import chat_events
+
+    monkeypatch.setattr(chat_events, "SSE_MAX_SECONDS", 0)
+    first_id, second_id = _pair(client)
+    client.post(f"/messages/u/{first_id}", data={"body": "Первое"})
+    with client.application.app_context():
+        first_message_id = Message.query.one().id
+    client.post(f"/messages/u/{first_id}", data={"body": "Второе"})
+
+    client.get("/auth/logout")
+    _login(client, "sse-a@example.com")
+    resp = client.get(f"/messages/u/{second_id}/events", headers={"Last-Event-ID": str(first_message_id)})
+    assert resp.mimetype == "text/event-stream"
+    text = resp.get_data(as_text=True)
+    assert text.startswith("retry: ")
+    assert "Второе" in text and "Первое" not in text
+    assert text.count("event: message") == 1
+    resp.close()
+
+    with client.application.app_context():
+        assert Message.query.filter(Message.read_at.is_(None)).count() == 1  # «Первое» поток не отдавал
+        assert db.session.get(User, first_id).unread_messages == 1
+
+    # пока диалога нет — поток не нужен
+    register(client, email="sse-c@example.com", role="executor")
+    assert client.get(f"/messages/u/{first_id}/events").status_code == 204
+
+
+def test_event_streams_are_limited_per_process(client, monkeypatch):
+    import threading
+
+    from app import chat_events
+
+    monkeypatch.setattr(chat_events, "SSE_MAX_SECONDS", 0)
+    monkeypatch.setattr(chat_events, "stream_slots", threading.BoundedSemaphore(1))
+    first_id, second_id = _pair(client)
+    client.post(f"/messages/u/{first_id}", data={"body": "Привет"})
+
+    held = client.get(f"/messages/u/{first_id}/events")
+    assert held.mimetype == "text/event-stream"
+    # поток занят — вторая вкладка получает 204 и опрашивает new.json
+    assert client.get(f"/messages/u/{first_id}/events").status_code == 204
+    # сервер закрывает ответ, когда поток окончен или клиент ушёл
+    held.close()
+    for _ in range(2):
+        resp = client.get(f"/messages/u/{first_id}/events")
+        assert resp.mimetype == "text/event-stream"
+        resp.close()
+
+
+def test_broker_wakes_only_subscribers_of_the_conversation():
+    from app.chat_events import Broker
+
+    broker = Broker()
+    inbox = broker.subscribe(1)
+    other = broker.subscribe(2)
+    broker.publish(1)
+    broker.publish(1)  # сигналы склеиваются
+
+    assert broker.wait(inbox, 0.1) is True
+    assert broker.wait(inbox, 0.01) is False
+    assert broker.wait(other, 0.01) is False
+
+    broker.unsubscribe(1, inbox)
+    broker.publish(1)
+    assert broker.wait(inbox, 0.01) is False
+
+
+def test_thread_pages_messages_with_keyset(client, monkeypatch):
+    from app.routes import chat
+
+    monkeypatch.setattr(chat, "CHAT_PAGE_SIZE", 3)
+    first_id, second_id = _pair(client)
+    for n in range(5):
+        client.post(f"/messages/u/{first_id}", data={"body": f"Сообщение {n}"})
+
+    resp = client.get(f"/messages/u/{first_id}")
+    text = resp.get_data(as_text=True)
+    assert "Сообщение 4" in text and "Сообщение 1" not in text
+    assert "before_id=" in text
+
+    with client.application.app_context():
+        ids = [m.id for m in Message.query.order_by(Message.id)]
+    resp = client.get(f"/messages/u/{first_id}?before_id={ids[2]}")
+    text = resp.get_data(as_text=True)
+    assert "Сообщение 0" in text and "Сообщение 2" not in text
+    assert "data-stream-url" not in text  # старые страницы не слушают поток
+
+    data = client.get(f"/messages/u/{first_id}/new.json?after_id={ids[0]}").get_json()
+    assert [m["id"] for m in data["messages"]] == ids[1:4]
@@ -0,0 +1,116 @@
+import threading
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Notification, PushDeviceToken, TelegramLink, User
+from app.notify import notify_many
+from app.telegram_bot import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 3))
+
+
+def test_rate_limiter_spaces_messages_per_chat_and_globally():
+    clock = FakeClock()
+    limiter = RateLimiter(global_per_second=10, per_key_per_second=1, clock=clock, sleep=clock.sleep)
+
+    limiter.wait(1)
+    limiter.wait(2)  # другой чат — только глобальный интервал
+    limiter.wait(1)  # тот же чат — через секунду после первого
+
+    assert clock.slept == [0.1, 1.0]
+
+    limiter.pause(5)
+    limiter.wait(3)
+    assert clock.slept[-1] == 5.0
+
+
+def _users(n, telegram=True, devices=()):
+    users = []
+    for i in range(n):
+        user = User(email=f"u{i}@example.com", role="executor")
+        db.session.add(user)
+        db.session.flush()
+        if telegram:
+            db.session.add(TelegramLink(user_id=user.id, telegram_chat_id=1000 + i))
+        for token in devices:
+            db.session.add(PushDeviceToken(user_id=user.id, token=f"{token}-{i}"))
+        users.append(user)
+    db.session.commit()
+    return users
+
+
+def test_notify_many_sends_telegram_concurrently_and_records_stats(app, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+    sent = []
+
+    def fake_send(chat_id, text):
+        barrier.wait()  # дождётся второго потока только при параллельной отправке
+        sent.append(chat_id)
+        return chat_id != 1001
+
+    monkeypatch.setattr("app.telegram_bot.send_message", fake_send)
+    with app.app_context():
+        users = _users(2)
+
+        notifications = notify_many(users, "new_order_broadcast", "Новая заявка", url="/orders/1")
+        db.session.commit()
+
+        assert sorted(sent) == [1000, 1001]
+        ok, failed = sorted(notifications, key=lambda n: n.user_id)
+        assert ok.telegram_sent is True and ok.telegram_failures == 0
+        assert failed.telegram_sent is False and failed.telegram_failures == 1
+        assert ok.telegram_latency_ms is not None
+
+
+def test_notify_many_commits_notifications_before_sending(app, monkeypatch):
+    commits = []
+    seen_at_send = []
+
+    def count_commit(session):
+        commits.append(session)
+
+    def fake_send(chat_id, text):
+        seen_at_send.append(len(commits))
+        return True
+
+    monkeypatch.setattr("app.telegram_bot.send_message", fake_send)
+    with app.app_context():
+        users = _users(2)
+        event.listen(db.session, "after_commit", count_commit)
+        try:
+            notifications = notify_many(users, "new_order_broadcast", "Новая заявка")
+        finally:
+            event.remove(db.session, "after_commit", count_commit)
+
+        # уведомления и счётчики закоммичены до отправок, итоги — вторым коммитом
+        assert seen_at_send == [1, 1]
+        assert len(commits) == 2
+        assert all(n.telegram_sent for n in notifications)
+        assert [u.unread_notifications for u in User.query.order_by(User.id)] == [1, 1]
+
+
+def test_notify_many_push_drops_stale_tokens_in_one_batch(app, monkeypatch):
+    from app import push
+
+    results = {"good-0": True, "stale-0": push.STALE, "good-1": True, "stale-1": push.STALE}
+    monkeypatch.setattr(push, "prepare_sender", lambda: lambda message: results[message["message"]["token"]])
+    with app.app_context():
+        users = _users(2, telegram=False, devices=("good", "stale"))
+
+        notifications = notify_many(users, "new_order_broadcast", "Новая заявка")
+        db.session.commit()
+
+        assert all(n.push_sent and n.push_failures == 1 for n in notifications)
+        assert sorted(t.token for t in PushDeviceToken.query) == ["good-0", "good-1"]
+        assert Notification.query.count() == 2
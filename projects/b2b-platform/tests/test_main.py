@@ -220,3 +220,32 @@ def test_sitemap_uses_configured_public_base_url(client):
     body = resp.get_data(as_text=True)
     assert "https://b2b.robutpit.com/" in body
     assert "http://localhost" not in body
+
+
+def test_compiled_catalog_matches_source_strings():
+    from app.i18n import CATALOG, STRINGS, SUPPORTED_LANGUAGES
+
+    for lang in SUPPORTED_LANGUAGES:
+        texts, templates = CATALOG[lang]
+        for key, entry in STRINGS.items():
+            text = entry.get(lang, entry["ru"])
+            assert texts[key] == text
+            if key in templates:
+                fields = {field: f"<{field}>" for _, field, _, _ in templates[key].parts if field}
+                assert templates[key].format(fields) == text.format(**fields)
+
+
+def test_language_switch_rerenders_cached_nav(client):
+    register(client, email="lang@example.com", role="executor")
+    assert "Лента заказов" in client.get("/").get_data(as_text=True)
+
+    client.get("/lang/uz_latin")
+    text = client.get("/").get_data(as_text=True)
+    assert "Buyurtmalar lentasi" in text and "Лента заказов" not in text
+
+    client.get("/auth/logout")
+    client.get("/lang/en")
+    register(client, email="lang-customer@example.com", role="customer")
+    client.get("/lang/ru")
+    text = client.get("/").get_data(as_text=True)
+    assert "Мои заказы" in text and "Лента заказов" not in text
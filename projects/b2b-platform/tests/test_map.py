@@ -1,3 +1,6 @@
+import gzip
+import json
+
 from app.models import ListingCategory, Region
 
 from tests.conftest import register
@@ -219,3 +222,216 @@ def test_nearby_json_kinds_param_combines_layers(client):
     data = resp.get_json()
     kinds_found = {item["kind"] for item in data}
     assert kinds_found == {"executor", "constructor"}
+
+
+def _listing_at(lat=None, lng=None, region=None, title="Станок"):
+    from app import db
+    from app.models import Listing, User
+
+    author = User.query.filter_by(email="geoauthor@example.com").first()
+    if author is None:
+        author = User(email="geoauthor@example.com", role="customer")
+        db.session.add(author)
+        db.session.flush()
+    listing = Listing(
+        author_id=author.id, listing_intent="sell", category_id=ListingCategory.query.first().id,
+        region_id=(region or Region.query.first()).id, title=title, description="-", latitude=lat, longitude=lng,
+    )
+    db.session.add(listing)
+    db.session.commit()
+    return listing
+
+
+def test_geo_index_tracks_own_point_region_fallback_and_deletes(app):
+    from app import db
+    from app.models import GeoPoint
+
+    with app.app_context():
+        region = Region.query.first()
+        exact = _listing_at(41.5, 69.5)
+        approx = _listing_at()
+
+        points = {p.entity_id: p for p in GeoPoint.query.filter_by(kind="seller")}
+        assert (points[exact.id].lat, points[exact.id].approximate) == (41.5, False)
+        assert (points[approx.id].lat, points[approx.id].lng, points[approx.id].approximate) == (41.0, 69.3, True)
+
+        region.latitude = 40.0
+        exact.latitude = 42.0
+        db.session.commit()
+        assert db.session.get(GeoPoint, ("seller", approx.id)).lat == 40.0
+        assert db.session.get(GeoPoint, ("seller", exact.id)).lat == 42.0
+
+        approx.latitude, approx.longitude = 39.0, 66.0  # поставили свою точку
+        db.session.commit()
+        assert db.session.get(GeoPoint, ("seller", approx.id)).approximate is False
+
+        approx_id = approx.id
+        db.session.delete(approx)
+        db.session.commit()
+        assert db.session.get(GeoPoint, ("seller", approx_id)) is None
+
+
+def test_geo_index_radius_and_nearest_match_brute_force(app):
+    import random
+
+    from app import geo_index
+    from app.geo import haversine_km
+
+    rng = random.Random(3)
+    with app.app_context():
+        listings = [_listing_at(41.3 + rng.uniform(-2, 2), 69.2 + rng.uniform(-3, 3)) for _ in range(150)]
+        distances = sorted(
+            (haversine_km(41.3, 69.2, item.latitude, item.longitude), item.id) for item in listings
+        )
+
+        hits = geo_index.within_radius(["seller"], 41.3, 69.2, 120)
+        assert [entity_id for _, entity_id, _ in hits] == [i for d, i in distances if d <= 120]
+        assert all(abs(d - hit[2]) < 1e-9 for (d, _), hit in zip(distances, hits))
+
+        nearest = geo_index.nearest(["seller"], 41.3, 69.2, 7)
+        assert [entity_id for _, entity_id, _ in nearest] == [i for _, i in distances[:7]]
+
+        assert geo_index.within_radius(["executor"], 41.3, 69.2, 500) == []
+
+
+def test_nearby_json_k_nearest_and_kinds(client):
+    region_id = _setup_customer(client, "geok@example.com")
+    _setup_executor(client, "geoexec@example.com", region_id)
+    _setup_constructor(client, "geocons@example.com", region_id)
+    with client.application.app_context():
+        far_id = _listing_at(39.65, 66.96, title="Далёкий станок").id  # Самарканд, ~270 км
+
+    _login(client, "geok@example.com")
+    resp = client.get("/map/nearby.json?lat=41.30&lng=69.25&k=2&kinds=executor,constructor,seller")
+    assert [p["kind"] for p in resp.get_json()] == ["executor", "constructor"]
+
+    resp = client.get("/map/nearby.json?lat=41.30&lng=69.25&k=3&kinds=seller")
+    data = resp.get_json()
+    assert [p["id"] for p in data] == [far_id]
+    assert data[0]["distance_km"] > 200
+
+
+def test_map_layer_etag_gzip_and_invalidation(client):
+    from app import db
+    from app.models import CacheVersion, User
+
+    register(client, email="mapcache@example.com", role="customer")
+    with client.application.app_context():
+        for n in range(5):
+            _listing_at(41.3, 69.2, title=f"Токарный станок №{n}")
+        version = db.session.get(CacheVersion, "map:seller").version
+
+    resp = client.get("/map/sellers.json")
+    assert len(resp.get_json()) == 5
+    etag = resp.headers["ETag"]
+    assert resp.headers["Vary"] == "Accept-Encoding"
+
+    resp = client.get("/map/sellers.json", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    resp = client.get("/map/sellers.json", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["ETag"] != etag
+    assert len(json.loads(gzip.decompress(resp.data))) == 5
+
+    with client.application.app_context():
+        user = User.query.filter_by(email="mapcache@example.com").first()
+        user.last_login_at = user.created_at  # к слою карты не относится
+        db.session.commit()
+        assert db.session.get(CacheVersion, "map:seller").version == version
+
+        _listing_at(41.3, 69.2, title="Ещё один")
+        assert db.session.get(CacheVersion, "map:seller").version == version + 1
+
+    resp = client.get("/map/sellers.json", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert len(resp.get_json()) == 6
+
+
+def test_executor_layer_invalidated_by_profile_change(client):
+    from app import db
+    from app.models import ExecutorProfile
+
+    region_id = _setup_customer(client, "mapcache2@example.com")
+    _setup_executor(client, "mapcache-exec@example.com", region_id)
+
+    _login(client, "mapcache2@example.com")
+    assert client.get("/map/executors.json?org_type=zavod").get_json() == []
+
+    with client.application.app_context():
+        ExecutorProfile.query.first().org_type = "zavod"
+        db.session.commit()
+
+    data = client.get("/map/executors.json?org_type=zavod").get_json()
+    assert [p["org_type"] for p in data] == ["zavod"]
+
+
+def test_tile_index_clusters_are_consistent_across_zooms():
+    import random
+
+    from app.map_tiles import MAX_CLUSTER_ZOOM, TileIndex, project
+
+    rng = random.Random(5)
+    points = [(n, 41.3 + rng.uniform(-2, 2), 69.2 + rng.uniform(-3, 3)) for n in range(1, 301)]
+    index = TileIndex(*zip(*points))
+
+    for zoom in (0, 5, 9, MAX_CLUSTER_ZOOM):
+        assert int(index.levels[zoom].count.sum()) == 300
+    assert len(index.levels[0].count) <= len(index.levels[9].count) <= len(index.levels[MAX_CLUSTER_ZOOM].count)
+
+    _, lat, lng = points[0]
+    x, y = project([lat], [lng])
+    zoom = MAX_CLUSTER_ZOOM + 3
+    tile_x, tile_y = int(x[0] * 2 ** zoom), int(y[0] * 2 ** zoom)
+    assert 1 in index.points(zoom, tile_x, tile_y)
+
+    cells = index.clusters(9, int(x[0] * 2 ** 9), int(y[0] * 2 ** 9))
+    assert sum(count for _, _, count, _, _, _ in cells) >= 1
+
+
+def test_tiles_json_clusters_low_zoom_and_points_high_zoom(client):
+    from app.map_tiles import project
+
+    register(client, email="tiles@example.com", role="customer")
+    with client.application.app_context():
+        for n in range(3):
+            _listing_at(41.30 + n * 0.001, 69.25, title=f"Станок {n}")
+        far_id = _listing_at(39.65, 66.96, title="Далёкий станок").id
+
+    data = client.get("/map/tiles/0/0/0.json?kinds=seller").get_json()
+    assert data["points"] == []
+    assert [(c["count"], c["kinds"]) for c in data["clusters"]] == [(4, {"seller": 4})]
+
+    x, y = project([39.65], [66.96])
+    tile_x, tile_y = int(x[0] * 2 ** 16), int(y[0] * 2 ** 16)
+    data = client.get(f"/map/tiles/16/{tile_x}/{tile_y}.json?kinds=seller").get_json()
+    assert data["clusters"] == []
+    assert [p["id"] for p in data["points"]] == [far_id]
+
+    assert client.get("/map/tiles/1/2/0.json").status_code == 404
+
+
+def test_tiles_rebuild_only_changed_layer(client):
+    region_id = _setup_customer(client, "tiles2@example.com")
+    _setup_executor(client, "tiles-exec@example.com", region_id)
+    with client.application.app_context():
+        from app import db
+        from app.models import User
+
+        # автор объявления заранее: новый пользователь меняет и версию слоя исполнителей
+        db.session.add(User(email="geoauthor@example.com", role="customer"))
+        db.session.commit()
+
+    _login(client, "tiles2@example.com")
+    data = client.get("/map/tiles/0/0/0.json").get_json()
+    assert [p["kind"] for p in data["points"]] == ["executor"]
+
+    indexes = client.application.extensions["map_tiles"]
+    executor_index, seller_index = indexes["executor"], indexes["seller"]
+    with client.application.app_context():
+        _listing_at(41.31, 69.26)
+
+    data = client.get("/map/tiles/0/0/0.json").get_json()
+    assert [(c["count"], c["kinds"]) for c in data["clusters"]] == [(2, {"executor": 1, "seller": 1})]
+    assert indexes["executor"] is executor_index
+    assert indexes["seller"] is not seller_index
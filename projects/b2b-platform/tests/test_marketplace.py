@@ -115,3 +115,58 @@ def test_only_owner_can_change_status(client):
     register(client, email="stranger@example.com", role="executor")
     resp = client.post(f"/marketplace/{listing_id}/status", data={"status": "closed"}, follow_redirects=False)
     assert resp.status_code == 404
+
+
+def test_marketplace_feed_pages_with_cursor(client, monkeypatch):
+    import re
+    from datetime import datetime
+
+    from sqlalchemy import event
+
+    from app import db, feeds
+    from app.models import Listing
+
+    monkeypatch.setattr(feeds, "FEED_PAGE_SIZE", 2)
+    register(client, email="feed@example.com", role="customer")
+    with client.application.app_context():
+        user_id = User.query.filter_by(email="feed@example.com").first().id
+        category_id = ListingCategory.query.first().id
+        region_id = Region.query.first().id
+        same_time = datetime(2026, 1, 1, 12, 0)  # равные created_at различает id
+        for n in range(5):
+            db.session.add(Listing(
+                author_id=user_id, listing_intent="sell", category_id=category_id, title=f"Станок №{n}",
+                description="—", region_id=region_id, created_at=same_time,
+            ))
+        db.session.add(Listing(
+            author_id=user_id, listing_intent="buy", category_id=category_id, title="Куплю станок",
+            description="—", region_id=region_id,
+        ))
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    seen, url, pages = [], "/marketplace?intent=sell", 0
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        while url:
+            text = client.get(url).get_data(as_text=True)
+            seen += re.findall(r"Станок №(\d)", text)
+            assert "Куплю станок" not in text  # фильтр сохраняется на всех страницах
+            match = re.search(r'href="([^"]*cursor=[^"]*)"', text)
+            url = match.group(1).replace("&amp;", "&") if match else None
+            pages += 1
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert seen == ["4", "3", "2", "1", "0"]
+    assert pages == 3
+    # категория и регион карточек — одним запросом на страницу, а не на карточку
+    assert sum("FROM listing_categories" in s for s in statements) <= pages * 2
+
+    text = client.get("/marketplace?cursor=испорчен").get_data(as_text=True)
+    assert "Куплю станок" in text
@@ -0,0 +1,131 @@
+import random
+from datetime import datetime, timedelta
+
+from app import db
+from app.geo import haversine_km
+from app.matching import TOP_N_CANDIDATES, _fits_dimensions, _score, find_candidates
+from app.models import (
+    CustomerProfile,
+    EquipmentType,
+    ExecutorCapability,
+    ExecutorEquipment,
+    ExecutorProfile,
+    Material,
+    Order,
+    Region,
+    ServiceCategory,
+    Subscription,
+    SubscriptionPlan,
+    User,
+)
+
+
+def _executor(n, lat=41.31, lon=69.26, radius_km=200, role="executor", equipment=True,
+              subscription="trialing", expires_in_days=30, rating=None, material=True, **caps):
+    user = User(email=f"exec{n}@example.com", role=role, email_confirmed=True)
+    profile = ExecutorProfile(
+        user=user, org_type="tsekh", display_name=f"Цех {n}", region_id=Region.query.first().id,
+        latitude=lat, longitude=lon, service_radius_km=radius_km, rating_avg=rating,
+    )
+    capability = ExecutorCapability(executor=profile, **caps)
+    capability.service_categories.append(ServiceCategory.query.first())
+    if material:
+        capability.materials.append(Material.query.first())
+    if equipment:
+        profile.equipment.append(ExecutorEquipment(equipment_type_id=EquipmentType.query.first().id))
+    db.session.add(profile)
+    db.session.flush()
+    if subscription:
+        db.session.add(Subscription(
+            executor_id=profile.id, plan_id=SubscriptionPlan.query.first().id, status=subscription,
+            expires_at=datetime.utcnow() + timedelta(days=expires_in_days),
+        ))
+    return profile
+
+
+def _order(**overrides):
+    customer = CustomerProfile(user=User(email="cust@example.com", role="customer"))
+    db.session.add(customer)
+    db.session.flush()
+    data = dict(
+        customer_id=customer.id, title="Вал", description="Выточить вал", order_type="manufacturing",
+        service_category_id=ServiceCategory.query.first().id, material_id=Material.query.first().id,
+        region_id=Region.query.first().id, latitude=41.30, longitude=69.25,
+    )
+    data.update(overrides)
+    order = Order(**data)
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def _reference_candidates(order):
+    """Прежний построчный алгоритм — эталон для сверки."""
+    from app.subscriptions import has_active_subscription
+
+    results = []
+    for capability in ExecutorCapability.query.order_by(ExecutorCapability.id):
+        executor = capability.executor
+        if order.service_category_id not in {sc.id for sc in capability.service_categories}:
+            continue
+        if executor.user.role != "executor" or not executor.equipment or not has_active_subscription(executor):
+            continue
+        if not _fits_dimensions(order, capability):
+            continue
+        distance_km = haversine_km(order.latitude, order.longitude, executor.latitude, executor.longitude)
+        if distance_km is not None and executor.service_radius_km and distance_km > executor.service_radius_km:
+            continue
+        results.append((executor.id, _score(order, executor, capability, distance_km), distance_km))
+    results.sort(key=lambda item: item[1], reverse=True)
+    return results[:TOP_N_CANDIDATES]
+
+
+def test_find_candidates_applies_mandatory_filters_in_query(app):
+    with app.app_context():
+        good = _executor(1)
+        _executor(2, role="customer")
+        _executor(3, equipment=False)
+        _executor(4, subscription="expired")
+        _executor(5, expires_in_days=-1)
+        _executor(6, max_length_mm=100)
+        _executor(7, lat=43.0, radius_km=50)        # ~190 км к северу — вне радиуса
+        _executor(8, lat=41.31, lon=71.0, radius_km=50)  # та же широта, но ~145 км к востоку
+        order = _order(dimensions_length_mm=500)
+
+        candidates = find_candidates(order)
+
+        assert [executor.id for executor, _, _ in candidates] == [good.id]
+
+
+def test_find_candidates_scores_match_reference_formula(app):
+    rng = random.Random(7)
+    with app.app_context():
+        for n in range(60):
+            _executor(
+                n, lat=41.3 + rng.uniform(-1.5, 1.5), lon=69.25 + rng.uniform(-1.5, 1.5),
+                radius_km=rng.choice([0, 50, 150, None]), material=rng.random() < 0.5,
+                rating=rng.choice([None, 3.5, 4.25, 5.0]),
+                max_weight_kg=rng.choice([None, 10, 1000]),
+            )
+        _executor(100, lat=None, lon=None)  # без координат — нейтральный балл
+        order = _order(weight_kg=50)
+
+        expected = _reference_candidates(order)
+        actual = [(executor.id, score, distance) for executor, score, distance in find_candidates(order)]
+
+        assert len(actual) == len(expected) == TOP_N_CANDIDATES
+        assert [score for _, score, _ in actual] == [score for _, score, _ in expected]
+        for (_, _, d_actual), (_, _, d_expected) in zip(actual, expected):
+            assert (d_actual is None) == (d_expected is None)
+            if d_actual is not None:
+                assert abs(d_actual - d_expected) < 1e-9
+
+
+def test_find_candidates_keeps_insertion_order_on_equal_scores(app):
+    with app.app_context():
+        ids = [_executor(n).id for n in range(TOP_N_CANDIDATES + 5)]
+        order = _order()
+
+        candidates = find_candidates(order)
+
+        assert [executor.id for executor, _, _ in candidates] == ids[:TOP_N_CANDIDATES]
@@ -1,6 +1,10 @@
 import io
+from datetime import datetime, timedelta
 
-from app.models import Bid, EquipmentType, Material, Notification, Order, OrderMedia, Region, ServiceCategory, User
+from app import auctions, db
+from app.models import BackgroundTask, Bid, ExecutorProfile, EquipmentType, Material, Notification, Order, OrderMedia, Region, ServiceCategory, User
+
+from app.tasks import claim_batch, run_task, work
 
 from tests.conftest import register
 
@@ -300,6 +304,113 @@ def test_full_bid_and_assignment_flow(client):
         assert order.status == "completed"
 
 
+def _bid(client, email, order_id, price):
+    _login(client, email)
+    client.post(f"/orders/{order_id}/bid", data={"price": price, "currency": "UZS", "lead_time_days": "5"})
+    client.get("/auth/logout")
+
+
+def _run_outbid_digest(app):
+    with app.app_context():
+        BackgroundTask.query.filter_by(kind="outbid_digest", status="pending").update(
+            {"run_after": datetime.utcnow() - timedelta(seconds=1)},
+        )
+        db.session.commit()
+        work(once=True)
+
+
+def _outbid_counts(app):
+    with app.app_context():
+        return {
+            email: Notification.query.join(User).filter(User.email == email, Notification.type == "outbid").count()
+            for email in ("outa@example.com", "outb@example.com", "outc@example.com")
+        }
+
+
+def test_outbid_notifications_are_batched_per_order_window(client, monkeypatch):
+    app = client.application
+    monkeypatch.setitem(app.config, "OUTBID_WINDOW_SECONDS", 60)
+    region_id = _setup_customer(client, "cust-out@example.com")
+    service_id, _ = _setup_executor(client, "outa@example.com", region_id)
+    _setup_executor(client, "outb@example.com", region_id)
+    _setup_executor(client, "outc@example.com", region_id)
+    _login(client, "cust-out@example.com")
+    _create_order(client, region_id, service_id)
+    client.get("/auth/logout")
+    with app.app_context():
+        order_id = Order.query.first().id
+
+    for email, price in (("outa@example.com", "500000"), ("outb@example.com", "400000"),
+                         ("outc@example.com", "300000"), ("outb@example.com", "350000")):
+        _bid(client, email, order_id, price)
+
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        assert (order.best_bid_price, order.active_bids_count) == (300000, 3)
+        assert BackgroundTask.query.filter_by(kind="outbid_digest").count() == 1
+    # пока окно не прошло, уведомлений нет
+    assert _outbid_counts(app) == {"outa@example.com": 0, "outb@example.com": 0, "outc@example.com": 0}
+
+    _run_outbid_digest(app)
+    assert _outbid_counts(app) == {"outa@example.com": 1, "outb@example.com": 1, "outc@example.com": 0}
+
+    # A снизил цену, но лучшая та же — об этой цене он уже знает
+    _bid(client, "outa@example.com", order_id, "320000")
+    _run_outbid_digest(app)
+    assert _outbid_counts(app) == {"outa@example.com": 1, "outb@example.com": 1, "outc@example.com": 0}
+
+    _login(client, "outa@example.com")
+    page = client.get(f"/orders/{order_id}").get_data(as_text=True)
+    assert "Ваша ставка — 2-я по цене из 3, лучшая цена 300000" in page
+    client.get("/auth/logout")
+
+    _bid(client, "outb@example.com", order_id, "250000")
+    _run_outbid_digest(app)
+    assert _outbid_counts(app) == {"outa@example.com": 2, "outb@example.com": 1, "outc@example.com": 1}
+
+
+def test_bid_saved_while_outbid_digest_runs_gets_its_own_digest(client, monkeypatch):
+    app = client.application
+    monkeypatch.setitem(app.config, "OUTBID_WINDOW_SECONDS", 60)
+    region_id = _setup_customer(client, "cust-race@example.com")
+    service_id, _ = _setup_executor(client, "outa@example.com", region_id)
+    _setup_executor(client, "outb@example.com", region_id)
+    _setup_executor(client, "outc@example.com", region_id)
+    _login(client, "cust-race@example.com")
+    _create_order(client, region_id, service_id)
+    client.get("/auth/logout")
+    with app.app_context():
+        order_id = Order.query.first().id
+        executor_c_id = ExecutorProfile.query.join(ExecutorProfile.user).filter(User.email == "outc@example.com").one().id
+
+    _bid(client, "outa@example.com", order_id, "500000")
+    _bid(client, "outb@example.com", order_id, "400000")
+
+    real_ranking = auctions.ranking
+
+    def ranking_then_bid(order):
+        # сводка уже прочитала ставки — и тут C обходит и A, и B
+        result = real_ranking(order)
+        monkeypatch.setattr(auctions, "ranking", real_ranking)
+        db.session.add(Bid(order_id=order.id, executor_id=executor_c_id, price=300000, lead_time_days=5))
+        db.session.commit()
+        auctions.bid_placed(order)
+        return result
+
+    with app.app_context():
+        BackgroundTask.query.filter_by(kind="outbid_digest").update({"run_after": datetime.utcnow()})
+        db.session.commit()
+        [running] = claim_batch("test")
+        monkeypatch.setattr(auctions, "ranking", ranking_then_bid)
+        run_task(running)
+    assert _outbid_counts(app) == {"outa@example.com": 1, "outb@example.com": 0, "outc@example.com": 0}
+
+    with app.app_context():
+        assert BackgroundTask.query.filter_by(kind="outbid_digest", status="pending").count() == 1
+    _run_outbid_digest(app)
+    assert _outbid_counts(app) == {"outa@example.com": 2, "outb@example.com": 1, "outc@example.com": 0}
+
+
 def test_customer_can_cancel_accidental_assignment(client):
     """Случайный клик по «Выбрать» не должен быть необратимым, пока
     исполнитель ещё не начал работу — заказчику нужна кнопка «Отменить»."""
@@ -0,0 +1,96 @@
+from datetime import datetime, time, timedelta
+
+from app import db, page_views
+from app.models import PageView, PageViewDaily, PageViewHourly, PageViewVisitor, User
+
+
+def test_buffered_views_are_written_in_one_batch_with_rollups(app, monkeypatch):
+    buffer = app.extensions["page_views"]
+    monkeypatch.setattr(buffer, "interval", 60)
+    monkeypatch.setattr(buffer, "_start", lambda: None)  # без фонового потока — сбросим вручную
+    with app.app_context():
+        user = User(email="viewer@example.com", role="customer")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        buffer.record("/", None)
+        buffer.record("/orders", user_id)
+        buffer.record("/orders", user_id)
+        assert PageView.query.count() == 0
+
+        buffer.drain()
+        assert PageView.query.count() == 3
+        assert PageViewDaily.query.one().views == 3
+        assert PageViewHourly.query.one().views == 3
+        assert [v.user_id for v in PageViewVisitor.query] == [user_id]
+
+        buffer.record("/", user_id)
+        buffer.drain()
+        assert PageViewDaily.query.one().views == 4
+        assert PageViewVisitor.query.count() == 1
+
+
+def test_rebuild_rollups_and_prune_keep_daily_history(app):
+    app.config["PAGE_VIEWS_RETENTION_DAYS"] = 30
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            PageView(path="/", created_at=now - timedelta(days=100)),
+            PageView(path="/", created_at=now - timedelta(days=100, hours=1)),
+            PageView(path="/", created_at=now),
+        ])
+        db.session.commit()
+
+        assert page_views.rebuild_rollups() == 3
+        assert sum(d.views for d in PageViewDaily.query) == 3
+
+        assert page_views.prune(db.session.connection(), now) == 2
+        db.session.commit()
+        assert PageView.query.count() == 1
+        assert sum(d.views for d in PageViewDaily.query) == 3
+        assert PageViewHourly.query.count() == 1  # почасовая сводка старше 30 дней тоже удалена
+
+
+def test_rebuild_rollups_after_prune_keeps_older_history(app):
+    app.config["PAGE_VIEWS_RETENTION_DAYS"] = 30
+    now = datetime.utcnow()
+    old_day = (now - timedelta(days=100)).date()
+    with app.app_context():
+        user = User(email="old-viewer@example.com", role="customer")
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([
+            PageView(path="/", user_id=user.id, created_at=datetime.combine(old_day, time(12))),
+            PageView(path="/", created_at=datetime.combine(old_day, time(13))),
+            PageView(path="/", created_at=now - timedelta(days=10)),
+            PageView(path="/", created_at=now),
+        ])
+        db.session.commit()
+        page_views.rebuild_rollups()
+        page_views.prune(db.session.connection(), now)
+        db.session.commit()
+
+        # в логе только последние 30 дней — пересчитываются только они
+        assert page_views.rebuild_rollups() == 1
+        assert db.session.get(PageViewDaily, old_day).views == 2
+        assert sum(d.views for d in PageViewDaily.query) == 4
+        assert [v.user_id for v in PageViewVisitor.query] == [user.id]
+
+
+def test_admin_stats_reads_rollups(client):
+    from tests.test_admin_users import _make_admin
+    from tests.test_orders import _login
+
+    with client.application.app_context():
+        db.session.add(PageViewDaily(day=datetime.utcnow().date() - timedelta(days=400), views=1000))
+        db.session.commit()
+
+    _make_admin(client)
+    _login(client, "admin@example.com", "adminpass123")
+    with client.application.app_context():
+        expected = sum(d.views for d in PageViewDaily.query)  # 1000 + просмотры страниц входа
+    resp = client.get("/admin/stats")
+    assert resp.status_code == 200
+    assert expected > 1000
+    assert f">{expected}<".encode() in resp.data
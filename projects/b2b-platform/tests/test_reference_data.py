@@ -0,0 +1,71 @@
+from sqlalchemy import event
+
+from app import db, reference_data
+from app.models import City, Region
+
+from tests.conftest import register
+
+
+def _add_region(app, name, cities=()):
+    with app.app_context():
+        region = Region(name_ru=name, name_uz_latin=f"{name} (lat)", name_uz_cyrillic=f"{name} (кир)")
+        db.session.add(region)
+        db.session.flush()
+        for city in cities:
+            db.session.add(City(region_id=region.id, name_ru=city, name_uz_latin=city, name_uz_cyrillic=city))
+        db.session.commit()
+        return region.id
+
+
+def test_reference_lists_come_from_cache_until_tables_change(client):
+    app = client.application
+    register(client, email="ref@example.com", role="customer")
+    client.get("/marketplace")
+
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        resp = client.get("/marketplace")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert "Ташкентская область".encode() in resp.data
+    assert not any("FROM regions" in s for s in statements)
+
+    _add_region(app, "Андижанская область")
+    text = client.get("/marketplace").get_data(as_text=True)
+    # новая версия справочников — список перечитан и отсортирован по названию
+    assert text.index("Андижанская область") < text.index("Ташкентская область")
+
+    with app.app_context():
+        names = [region.name_uz_latin for region in reference_data.snapshot().items("regions", "uz_latin")]
+    assert names == sorted(names, key=str.casefold)
+
+
+def test_cities_json_is_versioned_and_shared_through_snapshot(client, tmp_path, monkeypatch):
+    app = client.application
+    monkeypatch.setitem(app.config, "REFERENCE_SNAPSHOT_DIR", str(tmp_path))
+    region_id = _add_region(app, "Самаркандская область", cities=("Ургут", "Каттакурган"))
+    register(client, email="cities@example.com", role="customer")
+
+    with app.test_request_context():
+        query = reference_data.cities_url_query()
+    resp = client.get(f"/profile/cities/{region_id}.json?{query}")
+    assert [city["name"] for city in resp.get_json()] == ["Каттакурган", "Ургут"]
+    assert "max-age" in resp.headers["Cache-Control"]
+    assert client.get(f"/profile/cities/{region_id}.json").headers["Cache-Control"] == "private, no-cache"
+    assert client.get(
+        f"/profile/cities/{region_id}.json", headers={"If-None-Match": resp.headers["ETag"]},
+    ).status_code == 304
+
+    # другой воркер берёт справочники из снимка, не из БД
+    snapshots = list(tmp_path.glob("reference-*.json"))
+    assert len(snapshots) == 1
+    app.extensions.pop("reference_data")
+    monkeypatch.setattr(reference_data, "_read_rows", lambda: (_ for _ in ()).throw(AssertionError("прочитано из БД")))
+    assert client.get(f"/profile/cities/{region_id}.json").get_json()[0]["name"] == "Каттакурган"
@@ -1,4 +1,5 @@
-from app.models import ExecutorProfile, Order, Review
+from app import db, ratings
+from app.models import CustomerProfile, ExecutorProfile, Order, Review
 
 from tests.conftest import register
 from tests.test_orders import _create_order, _login, _setup_customer, _setup_executor
@@ -80,3 +81,39 @@ def test_stranger_cannot_review_order(client):
     register(client, email="stranger@example.com", role="customer")
     resp = client.post(f"/orders/{order_id}/review", data={"rating": "5"}, follow_redirects=False)
     assert resp.status_code == 403
+
+
+def test_rating_aggregates_follow_publication_and_recount_fixes_drift(client):
+    region_id = _setup_customer(client, "cust4@example.com")
+    service_id, _ = _setup_executor(client, "exec4@example.com", region_id)
+    order_id = _complete_order(client, "cust4@example.com", "exec4@example.com", region_id, service_id)
+    client.post(f"/orders/{order_id}/review", data={"rating": "4"})
+    client.get("/auth/logout")
+    _login(client, "exec4@example.com")
+    client.post(f"/orders/{order_id}/review", data={"rating": "3"})
+
+    def executor_rating():
+        profile = ExecutorProfile.query.join(ExecutorProfile.user).filter_by(email="exec4@example.com").one()
+        return profile.reviews_count, profile.rating_sum, profile.rating_avg
+
+    with client.application.app_context():
+        assert executor_rating() == (1, 4, 4)
+        customer = CustomerProfile.query.join(CustomerProfile.user).filter_by(email="cust4@example.com").one()
+        assert (customer.reviews_count, customer.rating_sum, customer.rating_avg) == (1, 3, 3)
+
+        review = Review.query.filter_by(order_id=order_id, direction="customer_to_executor").one()
+        review.is_published = False
+        db.session.commit()
+        assert executor_rating() == (0, 0, None)
+        review.is_published = True
+        review.rating = 5
+        db.session.commit()
+        assert executor_rating() == (1, 5, 5)
+
+        # правка в обход ORM хук не видит — её исправляет сверка
+        db.session.execute(db.update(Review).where(Review.order_id == order_id).values(rating=2))
+        db.session.commit()
+        assert executor_rating() == (1, 5, 5)
+        assert ratings.recount() == 2
+        assert executor_rating() == (1, 2, 2)
+        assert ratings.recount() == 0
@@ -1,4 +1,5 @@
-from app.models import ListingCategory, Region
+from app import db, search_index
+from app.models import Listing, ListingCategory, Region, SearchPosting, User
 
 from tests.conftest import register
 from tests.test_orders import _login, _setup_customer, _setup_executor
@@ -86,3 +87,79 @@ def test_search_percent_in_query_does_not_match_everything(client):
 
     resp = client.get("/search?q=%25&mode=partial")
     assert "Фреза концевая".encode() not in resp.data
+
+
+def _listing(title, description="", status="active"):
+    author = User.query.filter_by(email="indexauthor@example.com").first()
+    if author is None:
+        author = User(email="indexauthor@example.com", role="customer")
+        db.session.add(author)
+        db.session.flush()
+    listing = Listing(
+        author_id=author.id, listing_intent="sell", category_id=ListingCategory.query.first().id,
+        region_id=Region.query.first().id, title=title, description=description, status=status,
+    )
+    db.session.add(listing)
+    db.session.commit()
+    return listing
+
+
+def test_normalize_transliterates_cyrillic_and_uzbek_apostrophes():
+    assert search_index.tokenize("Токарь, ЧПУ-станок") == ["tokar", "chpu", "stanok"]
+    assert search_index.tokenize("Oʻzbekiston") == search_index.tokenize("Ўзбекистон") == ["ozbekiston"]
+    assert search_index.tokenize("%_") == []
+
+
+def test_search_index_matches_across_alphabets_and_ranks_title_first(app):
+    with app.app_context():
+        in_text = _listing("Фреза", "подходит для токарного станка")
+        in_title = _listing("Tokarniy stanok 1K62")
+
+        scores = search_index.search("токарн", "partial")["listings"]
+        assert set(scores) == {in_text.id, in_title.id}
+        assert scores[in_title.id] > scores[in_text.id]
+
+        assert search_index.search("TOKARNIY STANOK 1к62", "exact")["listings"] == {in_title.id: search_index.TITLE_WEIGHT}
+        assert search_index.search("tokarniy", "exact") == {}
+        assert search_index.search("станок фреза", "partial") == {}  # оба слова ни в одной карточке
+
+
+def test_search_index_follows_edits_and_deletes(app):
+    with app.app_context():
+        listing = _listing("Фреза концевая")
+        listing_id = listing.id
+
+        listing.title = "Сверло"
+        db.session.commit()
+        assert search_index.search("фреза") == {}
+        assert set(search_index.search("сверло")["listings"]) == {listing_id}
+
+        listing.status = "closed"  # неиндексируемое поле — индекс не трогается
+        db.session.commit()
+        assert set(search_index.search("сверло")["listings"]) == {listing_id}
+
+        db.session.delete(listing)
+        db.session.commit()
+        assert SearchPosting.query.filter_by(entity_id=listing_id, entity_type="listings").count() == 0
+
+
+def test_search_index_rebuild_restores_postings(app):
+    with app.app_context():
+        listing = _listing("Фреза концевая")
+        db.session.execute(db.delete(SearchPosting))
+        db.session.commit()
+
+        assert search_index.rebuild() == 1
+        assert set(search_index.search("концев")["listings"]) == {listing.id}
+
+
+def test_search_hides_inactive_listing_found_by_index(client):
+    _setup_customer(client, "inactivesearch@example.com")
+    _login(client, "inactivesearch@example.com")
+    with client.application.app_context():
+        _listing("Станок закрытый", status="closed")
+        _listing("Станок открытый")
+
+    resp = client.get("/search?q=станок&mode=partial")
+    assert "Станок открытый".encode() in resp.data
+    assert "Станок закрытый".encode() not in resp.data
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import BackgroundTask, Notification, User
+from app import tasks
+from app.tasks import LOCK_TIMEOUT, RETRY_BASE_SECONDS, claim_batch, enqueue, task, task_result, work
+
+calls = []
+
+
+@task("test_echo")
+def _echo(value):
+    calls.append(value)
+    return value * 2
+
+
+@task("test_fail")
+def _fail():
+    raise RuntimeError("boom")
+
+
+def test_eager_task_runs_inside_enqueue(app):
+    with app.app_context():
+        background_task = enqueue("test_echo", {"value": 21})
+
+        assert background_task.status == "done"
+        assert background_task.attempts == 1
+        assert task_result(background_task) == 42
+
+
+def test_idempotency_key_coalesces_pending_tasks(app):
+    app.config["TASKS_EAGER"] = False
+    with app.app_context():
+        first = enqueue("test_echo", {"value": 1}, key="echo:1")
+        second = enqueue("test_echo", {"value": 1}, key="echo:1")
+
+        assert first.id == second.id
+        assert BackgroundTask.query.count() == 1
+        assert task_result(first) is None
+
+
+def test_concurrent_enqueue_with_same_key_returns_existing_task(app, monkeypatch):
+    app.config["TASKS_EAGER"] = False
+    with app.app_context():
+        first = enqueue("test_echo", {"value": 1}, key="echo:1")
+        # соседний запрос проверил ключ до того, как первая задача появилась
+        real_lookup = tasks._active_with_key
+        lookups = []
+
+        def racing_lookup(key):
+            lookups.append(key)
+            return None if len(lookups) == 1 else real_lookup(key)
+
+        monkeypatch.setattr(tasks, "_active_with_key", racing_lookup)
+        second = enqueue("test_echo", {"value": 1}, key="echo:1")
+
+        assert len(lookups) == 2  # вторая проверка — после IntegrityError
+        assert second.id == first.id
+        assert BackgroundTask.query.count() == 1
+
+
+def test_worker_processes_queue_once_and_allows_requeue_by_key(app):
+    app.config["TASKS_EAGER"] = False
+    calls.clear()
+    with app.app_context():
+        enqueue("test_echo", {"value": 1}, key="echo:1")
+        enqueue("test_echo", {"value": 2})
+        enqueue("test_echo", {"value": 3}, delay_seconds=3600)  # ещё не пора
+
+        assert work(once=True) == 2
+        assert calls == [1, 2]
+
+        again = enqueue("test_echo", {"value": 1}, key="echo:1")  # прежняя уже done — новая задача
+        assert again.status == "pending"
+        assert BackgroundTask.query.count() == 4
+
+
+def test_failed_task_is_retried_with_backoff_then_marked_failed(app):
+    app.config["TASKS_EAGER"] = False
+    with app.app_context():
+        task_id = enqueue("test_fail", max_attempts=2).id
+
+        before = datetime.utcnow()
+        work(once=True)
+        background_task = db.session.get(BackgroundTask, task_id)
+        assert background_task.status == "pending"
+        assert background_task.attempts == 1
+        assert "boom" in background_task.last_error
+        assert background_task.run_after >= before + timedelta(seconds=RETRY_BASE_SECONDS)
+
+        background_task.run_after = datetime.utcnow()
+        db.session.commit()
+        work(once=True)
+        background_task = db.session.get(BackgroundTask, task_id)
+        assert background_task.status == "failed"
+        assert background_task.attempts == 2
+
+
+def test_claim_skips_locked_and_reclaims_stale_tasks(app):
+    app.config["TASKS_EAGER"] = False
+    with app.app_context():
+        fresh = enqueue("test_echo", {"value": 1})
+        stale = enqueue("test_echo", {"value": 2})
+
+        assert [t.id for t in claim_batch("w1")] == [fresh.id, stale.id]
+        assert claim_batch("w2") == []
+
+        db.session.get(BackgroundTask, stale.id).locked_at = datetime.utcnow() - LOCK_TIMEOUT - timedelta(seconds=1)
+        db.session.commit()
+        reclaimed = claim_batch("w2")
+        assert [(t.id, t.locked_by, t.attempts) for t in reclaimed] == [(stale.id, "w2", 2)]
+
+
+def test_order_broadcast_runs_in_batches_without_duplicates(app, monkeypatch):
+    from app import matching
+    from app.models import CustomerProfile, Order, Region, ServiceCategory
+
+    app.config["TASKS_EAGER"] = False
+    monkeypatch.setattr(matching, "BROADCAST_BATCH_SIZE", 2)
+    with app.app_context():
+        executors = [User(email=f"e{n}@example.com", role="executor") for n in range(5)]
+        customer = CustomerProfile(user=User(email="c@example.com", role="customer"))
+        db.session.add_all(executors + [customer])
+        db.session.flush()
+        order = Order(
+            customer_id=customer.id, title="Вал", description="Выточить вал", order_type="manufacturing",
+            service_category_id=ServiceCategory.query.first().id, region_id=Region.query.first().id,
+        )
+        db.session.add(order)
+        db.session.commit()
+        # как будто упавшая раньше попытка успела уведомить первого исполнителя
+        db.session.add(Notification(user_id=executors[0].id, type="new_order_broadcast",
+                                    title="Новая заявка", url=f"/orders/{order.id}"))
+        db.session.commit()
+
+        executor_ids = [e.id for e in executors]
+
+        enqueue("match_order", {"order_id": order.id}, key=f"match_order:{order.id}")
+        work(once=True)
+
+        broadcasts = Notification.query.filter_by(type="new_order_broadcast").all()
+        assert sorted(n.user_id for n in broadcasts) == executor_ids
+        # match_order + три пачки по два исполнителя
+        assert BackgroundTask.query.filter_by(kind="broadcast_order", status="done").count() == 3
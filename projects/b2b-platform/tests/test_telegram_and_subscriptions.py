@@ -287,7 +287,7 @@ def test_send_push_to_user_sends_via_fcm_when_configured(client, monkeypatch):
             sent.append((url, headers, json))
             return FakeResponse()
 
-        monkeypatch.setattr("app.push.requests.post", fake_post)
+        monkeypatch.setattr("app.push._http.post", fake_post)
 
         with client.application.app_context():
             from app.push import send_push_to_user
@@ -0,0 +1,74 @@
+from sqlalchemy import event
+
+from app import db, unread
+from app.models import TelegramLinkCode, User
+
+from tests.conftest import register
+from tests.test_chat import _login
+
+
+def _counters(app, email):
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        return user.unread_notifications, user.unread_messages
+
+
+def test_counters_follow_messages_notifications_and_reads(client):
+    app = client.application
+    register(client, email="reader@example.com", role="executor")
+    client.get("/auth/logout")
+    register(client, email="writer@example.com", role="executor")
+    with app.app_context():
+        reader_id = User.query.filter_by(email="reader@example.com").first().id
+        writer_id = User.query.filter_by(email="writer@example.com").first().id
+
+    client.post(f"/messages/u/{reader_id}", data={"body": "Привет"})
+    client.post(f"/messages/u/{reader_id}", data={"body": "Есть вопрос"})
+    assert _counters(app, "reader@example.com") == (2, 2)  # по уведомлению на каждое сообщение
+    assert _counters(app, "writer@example.com") == (0, 0)
+
+    client.get("/auth/logout")
+    _login(client, "reader@example.com")
+    resp = client.get("/")
+    assert b'<span class="notif-badge">2</span>' in resp.data
+
+    client.get(f"/messages/u/{writer_id}")
+    assert _counters(app, "reader@example.com") == (2, 0)
+    client.get("/notifications")
+    assert _counters(app, "reader@example.com") == (0, 0)
+
+    with app.app_context():
+        User.query.filter_by(id=reader_id).update({"unread_messages": 7})  # рассинхрон в обход ORM
+        db.session.commit()
+        unread.recount()
+    assert _counters(app, "reader@example.com") == (0, 0)
+
+
+def test_page_render_issues_no_writes(client, monkeypatch):
+    """Отрисовка страницы с шапкой и блоком «Портфолио» (значки, код
+    привязки Telegram) ничего не пишет в БД."""
+    app = client.application
+    buffer = app.extensions["page_views"]
+    monkeypatch.setattr(buffer, "interval", 60)
+    monkeypatch.setattr(buffer, "_start", lambda: None)
+    monkeypatch.setitem(app.config, "TELEGRAM_BOT_USERNAME", "test_bot")
+    monkeypatch.setitem(app.config, "TELEGRAM_BOT_TOKEN", "test_token")
+    register(client, email="quiet@example.com", role="executor")
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        resp = client.get("/profile/executor")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert "t.me/test_bot".encode() in resp.data
+    assert statements and not {"INSERT", "UPDATE", "DELETE"} & set(statements)
+    with app.app_context():
+        assert TelegramLinkCode.query.count() == 0
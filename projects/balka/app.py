@@ -5,24 +5,39 @@ Flask-приложение "Расчёт балки" (модуль для сай
   GET  /                -> интерфейс конструктора балки
   POST /api/calculate   -> JSON: реакции, эпюры (как base64 PNG), проверки прочности/жёсткости
   POST /api/report      -> генерирует .docx записку и отдаёт файл на скачивание
+  POST /api/envelope    -> JSON: огибающие реакций, Q, M, прогибов от подвижного поезда сил
+  POST /api/load_cases  -> JSON: результаты по нагружениям и их сочетаниям за одно решение
 """
 import base64
+import hashlib
 import io
-import os
-import tempfile
+import json
+import threading
 import traceback
+from collections import OrderedDict
 
+import numpy as np
 from flask import Flask, request, jsonify, send_file, render_template
 
 from beam_engine import Beam
 import sections
 import diagrams
+import render_pool
 import report
 
 app = Flask(__name__)
 
 STEEL_E = 2.0e11          # Па, модуль упругости стали (по умолчанию)
 DEFAULT_SIGMA_ALLOW = 160e6  # Па (160 МПа — типовое значение для Ст3)
+DEFAULT_STATIONS = 201       # точек установки подвижной нагрузки по пролёту
+MAX_STATIONS = 2001
+RESULT_CACHE_SIZE = 64       # решённых схем с готовыми рисунками в памяти
+REPORT_ONLY_FIELDS = ('author', 'date')  # не влияют на расчёт и рисунки
+
+# request-hash -> решённая балка и PNG-рисунки; /api/report сразу после
+# /api/calculate с теми же данными не решает и не рисует заново.
+_results = OrderedDict()
+_results_lock = threading.Lock()
 
 
 def _build_beam(data):
@@ -56,9 +71,80 @@ def _build_beam(data):
     return beam, sec, supports_in, forces_in, moments_in, dloads_in
 
 
-def _png_b64(path):
-    with open(path, 'rb') as fh:
-        return "data:image/png;base64," + base64.b64encode(fh.read()).decode('ascii')
+def _png_b64(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode('ascii')
+
+
+def _request_key(data):
+    payload = {k: v for k, v in data.items() if k not in REPORT_ONLY_FIELDS}
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def _render_images(beam, forces_in, moments_in, dloads_in):
+    """Все рисунки расчёта — PNG-байты; рисуются параллельно в render_pool,
+    задания содержат только массивы и исходные данные запроса."""
+    xs, Qs, Ms = beam.sample(400)
+    xd = np.linspace(0, beam.L, diagrams.DEFLECTION_POINTS)
+    return render_pool.render({
+        'scheme': ('scheme_data', {
+            'L': beam.L, 'supports': [(s.x, s.kind) for s in beam.supports],
+            'forces_in': forces_in, 'moments_in': moments_in, 'dloads_in': dloads_in}),
+        'Q': ('epure', {'xs': xs, 'ys': Qs, 'title': "Эпюра Q(x)", 'ylabel': "Q, Н",
+                        'color': "tab:blue"}),
+        'M': ('epure', {'xs': xs, 'ys': Ms, 'title': "Эпюра M(x)", 'ylabel': "M, Н·м",
+                        'color': "tab:red"}),
+        'defl': ('deflection_data', {'xs': xd, 'vs': beam.deflection(xd)}),
+    })
+
+
+def _solve_and_render(data):
+    """Решённая балка и её рисунки — из кэша или заново.
+    Результат общий для всех запросов с теми же данными: не изменять."""
+    key = _request_key(data)
+    with _results_lock:
+        res = _results.get(key)
+        if res is not None:
+            _results.move_to_end(key)
+            return res
+
+    beam, sec, supports_in, forces_in, moments_in, dloads_in = _build_beam(data)
+    reactions = beam.solve_reactions()
+    beam.segments()
+    n_unknown = sum((2 if s['kind'] == 'fixed' else 1) for s in supports_in)
+    res = {
+        'beam': beam,
+        'section': sec,
+        'reactions': reactions,
+        'forces_in': forces_in,
+        'moments_in': moments_in,
+        'dloads_in': dloads_in,
+        'determinate': n_unknown <= 3,
+        'images': _render_images(beam, forces_in, moments_in, dloads_in),
+    }
+    with _results_lock:
+        _results[key] = res
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return res
+
+
+def _report_context(data, res):
+    """Данные для report.generate_report по запросу и результату _solve_and_render."""
+    return {
+        'author': data.get('author', ''),
+        'date': data.get('date', ''),
+        'beam': res['beam'],
+        'forces_in': res['forces_in'],
+        'moments_in': res['moments_in'],
+        'dloads_in': res['dloads_in'],
+        'section': res['section'],
+        'E': float(data.get('E', STEEL_E)),
+        'sigma_allow': float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW)),
+        'deflection_ratio': float(data.get('deflection_ratio', 250)),
+        'determinate': res['determinate'],
+        'images': res['images'],
+    }
 
 
 @app.route('/')
@@ -70,12 +156,8 @@ def index():
 def api_calculate():
     data = request.get_json(force=True)
     try:
-        beam, sec, supports_in, forces_in, moments_in, dloads_in = _build_beam(data)
-        reactions = beam.solve_reactions()
-        beam.segments()
-
-        n_unknown = sum((2 if s['kind'] == 'fixed' else 1) for s in supports_in)
-        determinate = n_unknown <= 3
+        res = _solve_and_render(data)
+        beam, sec = res['beam'], res['section']
 
         xq, Qmax = beam.max_abs_Q()
         xm, Mmax = beam.max_abs_M()
@@ -83,29 +165,16 @@ def api_calculate():
         sigma_max = abs(Mmax) / sec['Wx']
         n_safety = sigma_allow / sigma_max if sigma_max > 0 else None
 
-        with tempfile.TemporaryDirectory() as tmp:
-            p_scheme = os.path.join(tmp, 'scheme.png')
-            p_Q = os.path.join(tmp, 'Q.png')
-            p_M = os.path.join(tmp, 'M.png')
-            p_D = os.path.join(tmp, 'D.png')
-            diagrams.draw_scheme(beam, forces_in, moments_in, dloads_in, p_scheme)
-            xs, Qs, Ms = beam.sample(400)
-            diagrams.draw_epure(xs, Qs, p_Q, "Эпюра Q(x)", "Q, Н", "tab:blue")
-            diagrams.draw_epure(xs, Ms, p_M, "Эпюра M(x)", "M, Н·м", "tab:red")
-            diagrams.draw_deflection(beam, p_D)
-
-            images = {k: _png_b64(p) for k, p in
-                      [('scheme', p_scheme), ('Q', p_Q), ('M', p_M), ('defl', p_D)]}
-
-        v_max = max(beam.deflection(x) for x in xs)
-        v_min = min(beam.deflection(x) for x in xs)
+        xs, _, _ = beam.sample(400)
+        vs = beam.deflection(xs)
+        v_max, v_min = float(vs.max()), float(vs.min())
         v_abs = v_max if abs(v_max) > abs(v_min) else v_min
 
         return jsonify({
             'ok': True,
-            'determinate': determinate,
+            'determinate': res['determinate'],
             'reactions': [{'x': r['x'], 'kind': r['kind'], 'R': r['R'], 'M': r['M']}
-                          for r in reactions],
+                          for r in res['reactions']],
             'Qmax': Qmax, 'xQmax': xq,
             'Mmax': Mmax, 'xMmax': xm,
             'sigma_max_MPa': sigma_max / 1e6,
@@ -113,8 +182,10 @@ def api_calculate():
             'safety_factor': n_safety,
             'v_max_mm': v_abs * 1000,
             'section': {'A': sec['A'], 'Ix': sec['Ix'], 'Wx': sec['Wx'], 'desc': sec['desc']},
-            'images': images,
+            'images': {k: _png_b64(png) for k, png in res['images'].items()},
         })
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         traceback.print_exc()
         return jsonify({'ok': False, 'error': str(e)}), 400
@@ -122,51 +193,124 @@ def api_calculate():
 
 @app.route('/api/report', methods=['POST'])
 def api_report():
+    data = request.get_json(force=True)
+    try:
+        res = _solve_and_render(data)
+        ctx = _report_context(data, res)
+        buf = io.BytesIO()
+        report.generate_report(ctx, buf)
+        buf.seek(0)
+
+        return send_file(buf, as_attachment=True, download_name='Расчёт_балки.docx',
+                          mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/envelope', methods=['POST'])
+def api_envelope():
+    """Подвижная нагрузка (крановый путь, мост): axles — поезд сил
+    [{'offset': м от головной оси, 'value': Н}], прокатывается по балке
+    вместе с её собственной нагрузкой."""
     data = request.get_json(force=True)
     try:
         beam, sec, supports_in, forces_in, moments_in, dloads_in = _build_beam(data)
-        beam.solve_reactions()
-        beam.segments()
+        axles = [(float(a.get('offset', 0.0)), float(a['value'])) for a in data.get('axles', [])]
+        n_stations = int(data.get('n_stations', DEFAULT_STATIONS))
+        if not (11 <= n_stations <= MAX_STATIONS):
+            raise ValueError(f"Число точек установки нагрузки должно быть от 11 до {MAX_STATIONS}.")
 
-        n_unknown = sum((2 if s['kind'] == 'fixed' else 1) for s in supports_in)
-        determinate = n_unknown <= 3
+        env = beam.moving_load_envelope(axles, n_stations=n_stations)
+        gov = env['governing']
         sigma_allow = float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW))
+        sigma_max = abs(gov['M']['value']) / sec['Wx']
+
+        xs = env['x']
+        pngs = render_pool.render({
+            'Q': ('envelope', {'xs': xs, 'ys_max': env['Q_max'], 'ys_min': env['Q_min'],
+                               'title': "Огибающая Q(x)", 'ylabel': "Q, Н", 'color': "tab:blue"}),
+            'M': ('envelope', {'xs': xs, 'ys_max': env['M_max'], 'ys_min': env['M_min'],
+                               'title': "Огибающая M(x)", 'ylabel': "M, Н·м", 'color': "tab:red"}),
+        })
+        images = {k: _png_b64(png) for k, png in pngs.items()}
+
+        return jsonify({
+            'ok': True,
+            'x': xs.tolist(),
+            'Q_max': env['Q_max'].tolist(), 'Q_min': env['Q_min'].tolist(),
+            'M_max': env['M_max'].tolist(), 'M_min': env['M_min'].tolist(),
+            'v_max_mm': (env['v_max'] * 1000).tolist(), 'v_min_mm': (env['v_min'] * 1000).tolist(),
+            'reactions': env['reactions'],
+            'governing': gov,
+            'sigma_max_MPa': sigma_max / 1e6,
+            'sigma_allow_MPa': sigma_allow / 1e6,
+            'safety_factor': sigma_allow / sigma_max if sigma_max > 0 else None,
+            'images': images,
+        })
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'ok': False, 'error': str(e)}), 400
 
-        with tempfile.TemporaryDirectory() as tmp:
-            p_scheme = os.path.join(tmp, 'scheme.png')
-            p_Q = os.path.join(tmp, 'Q.png')
-            p_M = os.path.join(tmp, 'M.png')
-            p_D = os.path.join(tmp, 'D.png')
-            diagrams.draw_scheme(beam, forces_in, moments_in, dloads_in, p_scheme)
-            xs, Qs, Ms = beam.sample(400)
-            diagrams.draw_epure(xs, Qs, p_Q, "Эпюра Q(x)", "Q, Н", "tab:blue")
-            diagrams.draw_epure(xs, Ms, p_M, "Эпюра M(x)", "M, Н·м", "tab:red")
-            diagrams.draw_deflection(beam, p_D)
-
-            ctx = {
-                'author': data.get('author', ''),
-                'date': data.get('date', ''),
-                'beam': beam,
-                'forces_in': forces_in,
-                'moments_in': moments_in,
-                'dloads_in': dloads_in,
-                'section': sec,
-                'E': float(data.get('E', STEEL_E)),
-                'sigma_allow': sigma_allow,
-                'deflection_ratio': float(data.get('deflection_ratio', 250)),
-                'determinate': determinate,
-                'images': {'scheme': p_scheme, 'Q': p_Q, 'M': p_M, 'defl': p_D},
-            }
-            out_path = os.path.join(tmp, 'beam_report.docx')
-            report.generate_report(ctx, out_path)
-
-            buf = io.BytesIO()
-            with open(out_path, 'rb') as fh:
-                buf.write(fh.read())
-            buf.seek(0)
 
-        return send_file(buf, as_attachment=True, download_name='Расчёт_балки.docx',
-                          mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+def _case_loads(case):
+    """Нагрузки одного нагружения из JSON — в формате Beam._add_loads."""
+    return {
+        'forces': [(float(f['x']), float(f['value'])) for f in case.get('forces', [])],
+        'moments': [(float(m['x']), float(m['value'])) for m in case.get('moments', [])],
+        'dloads': [(float(d['x1']), float(d['x2']), float(d['value1']),
+                    float(d.get('value2', d['value1']))) for d in case.get('dloads', [])],
+    }
+
+
+def _beam_summary(beam, sec, sigma_allow):
+    xq, Qmax = beam.max_abs_Q()
+    xm, Mmax = beam.max_abs_M()
+    sigma_max = abs(Mmax) / sec['Wx']
+    vs = beam.deflection(np.linspace(0, beam.L, 400))
+    v_abs = vs[int(np.argmax(np.abs(vs)))]
+    return {
+        'reactions': [{'x': r['x'], 'kind': r['kind'], 'R': r['R'], 'M': r['M']}
+                      for r in beam._reactions],
+        'Qmax': Qmax, 'xQmax': xq,
+        'Mmax': Mmax, 'xMmax': xm,
+        'sigma_max_MPa': sigma_max / 1e6,
+        'safety_factor': sigma_allow / sigma_max if sigma_max > 0 else None,
+        'v_max_mm': float(v_abs) * 1000,
+    }
+
+
+@app.route('/api/load_cases', methods=['POST'])
+def api_load_cases():
+    """Одна схема балки, несколько нагружений:
+    cases: [{'name', 'forces', 'moments', 'dloads'}] (формат как у /api/calculate),
+    combinations: [{'name', 'factors': {имя нагружения: коэффициент}}].
+    Нагрузки верхнего уровня запроса здесь не используются."""
+    data = request.get_json(force=True)
+    try:
+        beam, sec, *_ = _build_beam(data)
+        cases_in = data.get('cases', [])
+        combos_in = data.get('combinations', [])
+        cases = {str(c['name']): _case_loads(c) for c in cases_in}
+        if len(cases) != len(cases_in):
+            raise ValueError("Имена нагружений должны быть уникальными.")
+        combos = {str(c['name']): {str(k): float(v) for k, v in c.get('factors', {}).items()}
+                  for c in combos_in}
+        if len(combos) != len(combos_in):
+            raise ValueError("Имена сочетаний должны быть уникальными.")
+
+        case_beams, combo_beams = beam.solve_load_cases(cases, combos)
+        sigma_allow = float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW))
+        return jsonify({
+            'ok': True,
+            'sigma_allow_MPa': sigma_allow / 1e6,
+            'cases': {name: _beam_summary(b, sec, sigma_allow) for name, b in case_beams.items()},
+            'combinations': {name: _beam_summary(b, sec, sigma_allow) for name, b in combo_beams.items()},
+        })
     except Exception as e:
         traceback.print_exc()
         return jsonify({'ok': False, 'error': str(e)}), 400
@@ -18,7 +18,29 @@ beam_engine.py
             (изгибающий момент положителен, если растянуты нижние волокна — "балка
             прогибается выпуклостью вниз", стандартное правило знаков сопромата).
 """
+from contextlib import contextmanager
+
 import numpy as np
+from scipy.linalg import cho_solve_banded, cholesky_banded
+
+# Полуширина ленты матрицы жёсткости: у балочного элемента 4 СС подряд.
+BAND = 3
+# Начиная с этого числа СС решаем ленточным Холецким вместо плотного solve:
+# на учебных схемах (десятки СС) разницы нет, а на измельчённой сетке из
+# тысяч элементов плотная матрица n^2 по памяти и n^3 по времени.
+BANDED_MIN_DOF = 200
+
+
+@contextmanager
+def _mechanism_as_value_error():
+    """Вырожденная матрица жёсткости — это механизм, а не ошибка программы."""
+    try:
+        yield
+    except np.linalg.LinAlgError:
+        raise ValueError(
+            "Система опор не обеспечивает геометрическую неизменяемость балки "
+            "(механизм). Нужно минимум 2 точки опирания или заделка."
+        )
 
 
 class Support:
@@ -132,55 +154,42 @@ class Beam:
         return out
 
     # ---------- FEM stiffness solve for reactions ----------
-    def solve_reactions(self):
-        nodes = self._breakpoints(refine=1)
-        n = len(nodes)
-        ndof = 2 * n
-        K = np.zeros((ndof, ndof))
-        F = np.zeros(ndof)
-        E, I = self.E, self.I
-
-        def kmat(Le):
-            c = E * I / Le ** 3
-            return c * np.array([
-                [12, 6 * Le, -12, 6 * Le],
-                [6 * Le, 4 * Le ** 2, -6 * Le, 2 * Le ** 2],
-                [-12, -6 * Le, 12, -6 * Le],
-                [6 * Le, 2 * Le ** 2, -6 * Le, 4 * Le ** 2],
-            ])
-
-        idx_of = {round(x, 9): i for i, x in enumerate(nodes)}
-
-        for e in range(n - 1):
-            x1, x2 = nodes[e], nodes[e + 1]
-            Le = x2 - x1
-            if Le < 1e-9:
+    def _element_stiffness(self, Le):
+        """Матрицы жёсткости всех элементов сразу: Le — массив длин (ne,),
+        результат — массив (ne, 4, 4) в порядке СС [v1, theta1, v2, theta2]."""
+        Le = np.asarray(Le, dtype=float)
+        c = self.E * self.I / Le ** 3
+        k12 = np.full(len(Le), 12.0)
+        L1, L2 = Le, Le ** 2
+        ke = np.empty((len(Le), 4, 4))
+        ke[:, 0] = np.column_stack([k12, 6 * L1, -k12, 6 * L1])
+        ke[:, 1] = np.column_stack([6 * L1, 4 * L2, -6 * L1, 2 * L2])
+        ke[:, 2] = np.column_stack([-k12, -6 * L1, k12, -6 * L1])
+        ke[:, 3] = np.column_stack([6 * L1, 2 * L2, -6 * L1, 4 * L2])
+        return ke * c[:, None, None]
+
+    def _load_vector(self, nodes, idx_of):
+        x = np.asarray(nodes, dtype=float)
+        x1, x2 = x[:-1], x[1:]
+        Le = x2 - x1
+        F = np.zeros(2 * len(nodes))
+
+        # эквивалентные узловые нагрузки от распределённой нагрузки на участке
+        w1 = np.zeros(len(Le))
+        w2 = np.zeros(len(Le))
+        for d in self.dloads:
+            if d.x2 == d.x1:
                 continue
-            ke = kmat(Le)
-            dofs = [2 * e, 2 * e + 1, 2 * e + 2, 2 * e + 3]
-            for a in range(4):
-                for b in range(4):
-                    K[dofs[a], dofs[b]] += ke[a, b]
-
-            # эквивалентные узловые нагрузки от распределённой нагрузки на участке
-            w1 = w2 = 0.0
-            for d in self.dloads:
-                lo, hi = max(d.x1, x1), min(d.x2, x2)
-                if hi - lo > 1e-9:
-                    w1 += d.w_at(x1)
-                    w2 += d.w_at(x2)
-            if abs(w1) > 1e-12 or abs(w2) > 1e-12:
-                # консистентные узловые нагрузки (эрмитовы функции формы),
-                # линейная нагрузка w(s)=w1+(w2-w1)*s/Le, s из [0, Le]
-                # (получено интегрированием N_i(s)*w(s) по элементу)
-                Fv1 = Le * (7 * w1 + 3 * w2) / 20
-                M1 = Le ** 2 * (3 * w1 + 2 * w2) / 60
-                Fv2 = Le * (3 * w1 + 7 * w2) / 20
-                M2 = -Le ** 2 * (2 * w1 + 3 * w2) / 60
-                F[dofs[0]] += Fv1
-                F[dofs[1]] += M1
-                F[dofs[2]] += Fv2
-                F[dofs[3]] += M2
+            on = (np.minimum(d.x2, x2) - np.maximum(d.x1, x1)) > 1e-9
+            w1 += np.where(on, d.w1 + (d.w2 - d.w1) * (x1 - d.x1) / (d.x2 - d.x1), 0.0)
+            w2 += np.where(on, d.w1 + (d.w2 - d.w1) * (x2 - d.x1) / (d.x2 - d.x1), 0.0)
+        # консистентные узловые нагрузки (эрмитовы функции формы),
+        # линейная нагрузка w(s)=w1+(w2-w1)*s/Le, s из [0, Le]
+        # (получено интегрированием N_i(s)*w(s) по элементу)
+        F[0:-2:2] += Le * (7 * w1 + 3 * w2) / 20
+        F[1:-2:2] += Le ** 2 * (3 * w1 + 2 * w2) / 60
+        F[2::2] += Le * (3 * w1 + 7 * w2) / 20
+        F[3::2] += -Le ** 2 * (2 * w1 + 3 * w2) / 60
 
         for pf in self.forces:
             i = idx_of[round(pf.x, 9)]
@@ -188,45 +197,319 @@ class Beam:
         for pm in self.moments:
             i = idx_of[round(pm.x, 9)]
             F[2 * i + 1] += pm.value
+        return F
 
-        # граничные условия
+    def _fixed_dofs(self, idx_of):
         fixed_dofs = []
         for s in self.supports:
             i = idx_of[round(s.x, 9)]
             fixed_dofs.append(2 * i)
             if s.restrains_theta:
                 fixed_dofs.append(2 * i + 1)
-        fixed_dofs = sorted(set(fixed_dofs))
-        free_dofs = [d for d in range(ndof) if d not in fixed_dofs]
+        return sorted(set(fixed_dofs))
 
-        if len(free_dofs) == 0:
-            raise ValueError("Балка полностью защемлена везде — задача вырождена.")
-
-        Kff = K[np.ix_(free_dofs, free_dofs)]
-        Ff = F[free_dofs]
-        try:
-            d_free = np.linalg.solve(Kff, Ff)
-        except np.linalg.LinAlgError:
-            raise ValueError(
-                "Система опор не обеспечивает геометрическую неизменяемость балки "
-                "(механизм). Нужно минимум 2 точки опирания или заделка."
-            )
+    def _assemble_dense(self, Le, ndof):
+        K = np.zeros((ndof, ndof))
+        ke = self._element_stiffness(Le)
+        base = 2 * np.arange(len(Le))
+        dofs = base[:, None] + np.arange(4)[None, :]
+        np.add.at(K, (dofs[:, :, None], dofs[:, None, :]), ke)
+        return K
+
+    def _assemble_banded(self, Le, ndof):
+        """Верхняя ленточная форма матрицы жёсткости для solveh_banded:
+        ab[BAND + i - j, j] = K[i, j] при i <= j. Соседние элементы делят
+        только один узел, поэтому полуширина ленты — 3 (4 СС элемента)."""
+        ab = np.zeros((BAND + 1, ndof))
+        ke = self._element_stiffness(Le)
+        base = 2 * np.arange(len(Le))
+        for a in range(4):
+            for b in range(a, 4):
+                np.add.at(ab, (BAND + a - b, base + b), ke[:, a, b])
+        return ab
+
+    @staticmethod
+    def _banded_matvec(ab, d):
+        """K.dot(d) для симметричной матрицы в верхней ленточной форме;
+        d — вектор или матрица (ndof, k) из нескольких столбцов."""
+        col = (slice(None),) + (None,) * (d.ndim - 1)
+        out = ab[BAND][col] * d
+        for k in range(1, BAND + 1):
+            diag = ab[BAND - k, k:][col]   # K[j-k, j]
+            out[:-k] += diag * d[k:]
+            out[k:] += diag * d[:-k]
+        return out
 
-        d = np.zeros(ndof)
-        d[free_dofs] = d_free
+    def _mesh(self, nodes):
+        """Общие для всех решателей данные сетки: узлы, номера узлов по
+        координате, длины элементов, закреплённые СС.
+        Узлы ближе 1e-9 друг к другу (например, self.L и round(x, 9) опоры
+        на конце балки) сливаются в один: элемент нулевой длины дал бы
+        жёсткость ~1e49 и испортил бы решение."""
+        merged, idx_of = [], {}
+        for x in nodes:
+            if not merged or x - merged[-1] >= 1e-9:
+                merged.append(x)
+            idx_of[round(x, 9)] = len(merged) - 1
+        nodes = merged
+        Le = np.diff(np.asarray(nodes, dtype=float))
+        fixed_dofs = self._fixed_dofs(idx_of)
+        if len(fixed_dofs) == 2 * len(nodes):
+            raise ValueError("Балка полностью защемлена везде — задача вырождена.")
+        return nodes, idx_of, Le, fixed_dofs
 
-        R_full = K.dot(d) - F  # реакции = усилия связей
+    def _collect_reactions(self, R_full, idx_of):
         reactions = []
         for s in self.supports:
             i = idx_of[round(s.x, 9)]
             Rv = R_full[2 * i]
             Rm = R_full[2 * i + 1] if s.restrains_theta else 0.0
             reactions.append({'x': s.x, 'kind': s.kind, 'R': Rv, 'M': Rm})
+        return reactions
+
+    def solve_reactions(self, refine=1, banded=None):
+        """Реакции опор. refine — во сколько раз дробить каждый участок между
+        характерными точками (для гладкого прогиба на длинных балках).
+        banded=None — выбор решателя по размеру задачи: плотный для
+        учебных схем, ленточный Холецкий начиная с BANDED_MIN_DOF СС."""
+        nodes = self._breakpoints(refine=refine)
+        nodes, idx_of, Le, fixed_dofs = self._mesh(nodes)
+        F = self._load_vector(nodes, idx_of)
+
+        if banded is None:
+            banded = len(F) >= BANDED_MIN_DOF
+        with _mechanism_as_value_error():
+            if banded:
+                d, R_full = self._solve_banded(self._factor_banded(Le, fixed_dofs), F, fixed_dofs)
+            else:
+                d, R_full = self._solve_dense(Le, F, fixed_dofs)
 
         self._nodes = nodes
         self._d = d
-        self._reactions = reactions
-        return reactions
+        self._reactions = self._collect_reactions(R_full, idx_of)
+        return self._reactions
+
+    def _solve_dense(self, Le, F, fixed_dofs):
+        ndof = len(F)
+        K = self._assemble_dense(Le, ndof)
+        free_dofs = np.setdiff1d(np.arange(ndof), fixed_dofs)
+
+        Kff = K[np.ix_(free_dofs, free_dofs)]
+        Ff = F[free_dofs]
+        d_free = np.linalg.solve(Kff, Ff)
+
+        d = np.zeros(ndof)
+        d[free_dofs] = d_free
+        R_full = K.dot(d) - F  # реакции = усилия связей
+        return d, R_full
+
+    def _factor_banded(self, Le, fixed_dofs):
+        """Ленточное разложение Холецкого с учётом опор — делается один раз
+        и годится для любого числа правых частей.
+        Закреплённые СС не вычёркиваются (это сломало бы ленту), а
+        заменяются тождественными уравнениями d_i = 0: строка и столбец
+        обнуляются, на диагональ ставится 1. Реакции считаются по исходной
+        (незакреплённой) матрице ab."""
+        ab = self._assemble_banded(Le, 2 * (len(Le) + 1))
+        ab_bc = ab.copy()
+        for i in fixed_dofs:
+            for k in range(1, BAND + 1):
+                if i + k < ab_bc.shape[1]:
+                    ab_bc[BAND - k, i + k] = 0.0   # строка i правее диагонали
+                if i - k >= 0:
+                    ab_bc[BAND - k, i] = 0.0       # столбец i выше диагонали
+            ab_bc[BAND, i] = 1.0
+        return ab, cholesky_banded(ab_bc, check_finite=False)
+
+    def _solve_banded(self, factor, F, fixed_dofs, rows=None):
+        """F — вектор нагрузок или матрица (ndof, k): k нагружений решаются
+        одним вызовом по готовому разложению. rows — если нужны усилия
+        связей только в этих СС (опоры), остальные строки K·d не считаются."""
+        ab, cb = factor
+        Fb = F.copy()
+        Fb[fixed_dofs] = 0.0
+        d = cho_solve_banded((cb, False), Fb, check_finite=False)
+        if rows is None:
+            return d, self._banded_matvec(ab, d) - F
+        R = np.empty((len(rows),) + d.shape[1:])
+        for n, r in enumerate(rows):
+            R[n] = ab[BAND, r] * d[r] - F[r]
+            for k in range(1, BAND + 1):
+                if r + k < len(d):
+                    R[n] += ab[BAND - k, r + k] * d[r + k]
+                if r - k >= 0:
+                    R[n] += ab[BAND - k, r] * d[r - k]
+        return d, R
+
+    # ---------- нагружения и сочетания ----------
+    def _copy_geometry(self):
+        b = Beam(self.L, self.E, self.I)
+        b.supports = list(self.supports)
+        return b
+
+    def _add_loads(self, loads, factor=1.0):
+        """loads: {'forces': [(x, value)], 'moments': [(x, value)],
+        'dloads': [(x1, x2, w1, w2)]} — любые ключи можно опустить."""
+        for x, v in loads.get('forces', ()):
+            self.add_force(x, factor * v)
+        for x, v in loads.get('moments', ()):
+            self.add_moment(x, factor * v)
+        for x1, x2, w1, w2 in loads.get('dloads', ()):
+            self.add_dload(x1, x2, factor * w1, factor * w2)
+
+    def solve_load_cases(self, cases, combinations=None):
+        """Несколько нагружений одной и той же балки (постоянное, временное,
+        снег, ветер...) за одно разложение матрицы жёсткости: каждое
+        нагружение — столбец правой части. Сочетания {имя: {нагружение:
+        коэффициент}} получаются линейной суперпозицией перемещений и
+        реакций, без повторного решения.
+        cases: {имя: loads} в формате _add_loads; нагрузки самой балки (self)
+        не учитываются — она задаёт только геометрию и опоры.
+        Возвращает ({имя: Beam}, {имя: Beam}) — решённые балки нагружений и
+        сочетаний: у них работают Q(), M(), deflection(), max_abs_Q() и т.д."""
+        combinations = combinations or {}
+        if not cases:
+            raise ValueError("Задайте хотя бы одно нагружение.")
+        for cname, factors in combinations.items():
+            for name in factors:
+                if name not in cases:
+                    raise ValueError(f"Сочетание «{cname}»: нет нагружения «{name}».")
+
+        case_beams = {}
+        for name, loads in cases.items():
+            b = self._copy_geometry()
+            b._add_loads(loads)
+            case_beams[name] = b
+
+        nodes = sorted({x for b in case_beams.values() for x in b._breakpoints(refine=1)})
+        nodes, idx_of, Le, fixed_dofs = self._mesh(nodes)
+        F = np.column_stack([b._load_vector(nodes, idx_of) for b in case_beams.values()])
+        with _mechanism_as_value_error():
+            D, R_full = self._solve_banded(self._factor_banded(Le, fixed_dofs), F, fixed_dofs)
+
+        def finish(b, d, R):
+            b._nodes = nodes
+            b._d = d
+            b._reactions = b._collect_reactions(R, idx_of)
+            b.segments()
+            return b
+
+        col = {name: k for k, name in enumerate(case_beams)}
+        for name, b in case_beams.items():
+            finish(b, D[:, col[name]], R_full[:, col[name]])
+
+        combo_beams = {}
+        for cname, factors in combinations.items():
+            b = self._copy_geometry()
+            f = np.zeros(len(col))
+            for name, factor in factors.items():
+                b._add_loads(cases[name], factor)
+                f[col[name]] += factor
+            combo_beams[cname] = finish(b, D.dot(f), R_full.dot(f))
+        return case_beams, combo_beams
+
+    # ---------- линии влияния и подвижная нагрузка ----------
+    def influence_lines(self, n_stations=201):
+        """Линии влияния реакций, Q, M и прогиба от единичной силы (+1 Н,
+        вверх), переставляемой по n_stations равноотстоящим точкам пролёта.
+        Матрица жёсткости раскладывается один раз; все положения силы и
+        собственная нагрузка балки решаются как одна многостолбцовая правая
+        часть. Результат — массивы (сечение, положение силы); сечения
+        совпадают с точками установки силы ('x'). В 'base' — состояние от
+        нагрузок, заданных в самой балке (после вызова балка решена
+        именно на них: Q(), M(), deflection() работают как обычно)."""
+        if n_stations < 2:
+            raise ValueError("Нужно минимум 2 точки установки подвижной нагрузки.")
+        xs = np.linspace(0.0, self.L, n_stations)
+        nodes = sorted(set(self._breakpoints(refine=1)) | set(np.round(xs, 9).tolist()))
+        nodes, idx_of, Le, fixed_dofs = self._mesh(nodes)
+        st = np.array([idx_of[round(x, 9)] for x in xs])
+
+        F = np.zeros((2 * len(nodes), n_stations + 1))
+        F[:, 0] = self._load_vector(nodes, idx_of)
+        F[2 * st, np.arange(1, n_stations + 1)] = 1.0
+        xp = np.array([s.x for s in self.supports])
+        sup = np.array([idx_of[round(x, 9)] for x in xp])
+        rows = np.concatenate([2 * sup, 2 * sup + 1])
+        with _mechanism_as_value_error():
+            D, R_rows = self._solve_banded(self._factor_banded(Le, fixed_dofs), F, fixed_dofs, rows)
+        R_full = np.zeros_like(F)
+        R_full[rows] = R_rows
+
+        self._nodes = nodes
+        self._d = D[:, 0]
+        self._reactions = self._collect_reactions(R_full[:, 0], idx_of)
+        self.segments()
+
+        # Q и M по методу сечений от сил левее сечения (на самой границе —
+        # как Beam.Q: значение слева, кроме сечения x = 0)
+        left = lambda xp: (xp[None, :] < xs[:, None] - 1e-9) | (xp[None, :] <= 1e-9)
+        Rv = R_full[2 * sup, 1:]
+        Rm = np.where(np.array([s.restrains_theta for s in self.supports])[:, None],
+                      R_full[2 * sup + 1, 1:], 0.0)
+        on_sup = left(xp).astype(float)                       # (сечение, опора)
+        arm_sup = on_sup * (xs[:, None] - xp[None, :])
+        on_p = left(xs).astype(float)                          # (сечение, положение силы)
+        IL_Q = on_sup.dot(Rv) + on_p
+        IL_M = arm_sup.dot(Rv) - on_sup.dot(Rm) + on_p * (xs[:, None] - xs[None, :])
+
+        return {
+            'x': xs,
+            'R': Rv, 'Rm': Rm, 'Q': IL_Q, 'M': IL_M, 'v': D[2 * st, 1:],
+            'base': {
+                'R': np.array([r['R'] for r in self._reactions]),
+                'Rm': np.array([r['M'] for r in self._reactions]),
+                'Q': self.Q(xs), 'M': self.M(xs), 'v': D[2 * st, 0],
+            },
+        }
+
+    def moving_load_envelope(self, axles, n_stations=201):
+        """Огибающие реакций, Q, M и прогиба от поезда сосредоточенных сил,
+        прокатываемого по балке слева направо (плюс собственная нагрузка
+        балки в каждом положении).
+        axles: [(offset, value), ...] — offset: отставание оси от головной, м
+        (>= 0); value: Н, знак как в add_force (вниз — отрицательное).
+        Положения поезда — с шагом сетки, от въезда головной оси до съезда
+        последней; оси между точками сетки учитываются линейной
+        интерполяцией линий влияния."""
+        if not axles:
+            raise ValueError("Задайте хотя бы одну ось подвижной нагрузки.")
+        offsets = np.array([float(a) for a, _ in axles])
+        values = np.array([float(p) for _, p in axles])
+        if (offsets < 0).any():
+            raise ValueError("Смещение оси относительно головной не может быть отрицательным.")
+
+        il = self.influence_lines(n_stations)
+        step = self.L / (n_stations - 1)
+        heads = np.arange(0.0, self.L + offsets.max() + 0.5 * step, step)
+
+        keys = ('R', 'Rm', 'Q', 'M', 'v')
+        total = {k: np.repeat(il['base'][k][:, None], len(heads), axis=1) for k in keys}
+        for off, P in zip(offsets, values):
+            p = heads - off
+            on = (p >= -1e-9) & (p <= self.L + 1e-9)
+            u = np.clip(p[on], 0.0, self.L) / step
+            i = np.minimum(np.floor(u).astype(int), n_stations - 2)
+            w = u - i
+            for k in keys:
+                total[k][:, on] += P * ((1 - w) * il[k][:, i] + w * il[k][:, i + 1])
+
+        def governing(a):
+            s, t = np.unravel_index(int(np.argmax(np.abs(a))), a.shape)
+            return {'value': float(a[s, t]), 'x': float(il['x'][s]), 'head': float(heads[t])}
+
+        reactions = []
+        for j, s in enumerate(self.supports):
+            reactions.append({'x': s.x, 'kind': s.kind,
+                              'R_max': float(total['R'][j].max()), 'R_min': float(total['R'][j].min()),
+                              'M_max': float(total['Rm'][j].max()), 'M_min': float(total['Rm'][j].min())})
+        return {
+            'x': il['x'], 'heads': heads, 'reactions': reactions,
+            'Q_max': total['Q'].max(axis=1), 'Q_min': total['Q'].min(axis=1),
+            'M_max': total['M'].max(axis=1), 'M_min': total['M'].min(axis=1),
+            'v_max': total['v'].max(axis=1), 'v_min': total['v'].min(axis=1),
+            'governing': {k: governing(total[k]) for k in ('Q', 'M', 'v')},
+        }
 
     # ---------- сегментные аналитические формулы Q(x), M(x) ----------
     def segments(self):
@@ -283,50 +566,102 @@ class Beam:
         M0 -= point_moments.get(key_last, 0.0)
         self._end_Q, self._end_M = Q0, M0
         self._segs = segs
+        # те же коэффициенты столбцами — для векторных Q(x)/M(x)
+        self._seg_cols = {k: np.array([s[k] for s in segs], dtype=float)
+                          for k in ('x0', 'x1', 'Q0', 'M0', 'w0', 'slope')}
+        self._sample_cache = {}
         return segs
 
+    @staticmethod
+    def _locate(right_edges, x):
+        """Номер участка для каждого x (массив или скаляр) и маска попадания
+        в балку. На общей границе двух участков берётся левый — как и при
+        прежнем линейном переборе."""
+        i = np.searchsorted(right_edges + 1e-9, x, side='left')
+        inside = (x >= -1e-9) & (i < len(right_edges))
+        return np.minimum(i, len(right_edges) - 1), inside
+
+    @staticmethod
+    def _scalar_or_array(out):
+        return float(out) if out.ndim == 0 else out
+
     def Q(self, x):
-        for seg in self._segs:
-            if seg['x0'] - 1e-9 <= x <= seg['x1'] + 1e-9:
-                dx = x - seg['x0']
-                return seg['Q0'] + seg['w0'] * dx + seg['slope'] * dx ** 2 / 2
-        return 0.0
+        """Q(x) для числа или массива x."""
+        x = np.asarray(x, dtype=float)
+        c = self._seg_cols
+        i, inside = self._locate(c['x1'], x)
+        dx = x - c['x0'][i]
+        out = c['Q0'][i] + c['w0'][i] * dx + c['slope'][i] * dx ** 2 / 2
+        return self._scalar_or_array(np.where(inside, out, 0.0))
 
     def M(self, x):
-        for seg in self._segs:
-            if seg['x0'] - 1e-9 <= x <= seg['x1'] + 1e-9:
-                dx = x - seg['x0']
-                return seg['M0'] + seg['Q0'] * dx + seg['w0'] * dx ** 2 / 2 + seg['slope'] * dx ** 3 / 6
-        return 0.0
+        """M(x) для числа или массива x."""
+        x = np.asarray(x, dtype=float)
+        c = self._seg_cols
+        i, inside = self._locate(c['x1'], x)
+        dx = x - c['x0'][i]
+        out = c['M0'][i] + c['Q0'][i] * dx + c['w0'][i] * dx ** 2 / 2 + c['slope'][i] * dx ** 3 / 6
+        return self._scalar_or_array(np.where(inside, out, 0.0))
 
     def sample(self, n=400):
-        xs = np.linspace(0, self.L, n)
-        Qs = np.array([self.Q(x) for x in xs])
-        Ms = np.array([self.M(x) for x in xs])
-        return xs, Qs, Ms
+        """Равномерная выборка (xs, Qs, Ms); результат запоминается до
+        следующего segments(), так что эпюры, записка и проверки прочности
+        считают её один раз."""
+        if n not in self._sample_cache:
+            xs = np.linspace(0, self.L, n)
+            self._sample_cache[n] = (xs, self.Q(xs), self.M(xs))
+        return self._sample_cache[n]
 
     def deflection(self, x):
-        """Прогиб v(x) интерполяцией функциями формы Эрмита по узлам МКЭ."""
-        nodes = self._nodes
-        for i in range(len(nodes) - 1):
-            x0, x1 = nodes[i], nodes[i + 1]
-            if x0 - 1e-9 <= x <= x1 + 1e-9:
-                Le = x1 - x0
-                s = (x - x0) / Le if Le > 1e-9 else 0.0
-                v1, t1, v2, t2 = self._d[2 * i], self._d[2 * i + 1], self._d[2 * i + 2], self._d[2 * i + 3]
-                N1 = 1 - 3 * s ** 2 + 2 * s ** 3
-                N2 = Le * (s - 2 * s ** 2 + s ** 3)
-                N3 = 3 * s ** 2 - 2 * s ** 3
-                N4 = Le * (-s ** 2 + s ** 3)
-                return N1 * v1 + N2 * t1 + N3 * v2 + N4 * t2
-        return 0.0
+        """Прогиб v(x) интерполяцией функциями формы Эрмита по узлам МКЭ
+        (x — число или массив)."""
+        x = np.asarray(x, dtype=float)
+        nodes = np.asarray(self._nodes, dtype=float)
+        i, inside = self._locate(nodes[1:], x)
+        x0 = nodes[i]
+        Le = nodes[i + 1] - x0
+        s = np.where(Le > 1e-9, (x - x0) / np.where(Le > 1e-9, Le, 1.0), 0.0)
+        v1, t1, v2, t2 = self._d[2 * i], self._d[2 * i + 1], self._d[2 * i + 2], self._d[2 * i + 3]
+        N1 = 1 - 3 * s ** 2 + 2 * s ** 3
+        N2 = Le * (s - 2 * s ** 2 + s ** 3)
+        N3 = 3 * s ** 2 - 2 * s ** 3
+        N4 = Le * (-s ** 2 + s ** 3)
+        out = N1 * v1 + N2 * t1 + N3 * v2 + N4 * t2
+        return self._scalar_or_array(np.where(inside, out, 0.0))
+
+    def _extreme(self, f, roots):
+        """Точный экстремум |f| по всем участкам: кандидаты — концы участков
+        и корни производной внутри участка (roots: массив (nseg, k) со
+        смещениями ξ, NaN — корня нет)."""
+        c = self._seg_cols
+        Le = c['x1'] - c['x0']
+        dx = np.column_stack([np.zeros_like(Le), Le, roots])
+        dx = np.where((dx >= 0) & (dx <= Le[:, None]), dx, np.nan)
+        vals = f(dx)
+        vals = np.where(np.isnan(dx), 0.0, vals)
+        k = int(np.argmax(np.abs(vals)))
+        i, j = divmod(k, dx.shape[1])
+        return float(c['x0'][i] + dx[i, j]), float(vals[i, j])
 
     def max_abs_Q(self):
-        xs, Qs, Ms = self.sample(800)
-        i = np.argmax(np.abs(Qs))
-        return xs[i], Qs[i]
+        c = self._seg_cols
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # dQ/dξ = w0 + slope·ξ
+            root = np.where(np.abs(c['slope']) > 1e-12, -c['w0'] / c['slope'], np.nan)
+        return self._extreme(
+            lambda dx: c['Q0'][:, None] + c['w0'][:, None] * dx + c['slope'][:, None] * dx ** 2 / 2,
+            root[:, None])
 
     def max_abs_M(self):
-        xs, Qs, Ms = self.sample(800)
-        i = np.argmax(np.abs(Ms))
-        return xs[i], Ms[i]
+        c = self._seg_cols
+        a, b, q = c['slope'] / 2, c['w0'], c['Q0']
+        # экстремумы M — корни Q(ξ) = a·ξ² + b·ξ + q на участке
+        with np.errstate(divide='ignore', invalid='ignore'):
+            disc = np.sqrt(b ** 2 - 4 * a * q)
+            quad = np.abs(a) > 1e-12
+            r1 = np.where(quad, (-b - disc) / (2 * a), np.where(np.abs(b) > 1e-12, -q / b, np.nan))
+            r2 = np.where(quad, (-b + disc) / (2 * a), np.nan)
+        return self._extreme(
+            lambda dx: (c['M0'][:, None] + c['Q0'][:, None] * dx + c['w0'][:, None] * dx ** 2 / 2
+                        + c['slope'][:, None] * dx ** 3 / 6),
+            np.column_stack([r1, r2]))
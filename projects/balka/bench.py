@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк калькулятора балки.
+
+Параметрические балки (1–4 опоры, от десятков до тысяч нагрузок) проходят
+по стадиям по отдельности: сборка из JSON, solve_reactions, segments,
+sample, рисунки (diagrams, в потоке — без пула), записка
+(report.generate_report) и целиком /api/calculate через тестовый клиент
+Flask (с пустым кэшем результатов, рисунки — через render_pool).
+
+По каждой стадии — перцентили задержки (мс) и пик памяти Python-аллокаций
+(tracemalloc, отдельным прогоном, чтобы не искажать время). Результат —
+JSON в stdout или в файл.
+
+  python bench.py --quick
+  python bench.py --out bench.json
+  python bench.py --baseline bench.json   # код возврата 1 при регрессии p95
+"""
+import argparse
+import io
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+import app as web
+import diagrams
+import report
+
+LENGTH = 12.0
+# опоры в долях длины; одна опора — консоль с заделкой
+SUPPORT_LAYOUTS = {
+    1: [(0.0, 'fixed')],
+    2: [(0.0, 'pin'), (1.0, 'roller')],
+    3: [(0.0, 'pin'), (0.5, 'roller'), (1.0, 'roller')],
+    4: [(0.0, 'fixed'), (1 / 3, 'roller'), (2 / 3, 'roller'), (1.0, 'fixed')],
+}
+LOAD_COUNTS = (10, 100, 1000)
+QUICK_LOAD_COUNTS = (10,)
+QUICK_REPEAT = 3
+PERCENTILES = (50, 90, 95, 99)
+NOISE_FLOOR_MS = 1.0  # меньшие приросты p95 регрессией не считаются
+
+
+def make_payload(n_supports, n_loads, seed=0):
+    """Запрос /api/calculate: n_loads нагрузок — половина сосредоточенных
+    сил, четверть моментов, четверть распределённых."""
+    rng = np.random.default_rng(seed)
+    n_moments = n_dloads = n_loads // 4
+    n_forces = n_loads - n_moments - n_dloads
+    xs = np.round(rng.uniform(0, LENGTH, n_forces + n_moments), 3)
+    spans = np.sort(np.round(rng.uniform(0, LENGTH, (n_dloads, 2)), 3), axis=1)
+    return {
+        'length': LENGTH,
+        'section': {'type': 'i_beam', 'dims': {'h': 300, 'b': 150, 's': 7, 't': 11}},
+        'supports': [{'x': f * LENGTH, 'kind': kind} for f, kind in SUPPORT_LAYOUTS[n_supports]],
+        'forces': [{'x': float(x), 'value': float(v)}
+                   for x, v in zip(xs[:n_forces], rng.uniform(-20e3, 5e3, n_forces))],
+        'moments': [{'x': float(x), 'value': float(v)}
+                    for x, v in zip(xs[n_forces:], rng.uniform(-5e3, 5e3, n_moments))],
+        'dloads': [{'x1': float(a), 'x2': float(b), 'value1': float(v), 'value2': float(v)}
+                   for (a, b), v in zip(spans, rng.uniform(-3e3, 0, n_dloads)) if b > a],
+    }
+
+
+class Stages:
+    """Замеры по стадиям: времена — в обычных прогонах, пик памяти — в
+    прогоне под tracemalloc."""
+
+    def __init__(self):
+        self.times = defaultdict(list)
+        self.mem_peak = {}
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        yield
+        dt = time.perf_counter() - t0
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1] - base
+            self.mem_peak[name] = max(self.mem_peak.get(name, 0), peak)
+        else:
+            self.times[name].append(dt)
+
+    def summary(self):
+        out = {}
+        for name, ts in self.times.items():
+            ms = np.array(ts) * 1000
+            row = {'n': len(ts), 'mean_ms': float(ms.mean()), 'max_ms': float(ms.max())}
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = float(np.percentile(ms, p))
+            if name in self.mem_peak:
+                row['mem_peak_kb'] = self.mem_peak[name] / 1024
+            out[name] = row
+        return out
+
+
+def run_pipeline(payload, st):
+    with st.stage('build'):
+        beam, sec, supports_in, forces_in, moments_in, dloads_in = web._build_beam(payload)
+    with st.stage('solve_reactions'):
+        reactions = beam.solve_reactions()
+    with st.stage('segments'):
+        beam.segments()
+    with st.stage('sample'):
+        xs, Qs, Ms = beam.sample(400)
+    with st.stage('diagrams'):
+        bufs = {k: io.BytesIO() for k in ('scheme', 'Q', 'M', 'defl')}
+        diagrams.draw_scheme(beam, forces_in, moments_in, dloads_in, bufs['scheme'])
+        diagrams.draw_epure(xs, Qs, bufs['Q'], "Эпюра Q(x)", "Q, Н", "tab:blue")
+        diagrams.draw_epure(xs, Ms, bufs['M'], "Эпюра M(x)", "M, Н·м", "tab:red")
+        diagrams.draw_deflection(beam, bufs['defl'])
+    res = {
+        'beam': beam, 'section': sec, 'reactions': reactions,
+        'forces_in': forces_in, 'moments_in': moments_in, 'dloads_in': dloads_in,
+        'determinate': sum((2 if s['kind'] == 'fixed' else 1) for s in supports_in) <= 3,
+        'images': {k: b.getvalue() for k, b in bufs.items()},
+    }
+    with st.stage('report'):
+        report.generate_report(web._report_context(payload, res), io.BytesIO())
+
+
+def run_api(client, payload, st):
+    with web._results_lock:
+        web._results.clear()
+    with st.stage('api_calculate'):
+        r = client.post('/api/calculate', json=payload)
+    if r.status_code != 200:
+        raise RuntimeError(f"/api/calculate: {r.status_code} {r.get_json()}")
+
+
+def bench_case(client, payload, repeat):
+    st = Stages()
+    run_pipeline(payload, st)          # прогрев: кэши matplotlib, пул
+    run_api(client, payload, st)
+    st.times.clear()
+    for _ in range(repeat):
+        run_pipeline(payload, st)
+        run_api(client, payload, st)
+    tracemalloc.start()
+    try:
+        run_pipeline(payload, st)
+        run_api(client, payload, st)
+    finally:
+        tracemalloc.stop()
+    return st.summary()
+
+
+def compare(result, baseline, tolerance):
+    """Стадии, у которых p95 вырос больше чем в tolerance раз."""
+    base = {c['name']: c['stages'] for c in baseline['cases']}
+    regressions = []
+    for case in result['cases']:
+        for stage, row in case['stages'].items():
+            old = base.get(case['name'], {}).get(stage)
+            if old is None:
+                continue
+            if row['p95_ms'] > old['p95_ms'] * tolerance and \
+                    row['p95_ms'] - old['p95_ms'] > NOISE_FLOOR_MS:
+                regressions.append({'case': case['name'], 'stage': stage,
+                                    'p95_ms': row['p95_ms'], 'baseline_p95_ms': old['p95_ms']})
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--repeat', type=int, default=20, help="прогонов на случай")
+    ap.add_argument('--quick', action='store_true',
+                    help=f"только малые случаи, {QUICK_REPEAT} прогона")
+    ap.add_argument('--out', help="файл для JSON (по умолчанию stdout)")
+    ap.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    ap.add_argument('--tolerance', type=float, default=1.25,
+                    help="допустимый рост p95 относительно baseline")
+    args = ap.parse_args(argv)
+
+    load_counts = QUICK_LOAD_COUNTS if args.quick else LOAD_COUNTS
+    repeat = QUICK_REPEAT if args.quick else args.repeat
+    client = web.app.test_client()
+    cases = []
+    for n_supports in sorted(SUPPORT_LAYOUTS):
+        for n_loads in load_counts:
+            payload = make_payload(n_supports, n_loads)
+            name = f"supports={n_supports},loads={n_loads}"
+            print(f"{name} ...", file=sys.stderr)
+            cases.append({'name': name, 'params': {'supports': n_supports, 'loads': n_loads},
+                          'stages': bench_case(client, payload, repeat)})
+
+    result = {
+        'project': 'balka',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'render_workers': web.render_pool.RENDER_WORKERS,
+        'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cases': cases,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        for r in regressions:
+            print(f"РЕГРЕССИЯ {r['case']} / {r['stage']}: p95 {r['baseline_p95_ms']:.2f} → "
+                  f"{r['p95_ms']:.2f} мс", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Параллельная отрисовка рисунков одного расчёта в пуле процессов.
+
+Рисунки расчёта независимы друг от друга, но matplotlib почти всё время
+отрисовки держит GIL, поэтому потоки не помогают — нужны процессы. Пул
+создаётся при первом обращении (в каждом воркере gunicorn — свой), процессы
+сразу импортируют matplotlib (Agg) и diagrams и рисуют пробную фигуру:
+холодный импорт и загрузка шрифтов не попадают во время запроса.
+
+Задание — (kind, kwargs): в процессе вызывается diagrams.draw_<kind>(**kwargs,
+path=<BytesIO>), обратно приходят PNG-байты. В kwargs — только числа, строки,
+списки/словари из JSON и массивы numpy, никаких объектов Beam/Truss.
+
+Очередь ограничена RENDER_QUEUE_LIMIT рисунками: если за SUBMIT_TIMEOUT
+места не нашлось, render() бросает RenderBusy (→ 503), а не копит запросы.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import diagrams
+
+RENDER_WORKERS = min(4, os.cpu_count() or 1)  # 0 — рисовать в потоке запроса
+RENDER_QUEUE_LIMIT = max(8, 4 * RENDER_WORKERS)  # рисунков в работе и в очереди
+SUBMIT_TIMEOUT = 5.0    # с, ожидание места в очереди
+RENDER_TIMEOUT = 60.0   # с, на все рисунки одного запроса
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(RENDER_QUEUE_LIMIT)
+
+
+class RenderBusy(RuntimeError):
+    """Очередь отрисовки заполнена — сервер перегружен."""
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(2, 1))
+    fig.add_subplot().set_title('Прогрев: шрифты, Agg')
+    fig.savefig(io.BytesIO(), format='png')
+
+
+def _render_one(kind, kwargs):
+    buf = io.BytesIO()
+    getattr(diagrams, 'draw_' + kind)(path=buf, **kwargs)
+    return buf.getvalue()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: не наследовать потоки и замки Flask-процесса через fork
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _drop_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render(jobs):
+    """jobs: {имя: (kind, kwargs)} -> {имя: PNG-байты}; рисунки одного
+    запроса рисуются параллельно."""
+    if RENDER_WORKERS <= 0:
+        return {name: _render_one(kind, kw) for name, (kind, kw) in jobs.items()}
+    if len(jobs) > RENDER_QUEUE_LIMIT:
+        raise ValueError(f"Слишком много рисунков за один запрос (больше {RENDER_QUEUE_LIMIT}).")
+
+    taken = 0
+    try:
+        for _ in jobs:
+            if not _slots.acquire(timeout=SUBMIT_TIMEOUT):
+                raise RenderBusy("Сервер перегружен отрисовкой, повторите запрос позже.")
+            taken += 1
+    except RenderBusy:
+        for _ in range(taken):
+            _slots.release()
+        raise
+
+    executor = _get_executor()
+    futures = {}
+    try:
+        for name, (kind, kw) in jobs.items():
+            fut = executor.submit(_render_one, kind, kw)
+            fut.add_done_callback(lambda _: _slots.release())
+            futures[name] = fut
+            taken -= 1
+        return {name: fut.result(timeout=RENDER_TIMEOUT) for name, fut in futures.items()}
+    except BrokenProcessPool:
+        # процесс упал (нехватка памяти и т.п.) — пул пересоздаётся при
+        # следующем запросе, этот дорисовывается здесь же
+        _drop_executor(executor)
+        return {name: _render_one(kind, kw) for name, (kind, kw) in jobs.items()}
+    finally:
+        for _ in range(taken):
+            _slots.release()
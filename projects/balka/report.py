@@ -6,6 +6,9 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.oxml.ns import qn
 import datetime
+import io
+
+import numpy as np
 
 SUPPORT_NAMES_RU = {
     'pin': 'шарнирно-неподвижная опора',
@@ -80,8 +83,10 @@ def _num(v, nd=3):
     return f"{v:.{nd}g}"
 
 
-def _add_image(doc, path, width_cm=15.5):
-    doc.add_picture(path, width=Cm(width_cm))
+def _add_image(doc, image, width_cm=15.5):
+    if isinstance(image, bytes):
+        image = io.BytesIO(image)
+    doc.add_picture(image, width=Cm(width_cm))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
 
 
@@ -93,7 +98,7 @@ def generate_report(ctx, out_path):
       supports_in, forces_in, moments_in, dloads_in — исходные данные (списки dict)
       section: dict геом.характеристик (A, Ix, Wx, y_max, desc)
       sigma_allow: допускаемое напряжение, Па
-      images: dict путей к рисункам {'scheme','Q','M','defl'}
+      images: dict рисунков {'scheme','Q','M','defl'} — пути к файлам или PNG-байты
       determinate: bool — статически определима ли система опор
     """
     doc = Document()
@@ -303,9 +308,9 @@ def generate_report(ctx, out_path):
     # ---------- 6. Жёсткость ----------
     doc.add_page_break()
     _h1(doc, "6. Проверка жёсткости (прогибы)")
-    xs = [beam.L * i / 300 for i in range(301)]
-    vs = [beam.deflection(x) for x in xs]
-    i_max = max(range(len(vs)), key=lambda i: abs(vs[i]))
+    xs = np.linspace(0, beam.L, 301)
+    vs = beam.deflection(xs)
+    i_max = int(np.argmax(np.abs(vs)))
     v_max, x_at = vs[i_max], xs[i_max]
     f_allow = ctx.get('deflection_ratio', 250)
     v_allow = L / f_allow
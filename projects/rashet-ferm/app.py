@@ -5,24 +5,40 @@ Flask-приложение "Расчёт фермы" (модуль для сай
   GET  /                -> интерфейс конструктора фермы
   POST /api/calculate   -> JSON: реакции, усилия в стержнях, проверки, картинки (base64)
   POST /api/report      -> генерирует .docx записку и отдаёт файл на скачивание
+  POST /api/load_cases  -> JSON: реакции и усилия по нагружениям и их сочетаниям за одно решение
+  POST /api/optimize    -> JSON: подбор сечений стержней по сортаменту (минимум массы) + история итераций
+  POST /api/buckling    -> JSON: критические множители нагрузки и формы потери устойчивости (base64)
 """
 import base64
+import hashlib
 import io
-import os
-import tempfile
+import json
+import math
+import threading
 import traceback
+from collections import OrderedDict
 
 from flask import Flask, request, jsonify, send_file, render_template
 
 from truss_engine import Truss
 import sections
 import diagrams
+import render_pool
 import report
 
 app = Flask(__name__)
 
 STEEL_E = 2.0e11
 DEFAULT_SIGMA_ALLOW = 160e6
+STEEL_RHO = 7850.0  # кг/м³
+MAX_BUCKLING_MODES = 6
+RESULT_CACHE_SIZE = 64   # решённых ферм с готовыми рисунками в памяти
+REPORT_ONLY_FIELDS = ('author', 'date')  # не влияют на расчёт и рисунки
+
+# request-hash -> решённая ферма и PNG-рисунки; /api/report сразу после
+# /api/calculate с теми же данными не решает и не рисует заново.
+_results = OrderedDict()
+_results_lock = threading.Lock()
 
 
 def _build_truss(data):
@@ -60,9 +76,96 @@ def _build_truss(data):
     return truss, sec, dims, sec_type, loads_in
 
 
-def _png_b64(path):
-    with open(path, 'rb') as fh:
-        return "data:image/png;base64," + base64.b64encode(fh.read()).decode('ascii')
+def _png_b64(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode('ascii')
+
+
+def _request_key(data):
+    payload = {k: v for k, v in data.items() if k not in REPORT_ONLY_FIELDS}
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def _render_images(truss, loads_in):
+    """Рисунки расчёта — PNG-байты; рисуются параллельно в render_pool,
+    задания содержат только массивы и исходные данные запроса."""
+    geometry = diagrams.truss_geometry(truss)
+    return render_pool.render({
+        'scheme': ('scheme_data', {'geometry': geometry, 'loads_in': loads_in}),
+        'forces': ('forces_data', {'geometry': geometry, 'forces': truss._forces}),
+    })
+
+
+def _solve_and_render(data):
+    """Решённая ферма и её рисунки — из кэша или заново.
+    Результат общий для всех запросов с теми же данными: не изменять."""
+    key = _request_key(data)
+    with _results_lock:
+        res = _results.get(key)
+        if res is not None:
+            _results.move_to_end(key)
+            return res
+
+    truss, sec, dims, sec_type, loads_in = _build_truss(data)
+    deg, m, r, n = truss.degree_of_determinacy()
+    if deg < 0:
+        raise ValueError(
+            f"Система — механизм (m + r − 2n = {deg} < 0): "
+            f"{m} стержней, {r} опорных связей, {n} узлов. Добавьте стержни или опоры."
+        )
+    reactions, forces = truss.solve()
+    res = {
+        'truss': truss,
+        'section': sec,
+        'I_min': sections.min_moment_of_inertia(sec_type, dims),
+        'loads_in': loads_in,
+        'determinacy': {'deg': deg, 'm': m, 'r': r, 'n': n},
+        'reactions': reactions,
+        'forces': forces,
+        'equilibrium': list(truss.check_equilibrium()),
+        'images': _render_images(truss, loads_in),
+    }
+    with _results_lock:
+        _results[key] = res
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return res
+
+
+def _member_checks(truss, forces, sec, I_min, sigma_allow):
+    """Прочность растянутых и устойчивость (Эйлер) сжатых стержней."""
+    member_checks = []
+    worst_ratio = 0.0
+    for i, (mb, N) in enumerate(zip(truss.members, forces)):
+        L = truss.member_length(mb)
+        sigma = N / sec['A']
+        if N >= 0:
+            ratio = abs(sigma) / sigma_allow if sigma_allow > 0 else 0
+            ncr = None
+        else:
+            ncr = math.pi ** 2 * truss.E * I_min / L ** 2
+            ratio = abs(N) / ncr if ncr > 0 else 1e9
+        worst_ratio = max(worst_ratio, ratio)
+        member_checks.append({
+            'i': i, 'nodes': [mb.i, mb.j], 'N': N, 'sigma_MPa': sigma / 1e6,
+            'Ncr': ncr, 'ratio': ratio,
+        })
+    return member_checks, worst_ratio
+
+
+def _report_context(data, res):
+    """Данные для report.generate_report по запросу и результату _solve_and_render."""
+    return {
+        'author': data.get('author', ''),
+        'date': data.get('date', ''),
+        'truss': res['truss'],
+        'loads_in': res['loads_in'],
+        'section': res['section'],
+        'E': res['truss'].E,
+        'I_min': res['I_min'],
+        'sigma_allow': float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW)),
+        'images': res['images'],
+    }
 
 
 @app.route('/')
@@ -74,57 +177,26 @@ def index():
 def api_calculate():
     data = request.get_json(force=True)
     try:
-        truss, sec, dims, sec_type, loads_in = _build_truss(data)
-        deg, m, r, n = truss.degree_of_determinacy()
-        if deg < 0:
-            raise ValueError(
-                f"Система — механизм (m + r − 2n = {deg} < 0): "
-                f"{m} стержней, {r} опорных связей, {n} узлов. Добавьте стержни или опоры."
-            )
-        reactions, forces = truss.solve()
-        sfx, sfy = truss.check_equilibrium()
-
-        I_min = sections.min_moment_of_inertia(sec_type, dims)
+        res = _solve_and_render(data)
+        sec, I_min = res['section'], res['I_min']
         sigma_allow = float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW))
-        E = truss.E
-
-        member_checks = []
-        worst_ratio = 0.0
-        for i, (mb, N) in enumerate(zip(truss.members, forces)):
-            L = truss.member_length(mb)
-            sigma = N / sec['A']
-            if N >= 0:
-                ratio = abs(sigma) / sigma_allow if sigma_allow > 0 else 0
-                ncr = None
-            else:
-                import math
-                ncr = math.pi ** 2 * E * I_min / L ** 2
-                ratio = abs(N) / ncr if ncr > 0 else 1e9
-            worst_ratio = max(worst_ratio, ratio)
-            member_checks.append({
-                'i': i, 'nodes': [mb.i, mb.j], 'N': N, 'sigma_MPa': sigma / 1e6,
-                'Ncr': ncr, 'ratio': ratio,
-            })
-
-        with tempfile.TemporaryDirectory() as tmp:
-            p_scheme = os.path.join(tmp, 'scheme.png')
-            p_forces = os.path.join(tmp, 'forces.png')
-            diagrams.draw_scheme(truss, loads_in, p_scheme)
-            diagrams.draw_forces(truss, forces, p_forces)
-            images = {k: _png_b64(p) for k, p in [('scheme', p_scheme), ('forces', p_forces)]}
+        member_checks, worst_ratio = _member_checks(res['truss'], res['forces'], sec, I_min,
+                                                    sigma_allow)
 
         return jsonify({
             'ok': True,
-            'determinacy': {'deg': deg, 'm': m, 'r': r, 'n': n},
-            'reactions': reactions,
-            'forces': forces,
+            'determinacy': res['determinacy'],
+            'reactions': res['reactions'],
+            'forces': res['forces'],
             'member_checks': member_checks,
-            'equilibrium': [sfx, sfy],
+            'equilibrium': res['equilibrium'],
             'sigma_allow_MPa': sigma_allow / 1e6,
             'section': {'A': sec['A'], 'I_min': I_min, 'desc': sec['desc']},
             'all_ok': bool(worst_ratio <= 1.0),
-            'images': images,
+            'images': {k: _png_b64(png) for k, png in res['images'].items()},
         })
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         traceback.print_exc()
         return jsonify({'ok': False, 'error': str(e)}), 400
@@ -134,40 +206,141 @@ def api_calculate():
 def api_report():
     data = request.get_json(force=True)
     try:
-        truss, sec, dims, sec_type, loads_in = _build_truss(data)
+        res = _solve_and_render(data)
+        ctx = _report_context(data, res)
+        buf = io.BytesIO()
+        report.generate_report(ctx, buf)
+        buf.seek(0)
+
+        return send_file(buf, as_attachment=True, download_name='Расчёт_фермы.docx',
+                          mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/load_cases', methods=['POST'])
+def api_load_cases():
+    """Одна ферма, несколько нагружений:
+    cases: [{'name', 'loads': [{'node', 'fx', 'fy'}]}],
+    combinations: [{'name', 'factors': {имя нагружения: коэффициент}}].
+    Нагрузки верхнего уровня запроса здесь не используются."""
+    data = request.get_json(force=True)
+    try:
+        truss, sec, dims, sec_type, _ = _build_truss(data)
         deg, m, r, n = truss.degree_of_determinacy()
         if deg < 0:
             raise ValueError("Система — механизм, расчёт невозможен.")
-        truss.solve()
+
+        cases_in = data.get('cases', [])
+        combos_in = data.get('combinations', [])
+        cases = {}
+        for c in cases_in:
+            loads = {}
+            for ld in c.get('loads', []):
+                node = int(ld['node'])
+                if not (0 <= node < len(truss.nodes)):
+                    raise ValueError(f"Нагружение «{c['name']}»: нет узла {node}.")
+                fx0, fy0 = loads.get(node, (0.0, 0.0))
+                loads[node] = (fx0 + float(ld.get('fx', 0.0)), fy0 + float(ld.get('fy', 0.0)))
+            cases[str(c['name'])] = loads
+        if len(cases) != len(cases_in):
+            raise ValueError("Имена нагружений должны быть уникальными.")
+        combos = {str(c['name']): {str(k): float(v) for k, v in c.get('factors', {}).items()}
+                  for c in combos_in}
+        if len(combos) != len(combos_in):
+            raise ValueError("Имена сочетаний должны быть уникальными.")
+
+        case_results, combo_results = truss.solve_load_cases(cases, combos)
         I_min = sections.min_moment_of_inertia(sec_type, dims)
         sigma_allow = float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW))
 
-        with tempfile.TemporaryDirectory() as tmp:
-            p_scheme = os.path.join(tmp, 'scheme.png')
-            p_forces = os.path.join(tmp, 'forces.png')
-            diagrams.draw_scheme(truss, loads_in, p_scheme)
-            diagrams.draw_forces(truss, truss._forces, p_forces)
-
-            ctx = {
-                'author': data.get('author', ''),
-                'date': data.get('date', ''),
-                'truss': truss,
-                'loads_in': loads_in,
-                'section': sec,
-                'E': truss.E,
-                'I_min': I_min,
-                'sigma_allow': sigma_allow,
-                'images': {'scheme': p_scheme, 'forces': p_forces},
-            }
-            out_path = os.path.join(tmp, 'truss_report.docx')
-            report.generate_report(ctx, out_path)
-            buf = io.BytesIO()
-            with open(out_path, 'rb') as fh:
-                buf.write(fh.read())
-            buf.seek(0)
+        def summary(reactions, forces):
+            member_checks, worst_ratio = _member_checks(truss, forces, sec, I_min, sigma_allow)
+            return {'reactions': reactions, 'forces': forces,
+                    'member_checks': member_checks, 'all_ok': bool(worst_ratio <= 1.0)}
 
-        return send_file(buf, as_attachment=True, download_name='Расчёт_фермы.docx',
-                          mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        return jsonify({
+            'ok': True,
+            'determinacy': {'deg': deg, 'm': m, 'r': r, 'n': n},
+            'sigma_allow_MPa': sigma_allow / 1e6,
+            'cases': {name: summary(*res) for name, res in case_results.items()},
+            'combinations': {name: summary(*res) for name, res in combo_results.items()},
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/optimize', methods=['POST'])
+def api_optimize():
+    """Подбор сечений: catalogue — 'pipe' или 'box' (сортамент из sections);
+    сечение из запроса — начальное приближение для всех стержней."""
+    data = request.get_json(force=True)
+    try:
+        truss, sec, dims, sec_type, loads_in = _build_truss(data)
+        deg, m, r, n = truss.degree_of_determinacy()
+        if deg < 0:
+            raise ValueError("Система — механизм, расчёт невозможен.")
+        catalogue = sections.catalogue(data.get('catalogue', 'pipe'))
+        sigma_allow = float(data.get('sigma_allow', DEFAULT_SIGMA_ALLOW))
+        max_iter = int(data.get('max_iter', 30))
+        if not (1 <= max_iter <= 100):
+            raise ValueError("Число итераций подбора должно быть от 1 до 100.")
+
+        res = truss.optimize_sections(catalogue, sigma_allow, rho=STEEL_RHO, max_iter=max_iter)
+        members = [{
+            'i': i, 'nodes': [mb.i, mb.j], 'section': sc['desc'], 'dims': sc['dims'],
+            'A': sc['A'], 'N': N, 'ratio': ratio,
+        } for i, (mb, sc, N, ratio) in enumerate(zip(truss.members, res['sections'],
+                                                      res['forces'], res['ratios']))]
+        return jsonify({
+            'ok': True,
+            'converged': res['converged'],
+            'all_ok': res['all_ok'],
+            'mass_kg': res['mass'],
+            'members': members,
+            'reactions': truss._reactions,
+            'sigma_allow_MPa': sigma_allow / 1e6,
+            'history': res['history'],
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@app.route('/api/buckling', methods=['POST'])
+def api_buckling():
+    """Устойчивость фермы в целом: k первых форм (k — 'modes', по умолчанию 3)."""
+    data = request.get_json(force=True)
+    try:
+        truss, sec, dims, sec_type, loads_in = _build_truss(data)
+        deg, m, r, n = truss.degree_of_determinacy()
+        if deg < 0:
+            raise ValueError("Система — механизм, расчёт невозможен.")
+        k = int(data.get('modes', 3))
+        if not (1 <= k <= MAX_BUCKLING_MODES):
+            raise ValueError(f"Число форм должно быть от 1 до {MAX_BUCKLING_MODES}.")
+
+        modes = truss.buckling_modes(k)
+        geometry = diagrams.truss_geometry(truss)
+        pngs = render_pool.render({
+            num: ('buckling_mode_data', {'geometry': geometry, 'factor': mode['factor'],
+                                         'shape': mode['shape'], 'number': num})
+            for num, mode in enumerate(modes, 1)
+        })
+        out = [{'factor': mode['factor'], 'shape': mode['shape'].tolist(),
+                'image': _png_b64(pngs[num])} for num, mode in enumerate(modes, 1)]
+
+        return jsonify({
+            'ok': True,
+            'modes': out,
+            'stable': bool(not modes or modes[0]['factor'] > 1.0),
+        })
+    except render_pool.RenderBusy as e:
+        return jsonify({'ok': False, 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         traceback.print_exc()
         return jsonify({'ok': False, 'error': str(e)}), 400
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк калькулятора фермы.
+
+Параметрические фермы Пратта от 10 до 10 000 стержней проходят по стадиям
+по отдельности: сборка из JSON, Truss.solve, рисунки (diagrams, в потоке —
+без пула), записка (report.generate_report) и целиком /api/calculate через
+тестовый клиент Flask (с пустым кэшем результатов, рисунки — через
+render_pool). Рисунки, записка и API — только для ферм до
+RENDER_MAX_MEMBERS стержней: подписи каждого стержня и таблицы записки на
+тысячах стержней меряют уже не расчёт.
+
+По каждой стадии — перцентили задержки (мс) и пик памяти Python-аллокаций
+(tracemalloc, отдельным прогоном, чтобы не искажать время). Результат —
+JSON в stdout или в файл.
+
+  python bench.py --quick
+  python bench.py --out bench.json
+  python bench.py --baseline bench.json   # код возврата 1 при регрессии p95
+"""
+import argparse
+import io
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+import app as web
+import diagrams
+import report
+import sections
+
+PANEL = 3.0    # м, длина панели
+HEIGHT = 3.0   # м, высота фермы
+NODE_LOAD = -10e3  # Н, на каждый внутренний узел нижнего пояса
+MEMBER_COUNTS = (10, 100, 1000, 10000)
+QUICK_MEMBER_COUNTS = (10, 100)
+QUICK_REPEAT = 3
+RENDER_MAX_MEMBERS = 500
+PERCENTILES = (50, 90, 95, 99)
+NOISE_FLOOR_MS = 1.0  # меньшие приросты p95 регрессией не считаются
+
+
+def make_payload(n_members):
+    """Запрос /api/calculate: статически определимая ферма Пратта из n
+    панелей (4n − 3 стержня, n подобрано под n_members)."""
+    n = max(2, round((n_members + 3) / 4))
+    bottom = list(range(n + 1))                   # узлы 0..n
+    top = {k: n + k for k in range(1, n)}         # узлы над 1..n-1
+    nodes = [{'x': k * PANEL, 'y': 0.0} for k in bottom] + \
+            [{'x': k * PANEL, 'y': HEIGHT} for k in range(1, n)]
+    members = [(k, k + 1) for k in range(n)]                      # нижний пояс
+    members += [(top[k], top[k + 1]) for k in range(1, n - 1)]    # верхний пояс
+    members += [(k, top[k]) for k in range(1, n)]                 # стойки
+    members += [(0, top[1]), (n, top[n - 1])]                     # опорные раскосы
+    members += [(k + 1, top[k]) if k + 1 <= n / 2 else (k, top[k + 1])
+                for k in range(1, n - 1)]                         # раскосы
+    return {
+        'section': {'type': 'pipe', 'dims': {'d_out': 89, 'd_in': 79}},
+        'nodes': nodes,
+        'members': [{'i': i, 'j': j} for i, j in members],
+        'supports': [{'node': 0, 'kind': 'pin'}, {'node': n, 'kind': 'roller_y'}],
+        'loads': [{'node': k, 'fx': 0.0, 'fy': NODE_LOAD} for k in range(1, n)],
+    }
+
+
+class Stages:
+    """Замеры по стадиям: времена — в обычных прогонах, пик памяти — в
+    прогоне под tracemalloc."""
+
+    def __init__(self):
+        self.times = defaultdict(list)
+        self.mem_peak = {}
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        yield
+        dt = time.perf_counter() - t0
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1] - base
+            self.mem_peak[name] = max(self.mem_peak.get(name, 0), peak)
+        else:
+            self.times[name].append(dt)
+
+    def summary(self):
+        out = {}
+        for name, ts in self.times.items():
+            ms = np.array(ts) * 1000
+            row = {'n': len(ts), 'mean_ms': float(ms.mean()), 'max_ms': float(ms.max())}
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = float(np.percentile(ms, p))
+            if name in self.mem_peak:
+                row['mem_peak_kb'] = self.mem_peak[name] / 1024
+            out[name] = row
+        return out
+
+
+def run_pipeline(payload, st, render):
+    with st.stage('build'):
+        truss, sec, dims, sec_type, loads_in = web._build_truss(payload)
+    with st.stage('solve'):
+        reactions, forces = truss.solve()
+    if not render:
+        return
+    with st.stage('diagrams'):
+        bufs = {'scheme': io.BytesIO(), 'forces': io.BytesIO()}
+        diagrams.draw_scheme(truss, loads_in, bufs['scheme'])
+        diagrams.draw_forces(truss, forces, bufs['forces'])
+    res = {
+        'truss': truss, 'section': sec, 'loads_in': loads_in,
+        'I_min': sections.min_moment_of_inertia(sec_type, dims),
+        'images': {k: b.getvalue() for k, b in bufs.items()},
+    }
+    with st.stage('report'):
+        report.generate_report(web._report_context(payload, res), io.BytesIO())
+
+
+def run_api(client, payload, st):
+    with web._results_lock:
+        web._results.clear()
+    with st.stage('api_calculate'):
+        r = client.post('/api/calculate', json=payload)
+    if r.status_code != 200:
+        raise RuntimeError(f"/api/calculate: {r.status_code} {r.get_json()}")
+
+
+def bench_case(client, payload, repeat, render):
+    st = Stages()
+
+    def run():
+        run_pipeline(payload, st, render)
+        if render:
+            run_api(client, payload, st)
+
+    run()                              # прогрев: кэши matplotlib, пул
+    st.times.clear()
+    for _ in range(repeat):
+        run()
+    tracemalloc.start()
+    try:
+        run()
+    finally:
+        tracemalloc.stop()
+    return st.summary()
+
+
+def compare(result, baseline, tolerance):
+    """Стадии, у которых p95 вырос больше чем в tolerance раз."""
+    base = {c['name']: c['stages'] for c in baseline['cases']}
+    regressions = []
+    for case in result['cases']:
+        for stage, row in case['stages'].items():
+            old = base.get(case['name'], {}).get(stage)
+            if old is None:
+                continue
+            if row['p95_ms'] > old['p95_ms'] * tolerance and \
+                    row['p95_ms'] - old['p95_ms'] > NOISE_FLOOR_MS:
+                regressions.append({'case': case['name'], 'stage': stage,
+                                    'p95_ms': row['p95_ms'], 'baseline_p95_ms': old['p95_ms']})
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--repeat', type=int, default=20, help="прогонов на случай")
+    ap.add_argument('--quick', action='store_true',
+                    help=f"только малые случаи, {QUICK_REPEAT} прогона")
+    ap.add_argument('--out', help="файл для JSON (по умолчанию stdout)")
+    ap.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    ap.add_argument('--tolerance', type=float, default=1.25,
+                    help="допустимый рост p95 относительно baseline")
+    args = ap.parse_args(argv)
+
+    member_counts = QUICK_MEMBER_COUNTS if args.quick else MEMBER_COUNTS
+    repeat = QUICK_REPEAT if args.quick else args.repeat
+    client = web.app.test_client()
+    cases = []
+    for n_members in member_counts:
+        payload = make_payload(n_members)
+        m = len(payload['members'])
+        render = m <= RENDER_MAX_MEMBERS
+        name = f"members={m}"
+        print(f"{name} ...", file=sys.stderr)
+        cases.append({'name': name,
+                      'params': {'members': m, 'nodes': len(payload['nodes']), 'rendered': render},
+                      'stages': bench_case(client, payload, repeat, render)})
+
+    result = {
+        'project': 'rashet-ferm',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'render_workers': web.render_pool.RENDER_WORKERS,
+        'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cases': cases,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        for r in regressions:
+            print(f"РЕГРЕССИЯ {r['case']} / {r['stage']}: p95 {r['baseline_p95_ms']:.2f} → "
+                  f"{r['p95_ms']:.2f} мс", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,34 @@
 # -*- coding: utf-8 -*-
-"""Рисунки для фермы: расчётная схема и диаграмма усилий в стержнях."""
+"""Рисунки для фермы: расчётная схема и диаграмма усилий в стержнях.
+path у всех draw_* — путь к файлу или двоичный поток (io.BytesIO): рисунок
+всегда сохраняется в PNG."""
+import threading
+from contextlib import contextmanager
+
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.figure import Figure
 import numpy as np
 
+# Одна фигура на каждый вид рисунка: создание Figure и осей стоит заметно
+# дороже самой отрисовки, поэтому фигура очищается и рисуется заново.
+# Замок — на случай многопоточного сервера: одну фигуру в каждый момент
+# рисует один запрос.
+_FIGURES = {}
+_FIGURES_LOCK = threading.Lock()
+
+
+@contextmanager
+def _figure(kind, figsize):
+    with _FIGURES_LOCK:
+        if kind not in _FIGURES:
+            _FIGURES[kind] = (threading.Lock(), Figure(figsize=figsize))
+        lock, fig = _FIGURES[kind]
+    with lock:
+        fig.clear()
+        yield fig, fig.add_subplot()
+
 
 def _draw_support(ax, x, y, kind):
     s = 0.28
@@ -24,71 +47,111 @@ def _draw_support(ax, x, y, kind):
         ax.plot([x - s * 0.7, x + s * 0.7], [y - s - 0.1, y - s - 0.1], color='k', lw=1.4)
 
 
-def draw_scheme(truss, loads_in, path):
-    xs = [n.x for n in truss.nodes]
-    ys = [n.y for n in truss.nodes]
-    pad = max(1.0, 0.15 * (max(xs) - min(xs) + 1))
-    fig, ax = plt.subplots(figsize=(9, 6))
-
-    for m in truss.members:
-        ni, nj = truss.nodes[m.i], truss.nodes[m.j]
-        ax.plot([ni.x, nj.x], [ni.y, nj.y], color='#333', lw=2.2, zorder=2)
-
-    for i, n in enumerate(truss.nodes):
-        ax.plot(n.x, n.y, 'o', color='#222', ms=6, zorder=3)
-        ax.annotate(str(i), (n.x, n.y), textcoords="offset points", xytext=(6, 6), fontsize=9)
-
-    for s in truss.supports:
-        n = truss.nodes[s.node]
-        _draw_support(ax, n.x, n.y, s.kind)
-
-    for ld in loads_in:
-        n = truss.nodes[ld['node']]
-        fx, fy = ld['fx'], ld['fy']
-        mag = (fx ** 2 + fy ** 2) ** 0.5
-        if mag < 1e-9:
-            continue
-        scale = 1.1 / mag
-        ax.annotate('', xy=(n.x, n.y), xytext=(n.x - fx * scale, n.y - fy * scale),
-                    arrowprops=dict(arrowstyle='-|>', color='tab:red', lw=2), zorder=4)
-        ax.text(n.x - fx * scale, n.y - fy * scale, f"{mag:.3g} Н",
-                color='tab:red', fontsize=8, ha='center', va='bottom')
+def truss_geometry(truss):
+    """Узлы, стержни и опоры фермы простыми массивами: xy (n, 2),
+    members (m, 2) — номера узлов, supports — [(node, kind)]. В таком виде
+    задания на рисунки передаются в процессы render_pool."""
+    return {
+        'xy': np.array([(n.x, n.y) for n in truss.nodes], dtype=float).reshape(-1, 2),
+        'members': np.array([(m.i, m.j) for m in truss.members], dtype=int).reshape(-1, 2),
+        'supports': [(s.node, s.kind) for s in truss.supports],
+    }
+
 
+def _frame(ax, xy):
+    xs, ys = xy[:, 0], xy[:, 1]
+    pad = max(1.0, 0.15 * (xs.max() - xs.min() + 1))
     ax.set_aspect('equal')
-    ax.set_xlim(min(xs) - pad, max(xs) + pad)
-    ax.set_ylim(min(ys) - pad, max(ys) + pad)
+    ax.set_xlim(xs.min() - pad, xs.max() + pad)
+    ax.set_ylim(ys.min() - pad, ys.max() + pad)
     ax.axis('off')
-    ax.set_title('Расчётная схема фермы', fontsize=11)
-    fig.tight_layout()
-    fig.savefig(path, dpi=160)
-    plt.close(fig)
+
+
+def draw_scheme(truss, loads_in, path):
+    draw_scheme_data(truss_geometry(truss), loads_in, path)
+
+
+def draw_scheme_data(geometry, loads_in, path):
+    xy = geometry['xy']
+    with _figure('scheme', (9, 6)) as (fig, ax):
+
+        for i, j in geometry['members']:
+            ax.plot(xy[[i, j], 0], xy[[i, j], 1], color='#333', lw=2.2, zorder=2)
+
+        for i, (x, y) in enumerate(xy):
+            ax.plot(x, y, 'o', color='#222', ms=6, zorder=3)
+            ax.annotate(str(i), (x, y), textcoords="offset points", xytext=(6, 6), fontsize=9)
+
+        for node, kind in geometry['supports']:
+            _draw_support(ax, xy[node, 0], xy[node, 1], kind)
+
+        for ld in loads_in:
+            x, y = xy[ld['node']]
+            fx, fy = ld['fx'], ld['fy']
+            mag = (fx ** 2 + fy ** 2) ** 0.5
+            if mag < 1e-9:
+                continue
+            scale = 1.1 / mag
+            ax.annotate('', xy=(x, y), xytext=(x - fx * scale, y - fy * scale),
+                        arrowprops=dict(arrowstyle='-|>', color='tab:red', lw=2), zorder=4)
+            ax.text(x - fx * scale, y - fy * scale, f"{mag:.3g} Н",
+                    color='tab:red', fontsize=8, ha='center', va='bottom')
+
+        _frame(ax, xy)
+        ax.set_title('Расчётная схема фермы', fontsize=11)
+        fig.tight_layout()
+        fig.savefig(path, dpi=160, format='png')
 
 
 def draw_forces(truss, forces, path):
-    xs = [n.x for n in truss.nodes]
-    ys = [n.y for n in truss.nodes]
-    pad = max(1.0, 0.15 * (max(xs) - min(xs) + 1))
-    fig, ax = plt.subplots(figsize=(9, 6))
-
-    max_abs = max(abs(f) for f in forces) or 1.0
-    for m, N in zip(truss.members, forces):
-        ni, nj = truss.nodes[m.i], truss.nodes[m.j]
-        color = 'tab:red' if N > 1e-6 else ('tab:blue' if N < -1e-6 else '#888')
-        lw = 1.2 + 4.5 * abs(N) / max_abs
-        ax.plot([ni.x, nj.x], [ni.y, nj.y], color=color, lw=lw, zorder=2,
-                solid_capstyle='round')
-        xm, ym = (ni.x + nj.x) / 2, (ni.y + nj.y) / 2
-        ax.text(xm, ym, f"{N:.3g}", fontsize=7.5, ha='center', va='center',
-                bbox=dict(boxstyle='round,pad=0.15', fc='white', ec='none', alpha=0.75))
-
-    for n in truss.nodes:
-        ax.plot(n.x, n.y, 'o', color='#222', ms=5, zorder=3)
+    draw_forces_data(truss_geometry(truss), forces, path)
 
-    ax.set_aspect('equal')
-    ax.set_xlim(min(xs) - pad, max(xs) + pad)
-    ax.set_ylim(min(ys) - pad, max(ys) + pad)
-    ax.axis('off')
-    ax.set_title('Усилия в стержнях N, Н  (красный — растяжение, синий — сжатие)', fontsize=10.5)
-    fig.tight_layout()
-    fig.savefig(path, dpi=160)
-    plt.close(fig)
+
+def draw_forces_data(geometry, forces, path):
+    xy = geometry['xy']
+    with _figure('forces', (9, 6)) as (fig, ax):
+
+        max_abs = max(abs(f) for f in forces) or 1.0
+        for (i, j), N in zip(geometry['members'], forces):
+            color = 'tab:red' if N > 1e-6 else ('tab:blue' if N < -1e-6 else '#888')
+            lw = 1.2 + 4.5 * abs(N) / max_abs
+            ax.plot(xy[[i, j], 0], xy[[i, j], 1], color=color, lw=lw, zorder=2,
+                    solid_capstyle='round')
+            xm, ym = (xy[i] + xy[j]) / 2
+            ax.text(xm, ym, f"{N:.3g}", fontsize=7.5, ha='center', va='center',
+                    bbox=dict(boxstyle='round,pad=0.15', fc='white', ec='none', alpha=0.75))
+
+        ax.plot(xy[:, 0], xy[:, 1], 'o', color='#222', ms=5, zorder=3, ls='none')
+
+        _frame(ax, xy)
+        ax.set_title('Усилия в стержнях N, Н  (красный — растяжение, синий — сжатие)', fontsize=10.5)
+        fig.tight_layout()
+        fig.savefig(path, dpi=160, format='png')
+
+
+def draw_buckling_mode(truss, mode, path, number=1):
+    draw_buckling_mode_data(truss_geometry(truss), mode['factor'], mode['shape'], path, number)
+
+
+def draw_buckling_mode_data(geometry, factor, shape, path, number=1):
+    """Форма потери устойчивости: исходная схема серым, деформированная —
+    поверх, амплитуда — 10% от размера фермы (форма определена с точностью
+    до множителя)."""
+    xy = geometry['xy']
+    span = xy.max(axis=0) - xy.min(axis=0)
+    amp = 0.1 * max(span[0], span[1], 1.0)
+    moved = xy + amp * np.asarray(shape)
+    with _figure('buckling_mode', (9, 6)) as (fig, ax):
+
+        for i, j in geometry['members']:
+            ax.plot(xy[[i, j], 0], xy[[i, j], 1], color='#bbb', lw=1.2, ls='--', zorder=1)
+            ax.plot(moved[[i, j], 0], moved[[i, j], 1],
+                    color='tab:purple', lw=2.0, zorder=2, solid_capstyle='round')
+
+        ax.plot(moved[:, 0], moved[:, 1], 'o', color='#222', ms=4, zorder=3, ls='none')
+
+        _frame(ax, xy)
+        ax.set_title(f"Форма потери устойчивости №{number}, критический множитель нагрузки "
+                     f"λ = {factor:.3g}", fontsize=10.5)
+        fig.tight_layout()
+        fig.savefig(path, dpi=160, format='png')
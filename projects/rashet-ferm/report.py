@@ -6,6 +6,7 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.oxml.ns import qn
 import datetime
+import io
 import math
 
 SUPPORT_NAMES_RU = {
@@ -62,8 +63,11 @@ def _num(v, nd=4):
     return f"{v:.{nd}g}"
 
 
-def _add_image(doc, path, width_cm=15.5):
-    doc.add_picture(path, width=Cm(width_cm))
+def _add_image(doc, image, width_cm=15.5):
+    """image — путь к файлу или PNG-байты."""
+    if isinstance(image, bytes):
+        image = io.BytesIO(image)
+    doc.add_picture(image, width=Cm(width_cm))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
 
 
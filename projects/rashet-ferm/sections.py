@@ -84,3 +84,35 @@ def min_moment_of_inertia(sec_type, dims):
         Iy_web = (h - 2 * t) * s ** 3 / 12
         return Iy_flanges + Iy_web
     raise ValueError(f"Неизвестный тип сечения: {sec_type}")
+
+
+# Сортамент для подбора сечений (Truss.optimize_sections), размеры в мм.
+# Трубы электросварные по ГОСТ 10704: D × t.
+PIPE_SIZES = [
+    (42, 3), (48, 3), (57, 3), (57, 3.5), (76, 3), (76, 3.5), (89, 3.5), (89, 4),
+    (102, 4), (108, 4), (114, 4), (127, 4), (133, 4), (133, 5), (159, 4.5), (159, 6),
+    (168, 6), (219, 6), (219, 8), (273, 8),
+]
+# Трубы квадратные по ГОСТ 30245: b × t.
+BOX_SIZES = [
+    (40, 3), (50, 3), (60, 3), (60, 4), (80, 4), (100, 4), (100, 5), (120, 5),
+    (140, 5), (160, 6), (180, 6), (200, 8),
+]
+
+
+def catalogue(sec_type):
+    """Каталог сечений для подбора: [{'type', 'dims' (мм, как во входных
+    данных API), 'A', 'I_min', 'desc'}]."""
+    if sec_type == 'pipe':
+        dims_list = [{'d_out': D, 'd_in': D - 2 * t} for D, t in PIPE_SIZES]
+    elif sec_type == 'box':
+        dims_list = [{'b_out': b, 'h_out': b, 't': t} for b, t in BOX_SIZES]
+    else:
+        raise ValueError(f"Нет сортамента для типа сечения: {sec_type}")
+    out = []
+    for dims_mm in dims_list:
+        dims = {k: v / 1000.0 for k, v in dims_mm.items()}
+        sec = SECTION_BUILDERS[sec_type](**dims)
+        out.append({'type': sec_type, 'dims': dims_mm, 'A': sec['A'],
+                    'I_min': min_moment_of_inertia(sec_type, dims), 'desc': sec['desc']})
+    return out
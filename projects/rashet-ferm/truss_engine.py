@@ -15,6 +15,24 @@ beam_engine.py — одна и та же процедура корректно 
 Оси: x вправо, y вверх.
 """
 import numpy as np
+from scipy.linalg import cho_factor, cho_solve, eigh
+from scipy.sparse import coo_matrix, issparse
+from scipy.sparse.linalg import LinearOperator, cg, eigsh, splu
+
+# Начиная с этого числа СС матрица жёсткости собирается разреженной (CSR) и
+# решается SuperLU: у фермы из 10 тыс. стержней плотная K — это гигабайты,
+# а ненулевых элементов в ней — единицы на строку.
+SPARSE_MIN_DOF = 400
+
+MECHANISM_ERROR = (
+    "Система стержней и опор геометрически изменяема (механизм) — "
+    "ферма неустойчива. Проверьте число и расположение стержней/опор."
+)
+# Подбор сечений: пересчёт после смены части сечений идёт сопряжёнными
+# градиентами с последним разложением K в роли предобуславливателя; если
+# за столько итераций не сошлось — изменений слишком много, K
+# раскладывается заново.
+PCG_MAX_ITER = 40
 
 
 class Node:
@@ -27,6 +45,7 @@ class Member:
     def __init__(self, i, j):
         self.i = i  # индекс узла начала
         self.j = j  # индекс узла конца
+        self.A = None  # м² — собственная площадь (подбор сечений); None — общая Truss.A
 
 
 class Support:
@@ -47,7 +66,7 @@ class Support:
 class Truss:
     def __init__(self, E, A):
         self.E = float(E)          # Па — модуль упругости (общий для всех стержней)
-        self.A = float(A)          # м² — площадь сечения стержня (общая для всех)
+        self.A = float(A)          # м² — площадь сечения стержня (общая, если у стержня не задана своя)
         self.nodes = []
         self.members = []
         self.supports = []
@@ -81,65 +100,105 @@ class Truss:
             r += 2 if s.kind == 'pin' else 1
         return m + r - 2 * n, m, r, n
 
-    def solve(self):
-        n = len(self.nodes)
-        ndof = 2 * n
+    def _geometry(self):
+        """Номера узлов, длины и направляющие косинусы всех стержней —
+        массивами, без цикла по стержням."""
+        xy = np.array([(nd.x, nd.y) for nd in self.nodes], dtype=float).reshape(-1, 2)
+        i = np.array([m.i for m in self.members], dtype=int)
+        j = np.array([m.j for m in self.members], dtype=int)
+        dxy = xy[j] - xy[i]
+        Ls = np.hypot(dxy[:, 0], dxy[:, 1])
+        if (Ls < 1e-9).any():
+            raise ValueError("Стержень нулевой длины — совпадающие узлы.")
+        return i, j, Ls, dxy[:, 0] / Ls, dxy[:, 1] / Ls
+
+    def _areas(self):
+        return np.array([self.A if m.A is None else m.A for m in self.members], dtype=float)
+
+    def _assemble(self, sparse=None, EA=None):
+        """Глобальная матрица жёсткости K и длины стержней. Матрица элемента
+        (EA/L)·t·tᵀ, t = [-c, -s, c, s], строится сразу для всех стержней;
+        для больших ферм (от SPARSE_MIN_DOF СС) K собирается в COO и
+        хранится как CSR, иначе — плотная. EA — жёсткости стержней (по
+        умолчанию E·A каждого); нулевые дают нулевой вклад, так что тем же
+        вызовом собирается и приращение K при смене части сечений."""
+        i, j, Ls, c, s = self._geometry()
+        if EA is None:
+            EA = self.E * self._areas()
+        t = np.column_stack([-c, -s, c, s])
+        return self._scatter(EA / Ls, t, sparse), Ls
+
+    def _scatter(self, coef, t, sparse=None):
+        """Сборка Σ coef·t·tᵀ по всем стержням в глобальную матрицу: t —
+        массив (m, 4) в СС [ui, vi, uj, vj] каждого стержня."""
+        ndof = 2 * len(self.nodes)
+        i = np.array([m.i for m in self.members], dtype=int)
+        j = np.array([m.j for m in self.members], dtype=int)
+        ke = coef[:, None, None] * t[:, :, None] * t[:, None, :]
+        dofs = np.column_stack([2 * i, 2 * i + 1, 2 * j, 2 * j + 1])
+        rows = np.broadcast_to(dofs[:, :, None], ke.shape)
+        cols = np.broadcast_to(dofs[:, None, :], ke.shape)
+
+        if sparse is None:
+            sparse = ndof >= SPARSE_MIN_DOF
+        if sparse:
+            return coo_matrix((ke.ravel(), (rows.ravel(), cols.ravel())), shape=(ndof, ndof)).tocsr()
         K = np.zeros((ndof, ndof))
-        F = np.zeros(ndof)
-        EA = self.E * self.A
-
-        Ls = []
-        for m in self.members:
-            ni, nj = self.nodes[m.i], self.nodes[m.j]
-            dx, dy = nj.x - ni.x, nj.y - ni.y
-            L = (dx ** 2 + dy ** 2) ** 0.5
-            Ls.append(L)
-            if L < 1e-9:
-                raise ValueError("Стержень нулевой длины — совпадающие узлы.")
-            c, s = dx / L, dy / L
-            k = (EA / L) * np.array([
-                [c * c, c * s, -c * c, -c * s],
-                [c * s, s * s, -c * s, -s * s],
-                [-c * c, -c * s, c * c, c * s],
-                [-c * s, -s * s, c * s, s * s],
-            ])
-            dofs = [2 * m.i, 2 * m.i + 1, 2 * m.j, 2 * m.j + 1]
-            for a in range(4):
-                for b in range(4):
-                    K[dofs[a], dofs[b]] += k[a, b]
-
-        for node, (fx, fy) in self.loads.items():
+        np.add.at(K, (rows, cols), ke)
+        return K
+
+    def _load_vector(self, loads):
+        F = np.zeros(2 * len(self.nodes))
+        for node, (fx, fy) in loads.items():
             F[2 * node] += fx
             F[2 * node + 1] += fy
+        return F
 
-        fixed = []
+    def _free_dofs(self):
+        fixed = np.zeros(2 * len(self.nodes), dtype=bool)
         for s in self.supports:
             if s.kind == 'pin':
-                fixed += [2 * s.node, 2 * s.node + 1]
+                fixed[[2 * s.node, 2 * s.node + 1]] = True
             elif s.kind == 'roller_y':
-                fixed += [2 * s.node + 1]
+                fixed[2 * s.node + 1] = True
             elif s.kind == 'roller_x':
-                fixed += [2 * s.node]
-        fixed = sorted(set(fixed))
-        free = [d for d in range(ndof) if d not in fixed]
+                fixed[2 * s.node] = True
+        free = np.flatnonzero(~fixed)
 
-        if not free:
+        if not len(free):
             raise ValueError("Все узлы закреплены — задача вырождена.")
+        return free
 
-        Kff = K[np.ix_(free, free)]
-        Ff = F[free]
+    @staticmethod
+    def _restrict(K, free):
+        """Блок K по свободным СС."""
+        return K[free][:, free] if issparse(K) else K[np.ix_(free, free)]
+
+    @staticmethod
+    def _factorize(Kff):
+        """Разложение Kff (SuperLU для разреженной, Холецкий для плотной) —
+        возвращает функцию решения для любых правых частей."""
         try:
-            d_free = np.linalg.solve(Kff, Ff)
-        except np.linalg.LinAlgError:
-            raise ValueError(
-                "Система стержней и опор геометрически изменяема (механизм) — "
-                "ферма неустойчива. Проверьте число и расположение стержней/опор."
-            )
-
-        d = np.zeros(ndof)
-        d[free] = d_free
+            if issparse(Kff):
+                return splu(Kff.tocsc()).solve
+            cf = cho_factor(Kff)
+            return lambda b: cho_solve(cf, b)
+        except (np.linalg.LinAlgError, RuntimeError):
+            raise ValueError(MECHANISM_ERROR)
+
+    def _solve_free(self, K, F, free):
+        """Перемещения и усилия связей; F — вектор или матрица (ndof, k)
+        из k нагружений (одно разложение на все столбцы)."""
+        d_free = self._factorize(self._restrict(K, free))(F[free])
+        if not np.isfinite(d_free).all():
+            raise ValueError(MECHANISM_ERROR)
 
+        d = np.zeros(F.shape)
+        d[free] = d_free
         R_full = K.dot(d) - F
+        return d, R_full
+
+    def _reactions_from(self, R_full):
         reactions = []
         for s in self.supports:
             reactions.append({
@@ -147,24 +206,232 @@ class Truss:
                 'Rx': R_full[2 * s.node] if s.kind in ('pin', 'roller_x') else 0.0,
                 'Ry': R_full[2 * s.node + 1] if s.kind in ('pin', 'roller_y') else 0.0,
             })
+        return reactions
 
-        forces = []
-        for m, L in zip(self.members, Ls):
-            ni, nj = self.nodes[m.i], self.nodes[m.j]
-            dx, dy = nj.x - ni.x, nj.y - ni.y
-            c, s = dx / L, dy / L
-            ui, vi = d[2 * m.i], d[2 * m.i + 1]
-            uj, vj = d[2 * m.j], d[2 * m.j + 1]
-            elong = (uj - ui) * c + (vj - vi) * s
-            N = EA / L * elong
-            forces.append(N)
+    def _member_forces(self, d):
+        """N = EA/L · удлинение для всех стержней; d — вектор перемещений или
+        матрица (ndof, k) — тогда результат (m, k)."""
+        i, j, Ls, c, s = self._geometry()
+        if d.ndim > 1:
+            c, s, Ls = c[:, None], s[:, None], Ls[:, None]
+        elong = (d[2 * j] - d[2 * i]) * c + (d[2 * j + 1] - d[2 * i + 1]) * s
+        EA = self.E * self._areas()
+        if d.ndim > 1:
+            EA = EA[:, None]
+        return EA / Ls * elong
+
+    def solve(self):
+        K, Ls = self._assemble()
+        F = self._load_vector(self.loads)
+        d, R_full = self._solve_free(K, F, self._free_dofs())
+
+        reactions = self._reactions_from(R_full)
+        forces = self._member_forces(d).tolist()
 
         self._d = d
         self._reactions = reactions
         self._forces = forces
-        self._Ls = Ls
+        self._Ls = Ls.tolist()
         return reactions, forces
 
+    def solve_load_cases(self, cases, combinations=None):
+        """Несколько нагружений одной фермы (постоянное, снег, ветер...) за
+        одну сборку K и одно разложение: нагружения — столбцы правой части.
+        Сочетания {имя: {нагружение: коэффициент}} — линейная суперпозиция
+        уже найденных реакций и усилий, без повторного решения.
+        cases: {имя: {узел: (Fx, Fy)}}; собственные нагрузки self.loads не
+        учитываются.
+        Возвращает ({имя: (reactions, forces)}, {имя: (reactions, forces)})
+        в том же формате, что и solve()."""
+        combinations = combinations or {}
+        if not cases:
+            raise ValueError("Задайте хотя бы одно нагружение.")
+        for cname, factors in combinations.items():
+            for name in factors:
+                if name not in cases:
+                    raise ValueError(f"Сочетание «{cname}»: нет нагружения «{name}».")
+
+        names = list(cases)
+        K, Ls = self._assemble()
+        F = np.column_stack([self._load_vector(cases[name]) for name in names])
+        D, R_full = self._solve_free(K, F, self._free_dofs())
+        N = self._member_forces(D)
+
+        def result(f):
+            return self._reactions_from(R_full.dot(f)), N.dot(f).tolist()
+
+        unit = np.eye(len(names))
+        case_results = {name: result(unit[k]) for k, name in enumerate(names)}
+        combo_results = {}
+        for cname, factors in combinations.items():
+            f = np.zeros(len(names))
+            for name, factor in factors.items():
+                f[names.index(name)] += factor
+            combo_results[cname] = result(f)
+        return case_results, combo_results
+
+    def optimize_sections(self, catalogue, sigma_allow, rho=7850.0, max_iter=30):
+        """Подбор сечений стержней по каталогу на минимум массы.
+        catalogue: [{'A': м², 'I_min': м⁴, ...}] (см. sections.catalogue);
+        каждому стержню назначается самое лёгкое сечение, проходящее по
+        прочности (|N|/A ≤ [σ]) и, для сжатых, по устойчивости (Эйлер,
+        |N| ≤ π²EI_min/L²). В статически неопределимой ферме усилия зависят
+        от жёсткостей стержней, поэтому подбор повторяется, пока назначение
+        не перестанет меняться.
+        K не собирается заново на каждой итерации: к ней добавляется только
+        вклад стержней со сменившимся сечением, а перемещения ищутся PCG от
+        прошлого решения с прошлым разложением в роли предобуславливателя
+        (новое разложение — только если PCG не сошёлся за PCG_MAX_ITER).
+        Итоговые площади записываются в Member.A, ферма остаётся решённой
+        (как после solve()). Возвращает назначенные сечения, усилия,
+        коэффициенты использования, массу и историю итераций."""
+        if not catalogue:
+            raise ValueError("Каталог сечений пуст.")
+        if max_iter < 1:
+            raise ValueError("Нужна хотя бы одна итерация подбора.")
+        order = np.argsort([entry['A'] for entry in catalogue], kind='stable')
+        cat_A = np.array([catalogue[k]['A'] for k in order], dtype=float)
+        cat_I = np.array([catalogue[k]['I_min'] for k in order], dtype=float)
+
+        i, j, Ls, c, s = self._geometry()
+        free = self._free_dofs()
+        F = self._load_vector(self.loads)
+        Ff = F[free]
+
+        def utilization(N, A, I):
+            N, A, I = np.broadcast_arrays(N, A, I)
+            strength = np.abs(N) / (A * sigma_allow)
+            euler = np.abs(N) * (Ls.reshape((-1,) + (1,) * (N.ndim - 1)) ** 2) / (np.pi ** 2 * self.E * I)
+            return np.maximum(strength, np.where(N < 0, euler, 0.0))
+
+        def expand(d_free):
+            d = np.zeros(F.shape)
+            d[free] = d_free
+            return d
+
+        areas = self._areas()
+        K, _ = self._assemble(EA=self.E * areas)
+        Kff = self._restrict(K, free)
+        factor = self._factorize(Kff)
+        d_free = factor(Ff)
+        solve_kind, pcg_iter = 'factor', 0
+
+        history = []
+        design = None  # номера сечений (в отсортированном каталоге), на которых решена K
+        converged = False
+        for it in range(max_iter + 1):
+            d = expand(d_free)
+            N = self.E * areas / Ls * ((d[2 * j] - d[2 * i]) * c + (d[2 * j + 1] - d[2 * i + 1]) * s)
+            ok = utilization(N[:, None], cat_A[None, :], cat_I[None, :]) <= 1.0
+            pick = np.where(ok.any(axis=1), ok.argmax(axis=1), len(cat_A) - 1)
+            if design is None:
+                changed = np.flatnonzero(cat_A[pick] != areas)
+            else:
+                changed = np.flatnonzero(pick != design)
+            history.append({
+                'iteration': it,
+                'solve': solve_kind,
+                'pcg_iter': pcg_iter,
+                'mass': float(rho * (areas * Ls).sum()),
+                'worst_ratio': (None if design is None
+                                else float(utilization(N, areas, cat_I[design]).max())),
+                'changed': int(len(changed)),
+            })
+            if not len(changed):
+                design = pick
+                converged = True
+                break
+            if it == max_iter:
+                break
+
+            new_areas = cat_A[pick]
+            dEA = np.zeros(len(areas))
+            dEA[changed] = self.E * (new_areas[changed] - areas[changed])
+            dK, _ = self._assemble(sparse=issparse(K), EA=dEA)
+            K = K + dK
+            Kff = self._restrict(K, free)
+            areas, design = new_areas, pick
+
+            count = [0]
+            x, info = cg(Kff, Ff, x0=d_free, rtol=1e-10, maxiter=PCG_MAX_ITER,
+                         M=LinearOperator(Kff.shape, matvec=factor, dtype=float),
+                         callback=lambda xk: count.__setitem__(0, count[0] + 1))
+            pcg_iter = count[0]
+            if info == 0:
+                d_free, solve_kind = x, 'pcg'
+            else:
+                factor = self._factorize(Kff)
+                d_free, solve_kind = factor(Ff), 'factor'
+
+        for m, A in zip(self.members, areas):
+            m.A = float(A)
+        d = expand(d_free)
+        forces = self._member_forces(d)
+        self._d = d
+        self._reactions = self._reactions_from(K.dot(d) - F)
+        self._forces = forces.tolist()
+        self._Ls = Ls.tolist()
+
+        ratios = utilization(forces, areas, cat_I[design])
+        return {
+            'converged': converged,
+            'sections': [catalogue[order[k]] for k in design],
+            'areas': areas.tolist(),
+            'forces': self._forces,
+            'ratios': ratios.tolist(),
+            'all_ok': bool((ratios <= 1.0 + 1e-9).all()),
+            'mass': float(rho * (areas * Ls).sum()),
+            'history': history,
+        }
+
+    def buckling_modes(self, k=3):
+        """Линейная (эйлерова) потеря устойчивости фермы в целом: ферма
+        решается от текущих нагрузок, из усилий N собирается геометрическая
+        матрица жёсткости Kg (стержень: N/L·p·pᵀ, p = [-s, c, s, -c] —
+        поперечные смещения концов) и решается обобщённая задача
+        (K + λ·Kg)·φ = 0. λ — во сколько раз нужно увеличить нагрузку до
+        потери устойчивости; возвращаются k наименьших положительных.
+        Местная потеря устойчивости отдельного стержня между узлами (узлы
+        шарнирные) здесь не видна — её проверяет формула Эйлера в записке.
+        Для больших ферм — разреженный eigsh в режиме сдвиг-обращения с
+        нулевым сдвигом: K раскладывается один раз (SuperLU), ищутся
+        наибольшие μ = 1/λ задачи −Kg·φ = μ·K·φ.
+        Результат: [{'factor': λ, 'shape': массив (узлы, 2) — ux, uy формы,
+        нормированные на max |u| = 1}] по возрастанию λ; пустой список, если
+        сжатых стержней нет."""
+        self.solve()
+        N = np.array(self._forces)
+        i, j, Ls, c, s = self._geometry()
+        free = self._free_dofs()
+        K, _ = self._assemble()
+        Kg = self._scatter(N / Ls, np.column_stack([-s, c, s, -c]), sparse=issparse(K))
+        Kff, Kgff = self._restrict(K, free), self._restrict(Kg, free)
+
+        n = len(free)
+        if issparse(Kff) and k < n - 1:
+            solve = self._factorize(Kff)
+            mu, vecs = eigsh(-Kgff, k=k, M=Kff, Minv=LinearOperator(Kff.shape, matvec=solve, dtype=float),
+                             which='LA')
+        else:
+            if issparse(Kff):
+                Kff, Kgff = Kff.toarray(), Kgff.toarray()
+            try:
+                mu, vecs = eigh(-Kgff, Kff)
+            except np.linalg.LinAlgError:
+                raise ValueError(MECHANISM_ERROR)
+
+        tol = 1e-12 * max(np.abs(mu).max(), 1e-300) if len(mu) else 0.0
+        keep = np.flatnonzero(mu > tol)
+        keep = keep[np.argsort(-mu[keep])][:k]
+
+        modes = []
+        for q in keep:
+            phi = np.zeros(2 * len(self.nodes))
+            phi[free] = vecs[:, q]
+            peak = phi[np.argmax(np.abs(phi))]
+            modes.append({'factor': float(1.0 / mu[q]), 'shape': (phi / peak).reshape(-1, 2)})
+        return modes
+
     def check_equilibrium(self):
         sumFx = sum(f['Rx'] for f in self._reactions) + sum(fx for fx, fy in self.loads.values())
         sumFy = sum(f['Ry'] for f in self._reactions) + sum(fy for fx, fy in self.loads.values())